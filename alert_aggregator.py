@@ -0,0 +1,221 @@
+"""
+Incident-based alert aggregation instead of a fixed e-mail cooldown.
+
+Every processed frame while the smoothed threat is on becomes an event of
+the current incident for that camera.  The incident keeps its
+best-confidence frames (encoded once, only when they make the cut), sends
+an immediate alert when it opens, an escalation when it gets long, strong
+or busy, periodic updates while it lasts and one digest when it closes.
+A global rate limit bounds SMTP load in noisy scenes; mail that has to wait
+stays in a backlog and is retried, and every event is counted in some
+message (or printed, if e-mail is off), so nothing is silently dropped.
+With an evidence store, each frame a message carries is also saved as
+``alert`` evidence, once, from the same JPEG bytes the e-mail attaches.
+"""
+
+import heapq
+import itertools
+import time
+from collections import deque
+from datetime import datetime
+
+from frame_encoding import EncodedFrame
+
+# Alert aggregation configuration
+ALERT_CONFIG = {
+    'incident_gap': 15.0,          # Seconds without a threat before an incident is closed
+    'update_interval': 120.0,      # Seconds between update digests while an incident lasts
+    'best_frames': 3,              # Highest-confidence frames attached to a digest
+    'escalate_after': 30.0,        # Escalate an incident that lasts this many seconds...
+    'escalate_confidence': 0.8,    # ...or reaches this weapon confidence...
+    'escalate_events': 50,         # ...or collects this many events
+    'max_per_hour': 20,            # Global e-mail budget across all cameras
+    'min_spacing': 10.0,           # Seconds between any two e-mails
+    'retry_interval': 30.0,        # Seconds before a message that could not be queued is retried
+    'max_backlog': 20              # Messages held while rate limited; older ones are logged, not lost
+}
+
+
+class Incident:
+    """Events of one continuous threat on one camera."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, source, now):
+        self.incident_id = next(self._ids)
+        self.source = source
+        self.opened_at = now
+        self.last_seen = now
+        self.events = 0
+        self.peak_confidence = 0.0
+        self.classes = set()
+        self.escalated = False
+        self.last_mail = None
+        self.unreported = 0             # Events not yet covered by any message
+        self._best = []                 # min-heap of (confidence, seq, EncodedFrame, DetectionResult)
+        self._seq = itertools.count()
+        self.last_details = {}
+
+    def add(self, frame, result, now):
+        self.events += 1
+        self.unreported += 1
+        self.last_seen = now
+        confidence = result.threat_confidence
+        self.peak_confidence = max(self.peak_confidence, confidence)
+        self.classes.update(result.class_names.get(int(c), str(c)) for c in result.class_ids[result.threat_mask])
+        self.last_details = result.threat_details
+        # Only frames that make the top-N are copied and (later) encoded
+        if len(self._best) < ALERT_CONFIG['best_frames']:
+            heapq.heappush(self._best, (confidence, next(self._seq), EncodedFrame(frame), result))
+        elif confidence > self._best[0][0]:
+            heapq.heapreplace(self._best, (confidence, next(self._seq), EncodedFrame(frame), result))
+
+    def best(self):
+        """(EncodedFrame, DetectionResult) pairs, highest confidence first."""
+        return [(image, result) for _, _, image, result in sorted(self._best, key=lambda e: e[:2], reverse=True)]
+
+    def best_frames(self):
+        return [image for image, _ in self.best()]
+
+    def should_escalate(self, now):
+        return not self.escalated and (
+            now - self.opened_at >= ALERT_CONFIG['escalate_after'] or
+            self.peak_confidence >= ALERT_CONFIG['escalate_confidence'] or
+            self.events >= ALERT_CONFIG['escalate_events'])
+
+    def message(self, kind, now):
+        """(images, threat_details) for an e-mail about this incident."""
+        duration = now - self.opened_at
+        details = dict(self.last_details)
+        details.update({
+            'stream': str(self.source),
+            'alert_kind': f"Incident #{self.incident_id} {kind}",
+            'summary': [
+                f"Incident: #{self.incident_id} ({kind})",
+                f"Started: {datetime.fromtimestamp(self.opened_at).strftime('%Y-%m-%d %H:%M:%S')}",
+                f"Duration: {duration:.0f} s",
+                f"Events: {self.events} ({self.unreported} since last message)",
+                f"Peak confidence: {self.peak_confidence:.2f}",
+                f"Weapon classes: {', '.join(sorted(self.classes)) or 'none'}",
+            ]
+        })
+        self.unreported = 0
+        self.last_mail = now
+        return self.best_frames(), details
+
+
+class AlertAggregator:
+    """Turns per-frame threat state into rate-limited incident e-mails.
+
+    ``send_fn(images, threat_details)`` queues one e-mail and returns True,
+    False if it could not be queued (it is retried), or None when e-mail is
+    off (the message is only logged).  ``evidence`` is an optional
+    evidence_store.EvidenceStore for the frames the messages carry.
+    """
+
+    def __init__(self, send_fn, evidence=None):
+        self.send_fn = send_fn
+        self.evidence = evidence
+        self.incidents = {}
+        self._sent_times = deque()
+        self._backlog = deque()
+        self._next_retry = 0.0
+        self.sent = 0
+        self.logged = 0
+
+    def observe(self, source, active, frame, result, now=None):
+        """Feed one detector result for a camera; ``active`` is its smoothed threat state."""
+        now = now if now is not None else time.time()
+        incident = self.incidents.get(source)
+        if active and result is not None and result.threat_detected:
+            if incident is None:
+                incident = self.incidents[source] = Incident(source, now)
+                incident.add(frame, result, now)
+                print(f"🚨 Incident #{incident.incident_id} opened on {source}")
+                self._queue(self._message(incident, "opened", now), now)
+            else:
+                incident.add(frame, result, now)
+                if incident.should_escalate(now):
+                    incident.escalated = True
+                    print(f"⏫ Incident #{incident.incident_id} escalated")
+                    self._queue(self._message(incident, "ESCALATED", now), now)
+                elif incident.unreported and now - incident.last_mail >= ALERT_CONFIG['update_interval']:
+                    self._queue(self._message(incident, "update", now), now)
+        elif active and incident is not None:
+            incident.last_seen = now
+        self.tick(now)
+
+    def tick(self, now=None):
+        """Close quiet incidents and send what the rate limit allows."""
+        now = now if now is not None else time.time()
+        for source, incident in list(self.incidents.items()):
+            if now - incident.last_seen >= ALERT_CONFIG['incident_gap']:
+                del self.incidents[source]
+                print(f"✅ Incident #{incident.incident_id} closed after {incident.last_seen - incident.opened_at:.0f} s, "
+                      f"{incident.events} event(s)")
+                self._queue(self._message(incident, "closed", now), now)
+        self._drain(now)
+
+    def flush(self):
+        """Close every open incident and hand all pending messages to send_fn (used on shutdown)."""
+        now = time.time()
+        for incident in self.incidents.values():
+            self._queue(self._message(incident, "closed", now), now)
+        self.incidents.clear()
+        while self._backlog:
+            message = self._backlog.popleft()
+            outcome = self._send(message)
+            if outcome:
+                self.sent += 1
+            else:
+                self._log(message, "e-mail off" if outcome is None else "not delivered at shutdown")
+
+    def _message(self, incident, kind, now):
+        """Compose a message and hand its frames, not saved before, to the evidence store."""
+        message = incident.message(kind, now)
+        if self.evidence is not None:
+            for image, result in incident.best():
+                if image.evidence_id is None:
+                    image.evidence_id = self.evidence.submit(image, result, incident.source, kind='alert')
+        return message
+
+    def _queue(self, message, now):
+        self._backlog.append(message)
+        while len(self._backlog) > ALERT_CONFIG['max_backlog']:
+            self._log(self._backlog.popleft(), "backlog full, not e-mailed")
+        self._drain(now)
+
+    def _allowed(self, now):
+        while self._sent_times and now - self._sent_times[0] > 3600:
+            self._sent_times.popleft()
+        if len(self._sent_times) >= ALERT_CONFIG['max_per_hour']:
+            return False
+        return not self._sent_times or now - self._sent_times[-1] >= ALERT_CONFIG['min_spacing']
+
+    def _drain(self, now):
+        while self._backlog and now >= self._next_retry and self._allowed(now):
+            message = self._backlog[0]
+            outcome = self._send(message)
+            if outcome is False:
+                # Dispatcher busy or config incomplete: keep it and try again later
+                self._next_retry = now + ALERT_CONFIG['retry_interval']
+                return
+            self._backlog.popleft()
+            if outcome is None:
+                self._log(message, "e-mail off")
+            else:
+                self._sent_times.append(now)
+                self.sent += 1
+
+    def _send(self, message):
+        images, details = message
+        return self.send_fn(images, details) if self.send_fn else None
+
+    def _log(self, message, reason):
+        _, details = message
+        self.logged += 1
+        print(f"📋 [ALERT] {details['alert_kind']} ({reason}): " + " | ".join(details['summary'][2:]))
+
+    @property
+    def backlog(self):
+        return len(self._backlog)
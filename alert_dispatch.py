@@ -0,0 +1,216 @@
+"""
+Alert e-mail delivery on one background worker over a reusable SMTP session.
+
+Instead of a new thread plus a fresh connect/STARTTLS/login for every alert,
+alerts go into a small bounded queue served by a single dispatcher thread.
+The dispatcher keeps one authenticated session open, sends NOOP keepalives
+while idle, reconnects when the server drops it and retries failed sends
+with exponential backoff.  Delivery latency and failures are counted.
+
+The SMTP host, port and TLS come from the config dict passed in (normally
+threat_detection.EMAIL_CONFIG), so delivery can be checked end to end
+against a local stand-in server, e.g.::
+
+    python -m aiosmtpd -n -l localhost:1025
+    THREAT_DETECTION_SMTP_SERVER=localhost THREAT_DETECTION_SMTP_PORT=1025 \\
+        THREAT_DETECTION_SMTP_TLS=0 python threat_detection.py
+
+tests/test_alert_dispatch.py does the same against tests/smtp_stand_in.py.
+"""
+
+import queue
+import smtplib
+import threading
+import time
+from collections import deque
+
+# Alert dispatch configuration
+ALERT_DISPATCH_CONFIG = {
+    'queue_size': 8,        # Alerts waiting for delivery; further alerts are counted as dropped
+    'max_attempts': 4,      # Send attempts per alert
+    'retry_backoff': 2.0,   # Seconds before the first retry, doubled after each failure
+    'keepalive': 60.0,      # Seconds of idle time between NOOPs on the open session
+    'max_idle': 600.0,      # Close the session after this long without an alert
+    'timeout': 20.0,        # Socket timeout for SMTP operations
+    'latency_window': 50    # Deliveries kept for latency statistics
+}
+
+
+class SMTPSession:
+    """One SMTP connection, authenticated once and reused across messages."""
+
+    def __init__(self, config):
+        self.config = config
+        self.server = None
+        self.connects = 0
+        self.last_used = 0.0
+        self._key = None
+
+    def _settings(self):
+        c = self.config
+        return (c['smtp_server'], int(c['smtp_port']), bool(c.get('use_tls', True)),
+                c['sender_email'], c['sender_password'])
+
+    def connect(self):
+        self.close()
+        host, port, use_tls, user, password = self._key = self._settings()
+        server = smtplib.SMTP(host, port, timeout=ALERT_DISPATCH_CONFIG['timeout'])
+        try:
+            server.ehlo()
+            if use_tls:
+                server.starttls()
+                server.ehlo()
+            # Local stand-in servers usually do not offer AUTH
+            if password and server.has_extn('auth'):
+                server.login(user, password)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        self.connects += 1
+        self.last_used = time.time()
+        print(f"[EMAIL] SMTP session open to {host}:{port}" + (" (STARTTLS)" if use_tls else ""))
+
+    def ensure(self):
+        """Connect if there is no session or the settings changed since it was opened."""
+        if self.server is None or self._key != self._settings():
+            self.connect()
+
+    def send(self, message):
+        self.ensure()
+        try:
+            self.server.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # The server timed the idle session out; one fresh connection, then give up to the retry loop
+            self.connect()
+            self.server.send_message(message)
+        self.last_used = time.time()
+
+    def keepalive(self):
+        """NOOP an idle session so the server does not drop it; close it once idle too long."""
+        if self.server is None:
+            return
+        idle = time.time() - self.last_used
+        if idle >= ALERT_DISPATCH_CONFIG['max_idle']:
+            self.close()
+            return
+        try:
+            code, _ = self.server.noop()
+            if code != 250:
+                self.close()
+        except (smtplib.SMTPException, OSError):
+            self.close()
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+
+
+class AlertDispatcher(threading.Thread):
+    """Single worker that delivers queued alert e-mails in order.
+
+    ``submit(build_message, on_result=None)`` queues a callable returning an
+    email.message.Message; it runs on the dispatcher thread, so building and
+    encoding the attachment never blocks the caller.  ``on_result(ok, info)``
+    is called after the last attempt.
+    """
+
+    def __init__(self, config):
+        super().__init__(daemon=True)
+        self.session = SMTPSession(config)
+        self._queue = queue.Queue(maxsize=ALERT_DISPATCH_CONFIG['queue_size'])
+        self._stop_event = threading.Event()
+        self._latencies = deque(maxlen=ALERT_DISPATCH_CONFIG['latency_window'])
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.dropped = 0
+
+    def submit(self, build_message, on_result=None):
+        """Queue an alert without blocking; returns False if the queue is full."""
+        try:
+            self._queue.put_nowait((time.time(), build_message, on_result))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠️ [EMAIL] Alert queue full ({self._queue.maxsize}); alert not queued")
+            return False
+
+    def run(self):
+        while not self._stop_event.is_set() or not self._queue.empty():
+            try:
+                queued_at, build_message, on_result = self._queue.get(timeout=ALERT_DISPATCH_CONFIG['keepalive'])
+            except queue.Empty:
+                self.session.keepalive()
+                continue
+            if build_message is None:
+                continue
+            ok, info = self._deliver(build_message)
+            if ok:
+                self._latencies.append(time.time() - queued_at)
+            if on_result:
+                try:
+                    on_result(ok, info)
+                except Exception as e:
+                    print(f"⚠️ [EMAIL] Result callback failed: {e}")
+        self.session.close()
+
+    def _deliver(self, build_message):
+        try:
+            message = build_message()
+        except Exception as e:
+            self.failed += 1
+            print(f"❌ [EMAIL] Could not build alert message: {e}")
+            return False, str(e)
+        delay = ALERT_DISPATCH_CONFIG['retry_backoff']
+        for attempt in range(1, ALERT_DISPATCH_CONFIG['max_attempts'] + 1):
+            try:
+                self.session.send(message)
+                self.sent += 1
+                print(f"✅ Threat alert email sent successfully to {message['To']}")
+                return True, message['To']
+            except (smtplib.SMTPException, OSError) as e:
+                self.session.close()
+                if isinstance(e, smtplib.SMTPAuthenticationError) or attempt == ALERT_DISPATCH_CONFIG['max_attempts']:
+                    self.failed += 1
+                    print(f"❌ Failed to send email after {attempt} attempt(s): {e}")
+                    return False, str(e)
+                self.retries += 1
+                print(f"⚠️ [EMAIL] Send failed ({e}); retrying in {delay:.1f} s")
+                # Returns at once when shutting down, so the remaining attempts do not hold up exit
+                self._stop_event.wait(delay)
+                delay *= 2
+        return False, "no attempts"
+
+    def stop(self, timeout=10.0):
+        """Deliver what is queued (up to timeout), then close the session."""
+        self._stop_event.set()
+        try:
+            self._queue.put_nowait((time.time(), None, None))  # Wake the worker
+        except queue.Full:
+            pass
+        self.join(timeout)
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'dropped': self.dropped,
+            'queued': self._queue.qsize(),
+            'connects': self.session.connects,
+            'latency_avg_s': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_max_s': latencies[-1] if latencies else 0.0
+        }
+
+    def report(self):
+        s = self.stats()
+        print(f"📧 Alerts: {s['sent']} sent, {s['failed']} failed, {s['retries']} retries, "
+              f"{s['dropped']} dropped | {s['connects']} SMTP connect(s) | "
+              f"delivery latency avg {s['latency_avg_s']:.2f} s, max {s['latency_max_s']:.2f} s")
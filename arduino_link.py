@@ -0,0 +1,288 @@
+"""
+Arduino discovery and non-blocking alarm output.
+
+Instead of opening up to twenty fixed device names one after another (with
+a two-second sleep after each), the ports the OS actually reports are
+probed concurrently, and a port only counts as the alarm board once it
+prints the "Arduino Threat Alert System Ready" banner from
+threat_alert_system.ino (opening the port resets the board, so the banner
+follows every successful open).
+
+All serial I/O then runs on one writer thread.  The detection loop only
+records the latest alarm state; states that are superseded before they
+are written are coalesced, so a stalled or unplugged USB port can never
+block inference.  The writer reconnects by rediscovering the board, with
+growing pauses; after ``max_discovery_attempts`` failures in a row it stops
+probing (opening a port resets any Arduino-class device on it) until
+rediscover() is called.
+
+tests/fake_arduino.py has a pseudo-terminal stand-in for the board, so the
+handshake and the writer can be exercised without hardware.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Arduino link configuration
+ARDUINO_CONFIG = {
+    'baud_rate': 9600,
+    'banner': "Arduino Threat Alert System Ready",  # First line printed by threat_alert_system.ino
+    'handshake_timeout': 4.0,     # Seconds to wait for the banner (the board reboots when the port opens)
+    'probe_workers': 8,           # Ports probed at the same time
+    'write_timeout': 0.5,         # A write blocked longer than this marks the port as stalled
+    'reconnect_interval': 5.0,    # Seconds before the first rediscovery; doubles after each failed attempt
+    'max_reconnect_interval': 120.0,
+    'max_discovery_attempts': 3,  # Failed discoveries in a row before waiting for rediscover() (0 = keep trying)
+    # USB vendor IDs of Arduino boards and the usual USB-serial bridges (CH340, FTDI, CP210x, Adafruit)
+    'usb_vendor_ids': (0x2341, 0x2A03, 0x1A86, 0x0403, 0x10C4, 0x239A)
+}
+
+
+def candidate_ports(port=None):
+    """Serial ports worth probing, most likely Arduino first; an explicit ``port`` always leads."""
+    from serial.tools import list_ports
+    likely, others = [], []
+    for info in list_ports.comports():
+        description = f"{info.description} {info.manufacturer or ''}".lower()
+        if info.vid in ARDUINO_CONFIG['usb_vendor_ids'] or 'arduino' in description:
+            likely.append(info.device)
+        elif info.vid is not None:
+            # Some other USB serial device; probe it last
+            others.append(info.device)
+    ports = likely + others
+    if port:
+        ports = [port] + [p for p in ports if p != port]
+    return ports
+
+
+def probe_port(port, baud_rate=None, timeout=None, cancel=None):
+    """Open ``port`` and wait for the board's banner.
+
+    Returns the open serial.Serial on success, otherwise None.  ``cancel``
+    (a threading.Event) ends the wait early once another probe has won.
+    """
+    import serial
+    baud_rate = baud_rate or ARDUINO_CONFIG['baud_rate']
+    deadline = time.time() + (timeout or ARDUINO_CONFIG['handshake_timeout'])
+    try:
+        conn = serial.Serial(port=port, baudrate=baud_rate, timeout=0.1,
+                             write_timeout=ARDUINO_CONFIG['write_timeout'])
+    except (serial.SerialException, OSError):
+        return None
+    received = b""
+    try:
+        while time.time() < deadline and not (cancel and cancel.is_set()):
+            received += conn.read(conn.in_waiting or 1)
+            if ARDUINO_CONFIG['banner'].encode() in received:
+                return conn
+    except (serial.SerialException, OSError):
+        pass
+    conn.close()
+    return None
+
+
+def discover_arduino(port=None, baud_rate=None, timeout=None):
+    """Probe every candidate port at once; returns (port, serial.Serial) or (None, None).
+
+    An explicitly given ``port`` that opens but stays silent is still
+    accepted (e.g. a board without auto-reset that printed its banner long
+    ago); discovered ports must answer with the banner.
+    """
+    import serial
+    ports = candidate_ports(port)
+    if not ports:
+        return None, None
+    found = threading.Event()
+    winner = {}
+    lock = threading.Lock()
+
+    def probe(candidate):
+        conn = probe_port(candidate, baud_rate, timeout, cancel=found)
+        if conn is None:
+            return
+        with lock:
+            if 'conn' in winner:
+                conn.close()
+                return
+            winner.update(port=candidate, conn=conn)
+        found.set()
+
+    executor = ThreadPoolExecutor(max_workers=min(len(ports), ARDUINO_CONFIG['probe_workers']),
+                                  thread_name_prefix="arduino-probe")
+    for candidate in ports:
+        executor.submit(probe, candidate)
+    executor.shutdown(wait=True)
+    if winner:
+        return winner['port'], winner['conn']
+    if port:
+        try:
+            conn = serial.Serial(port=port, baudrate=baud_rate or ARDUINO_CONFIG['baud_rate'], timeout=0.1,
+                                 write_timeout=ARDUINO_CONFIG['write_timeout'])
+            print(f"⚠️ No banner from {port}; using it anyway because it was given explicitly")
+            return port, conn
+        except (serial.SerialException, OSError):
+            pass
+    return None, None
+
+
+def discovery_timeout(port=None, timeout=None):
+    """Worst-case seconds discover_arduino() takes: one handshake per wave of ``probe_workers`` ports."""
+    waves = -(-len(candidate_ports(port)) // ARDUINO_CONFIG['probe_workers'])
+    return max(1, waves) * (timeout or ARDUINO_CONFIG['handshake_timeout'])
+
+
+class ArduinoLink(threading.Thread):
+    """Owns the serial port on a background thread and mirrors the latest alarm state to it.
+
+    ``set_state(active)`` never blocks: it only replaces the pending state.
+    The thread discovers the board, writes '1'/'0' when the state differs
+    from what the board last got, and rediscovers it after a write fails.
+    ``searching`` turns False once it has given up; rediscover() resumes.
+    """
+
+    def __init__(self, port=None, baud_rate=None):
+        super().__init__(daemon=True)
+        self.requested_port = port
+        self.baud_rate = baud_rate or ARDUINO_CONFIG['baud_rate']
+        self.port = None
+        self.serial = None
+        self.last_reply = None
+        self._cond = threading.Condition()
+        self._desired = None
+        self._sent = None
+        self._stopped = False
+        self._first_attempt = threading.Event()
+        self._failures = 0
+        self._retry_now = False
+        self.searching = True
+        self.writes = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.connects = 0
+
+    @property
+    def connected(self):
+        return self.serial is not None
+
+    @property
+    def probed(self):
+        """True once the first discovery attempt has finished, whether or not it found a board."""
+        return self._first_attempt.is_set()
+
+    def wait_connected(self, timeout=None):
+        """Block until the first discovery attempt finished; returns whether a board was found."""
+        self._first_attempt.wait(timeout)
+        return self.connected
+
+    def rediscover(self):
+        """Probe the ports again now, also after discovery gave up."""
+        with self._cond:
+            self._failures = 0
+            self._retry_now = True
+            self.searching = True
+            self._cond.notify_all()
+
+    def set_state(self, active):
+        """Record the alarm state to send; returns at once."""
+        with self._cond:
+            active = bool(active)
+            if self._desired is not None and self._desired != self._sent and active != self._desired:
+                self.coalesced += 1  # The pending state was superseded before it reached the board
+            self._desired = active
+            self._cond.notify()
+
+    def run(self):
+        while not self._stopped:
+            if self.serial is None:
+                self._connect()
+                continue
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped or
+                                    (self._desired is not None and self._desired != self._sent))
+                if self._stopped:
+                    break
+                state = self._desired
+            self._write(state)
+        self._disconnect()
+
+    def _connect(self):
+        if not self.searching:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped or self.searching)
+            return
+        try:
+            port, conn = discover_arduino(self.requested_port, self.baud_rate)
+        except Exception as e:
+            print(f"⚠️ Arduino discovery failed: {e}")
+            port, conn = None, None
+        with self._cond:
+            self._retry_now = False
+            if port and not self._stopped:
+                self.port, self.serial = port, conn
+                self._failures = 0
+                self._sent = None  # The board rebooted on open; resend the current state
+                self.connects += 1
+                print(f"Connected to Arduino on {port}")
+            elif conn is not None:
+                conn.close()
+        self._first_attempt.set()
+        if self.serial is not None:
+            return
+        with self._cond:
+            self._failures += 1
+            limit = ARDUINO_CONFIG['max_discovery_attempts']
+            if limit and self._failures >= limit:
+                self.searching = False
+                print(f"⚠️ No Arduino found after {self._failures} attempt(s); "
+                      "serial ports are not probed again until rediscovery is requested")
+                return
+            delay = min(ARDUINO_CONFIG['reconnect_interval'] * 2 ** (self._failures - 1),
+                        ARDUINO_CONFIG['max_reconnect_interval'])
+            self._cond.wait_for(lambda: self._stopped or self._retry_now, timeout=delay)
+
+    def _write(self, state):
+        import serial
+        signal = "1" if state else "0"
+        try:
+            self.serial.write(signal.encode())
+            self.writes += 1
+            with self._cond:
+                self._sent = state
+            print(f"Sent signal {signal} to Arduino")
+            # Drain the board's acknowledgements so its replies never fill the input buffer
+            waiting = self.serial.in_waiting
+            if waiting:
+                lines = self.serial.read(waiting).decode(errors='ignore').strip().splitlines()
+                if lines:
+                    self.last_reply = lines[-1]
+        except (serial.SerialException, OSError) as e:
+            self.errors += 1
+            print(f"⚠️ Arduino on {self.port} stopped responding ({e}); reconnecting in the background")
+            self._disconnect()
+
+    def _disconnect(self):
+        if self.serial is not None:
+            try:
+                self.serial.close()
+            except Exception:
+                pass
+            self.serial = None
+
+    def close(self, timeout=2.0):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self.is_alive():
+            self.join(timeout)
+        self._disconnect()
+
+    def stats(self):
+        return {
+            'port': self.port if self.connected else None,
+            'searching': self.searching,
+            'writes': self.writes,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+            'connects': self.connects
+        }
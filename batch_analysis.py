@@ -0,0 +1,398 @@
+"""
+Headless batch analysis of recorded video for incident review.
+
+Video files (or whole directories of them) are decoded on a background
+thread, keeping every Nth frame; skipped frames are only grabbed, or seeked
+over when the stride is large, so they cost almost nothing.  Kept frames are
+grouped into batches and run through a pool of inference workers, each with
+its own model: threads in this process, or with ``processes`` a
+process_pool.ProcessInferencePool fed through shared memory.  Results are
+written, in order, to a compact per-frame or per-event index (JSONL, or
+Parquet when pyarrow is installed) with video timestamps, and
+progress/throughput is reported as it goes.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from evidence_store import result_record
+from threat_detection import DETECTION_CONFIG, detect_batch, load_yolo, warmup_model
+from tracker import ThreatTracker
+
+# Batch analysis configuration
+BATCH_CONFIG = {
+    'extensions': ('.mp4', '.avi', '.mkv', '.mov', '.m4v', '.mpg', '.ts'),
+    'stride': 5,              # Analyse every Nth frame
+    'seek_stride': 30,        # From this stride on, seek instead of grabbing skipped frames
+    'batch_size': 8,          # Frames per forward pass
+    'workers': 2,             # Inference threads, each with its own model
+    'processes': 0,           # If set, use this many model processes instead of threads
+    'index': 'events',        # 'events' (one record per incident) or 'frames' (one per frame with detections)
+    'output': 'analysis_index.jsonl',
+    'report_every': 2.0       # Seconds between progress lines
+}
+
+
+def find_videos(paths):
+    """Expand files and directories into a sorted list of video files."""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in files
+                              if name.lower().endswith(BATCH_CONFIG['extensions']))
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            print(f"⚠️ Not found, skipping: {path}")
+    return sorted(videos)
+
+
+def video_info(path):
+    """Return (fps, frame_count) for a video file, or None if it cannot be opened."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return None
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return fps, frames
+
+
+def expected_frames(fps, frame_count, stride=None, start=0.0, end=None):
+    """Number of frames iter_frames() yields for a video of frame_count frames."""
+    stride = stride or BATCH_CONFIG['stride']
+    first = int(start * fps) if start else 0
+    last = frame_count if end is None else min(frame_count, int(end * fps) + 1)
+    return max(0, -(-(last - first) // stride))
+
+
+def iter_frames(path, stride=None, start=0.0, end=None):
+    """Yield (frame_index, timestamp_seconds, frame) for every stride-th frame of a video."""
+    stride = stride or BATCH_CONFIG['stride']
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        print(f"❌ Could not open video: {path}")
+        return
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    index = 0
+    if start:
+        index = int(start * fps)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+    seek = stride >= BATCH_CONFIG['seek_stride']
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            timestamp = index / fps
+            if end is not None and timestamp > end:
+                break
+            yield index, timestamp, frame
+            if seek:
+                index += stride
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                continue
+            index += 1
+            # grab() demuxes and decodes but skips the conversion to a BGR array
+            for _ in range(stride - 1):
+                if not cap.grab():
+                    return
+                index += 1
+    finally:
+        cap.release()
+
+
+class IndexWriter:
+    """Writes index records as JSONL as they arrive, or as Parquet at the end."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.lower().endswith('.parquet')
+        self.count = 0
+        self._rows = []
+        self._file = None if self.parquet else open(path, 'w')
+
+    def write(self, record):
+        self.count += 1
+        if self.parquet:
+            self._rows.append(record)
+        else:
+            self._file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        if not self.parquet:
+            self._file.close()
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            fallback = os.path.splitext(self.path)[0] + '.jsonl'
+            print(f"⚠️ pyarrow is not installed; writing {fallback} instead")
+            with open(fallback, 'w') as f:
+                for record in self._rows:
+                    f.write(json.dumps(record) + '\n')
+            self.path = fallback
+            return
+        # Nested lists do not round-trip cleanly through every reader; store them as JSON text
+        rows = [{k: json.dumps(v) if isinstance(v, (list, dict)) else v for k, v in record.items()}
+                for record in self._rows]
+        pq.write_table(pa.Table.from_pylist(rows), self.path)
+
+
+class EventIndexer:
+    """Turns the per-frame results of one video into incident records.
+
+    Uses the same ThreatTracker as the live loops, driven by video time, so
+    an incident here matches what would have raised a live alert.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tracker = ThreatTracker()
+        self._event = None
+
+    def feed(self, frame_index, timestamp, result):
+        """Feed one result; returns a finished event record or None."""
+        active = self.tracker.update(result, timestamp)
+        if active:
+            if self._event is None:
+                self._event = {'file': self.path, 'start': round(timestamp, 3), 'end': round(timestamp, 3),
+                               'start_frame': frame_index, 'peak_conf': 0.0, 'peak_frame': frame_index,
+                               'frames': 0, 'classes': set()}
+            event = self._event
+            event['end'], event['frames'] = round(timestamp, 3), event['frames'] + 1
+            confidence = result.threat_confidence
+            if confidence > event['peak_conf']:
+                event['peak_conf'], event['peak_frame'] = round(confidence, 3), frame_index
+            event['classes'].update(result.class_names.get(int(c), str(c))
+                                    for c in result.class_ids[result.threat_mask])
+            return None
+        return self.finish()
+
+    def finish(self):
+        event, self._event = self._event, None
+        if event is not None:
+            event['classes'] = sorted(event['classes'])
+        return event
+
+
+class BatchAnalyzer:
+    """Decode thread -> inference worker pool -> in-order index writer."""
+
+    def __init__(self, videos, output=None, index=None, stride=None, batch_size=None, workers=None,
+                 start=0.0, end=None, processes=None, backend=None, num_threads=None):
+        self.videos = videos
+        self.output = output or BATCH_CONFIG['output']
+        self.index = index or BATCH_CONFIG['index']
+        self.stride = stride or BATCH_CONFIG['stride']
+        self.batch_size = batch_size or BATCH_CONFIG['batch_size']
+        self.workers = workers or BATCH_CONFIG['workers']
+        self.processes = processes or BATCH_CONFIG['processes']
+        self.start, self.end = start, end
+        self.backend = backend or DETECTION_CONFIG['backend']
+        self.num_threads = num_threads or DETECTION_CONFIG['num_threads']
+        # The process pool is fed by a single submitting thread
+        self._consumers = 1 if self.processes else self.workers
+        self._batches = queue.Queue(maxsize=self.workers * 2)
+        self._results = queue.Queue()
+        self._stop = threading.Event()
+        self.frames_analysed = 0
+        self.video_seconds = 0.0
+        self.events = 0
+
+    def _guarded(self, stage, *args):
+        """Run a pipeline thread; if it fails, stop the analysis instead of leaving run() waiting."""
+        try:
+            stage(*args)
+        except Exception as e:
+            print(f"❌ Batch analysis {stage.__name__.strip('_')} stage failed: {e!r}; stopping the analysis")
+            self._stop.set()
+            self._results.put(None)
+
+    def _decode(self):
+        """Producer: (seq, video_no, [(frame_index, timestamp, frame), ...]) batches, then a None per worker."""
+        seq = 0
+        for video_no, path in enumerate(self.videos):
+            batch = []
+            for item in iter_frames(path, self.stride, self.start, self.end):
+                if self._stop.is_set():
+                    break
+                batch.append(item)
+                if len(batch) == self.batch_size:
+                    self._batches.put((seq, video_no, batch))
+                    seq, batch = seq + 1, []
+            if batch:
+                self._batches.put((seq, video_no, batch))
+                seq += 1
+            # Marks the end of this video for the writer
+            self._batches.put((seq, video_no, None))
+            seq += 1
+        for _ in range(self._consumers):
+            self._batches.put(None)
+
+    def _infer(self, model):
+        while True:
+            item = self._batches.get()
+            if item is None:
+                break
+            seq, video_no, batch = item
+            results = None
+            if batch is not None:
+                results = detect_batch([frame for _, _, frame in batch], model)
+                # Frames are not needed past this point; keep only index and timestamp
+                batch = [(index, timestamp) for index, timestamp, _ in batch]
+            self._results.put((seq, video_no, batch, results))
+
+    def _submit_to_pool(self, pool, submitted):
+        """Copy each decoded frame into a shared-memory slot; blocks while every slot is in flight."""
+        while True:
+            item = self._batches.get()
+            if item is None:
+                break
+            seq, video_no, batch = item
+            seqs = None
+            if batch is not None:
+                seqs = [pool.submit(frame) for _, _, frame in batch]
+                batch = [(index, timestamp) for index, timestamp, _ in batch]
+            submitted.put((seq, video_no, batch, seqs))
+        submitted.put(None)
+
+    def _collect_from_pool(self, pool, submitted):
+        """Pool results arrive in submission order, so they line up with the batches."""
+        from process_pool import PROCESS_POOL_CONFIG
+        while True:
+            item = submitted.get()
+            if item is None:
+                break
+            seq, video_no, batch, seqs = item
+            results = None
+            if seqs is not None:
+                results = []
+                for _ in seqs:
+                    # Dead workers fail their frames; a timeout means the pool itself is stuck
+                    done = pool.get(timeout=PROCESS_POOL_CONFIG['result_timeout'])
+                    if done is None:
+                        print(f"❌ No result from the inference processes for "
+                              f"{PROCESS_POOL_CONFIG['result_timeout']:.0f} s; stopping the analysis")
+                        self._stop.set()
+                        self._results.put(None)
+                        return
+                    results.append(done[1])
+            self._results.put((seq, video_no, batch, results))
+
+    def _start_workers(self):
+        """Start the inference stage; returns the process pool to close afterwards, if any."""
+        if self.processes:
+            from process_pool import ProcessInferencePool
+            pool = ProcessInferencePool(self.processes, num_threads=self.num_threads, backend=self.backend).start()
+            submitted = queue.Queue()
+            threading.Thread(target=self._guarded, args=(self._submit_to_pool, pool, submitted), daemon=True).start()
+            threading.Thread(target=self._guarded, args=(self._collect_from_pool, pool, submitted),
+                             daemon=True).start()
+            return pool
+        # Split the cores between workers unless a thread count was given explicitly
+        threads = self.num_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        for _ in range(self.workers):
+            model = load_yolo(self.backend, num_threads=threads)
+            warmup_model(model, runs=1)
+            threading.Thread(target=self._guarded, args=(self._infer, model), daemon=True).start()
+        return None
+
+    def run(self):
+        total_frames = 0
+        fps = {}
+        for path in self.videos:
+            fps[path], frame_count = video_info(path) or (30.0, 0)
+            total_frames += expected_frames(fps[path], frame_count, self.stride, self.start, self.end)
+
+        print(f"\n🎬 Analysing {len(self.videos)} video(s), frame stride {self.stride}, "
+              f"{self.processes or self.workers} {'process' if self.processes else 'thread'} worker(s) "
+              f"x batch {self.batch_size} -> {self.output} ({self.index})")
+        pool = self._start_workers()
+        writer = IndexWriter(self.output)
+        started = last_report = time.time()
+        threading.Thread(target=self._guarded, args=(self._decode,), daemon=True).start()
+
+        pending = {}
+        next_seq = 0
+        indexer = None
+        finished = 0
+        try:
+            while finished < len(self.videos):
+                item = self._results.get()
+                if item is None:
+                    break
+                seq, video_no, batch, results = item
+                pending[seq] = (video_no, batch, results)
+                # Workers finish out of order; write strictly in decode order
+                while next_seq in pending:
+                    video_no, batch, results = pending.pop(next_seq)
+                    next_seq += 1
+                    path = self.videos[video_no]
+                    if batch is None:
+                        if indexer is not None:
+                            self._write_event(writer, indexer.finish())
+                        indexer = None
+                        finished += 1
+                        continue
+                    if indexer is None:
+                        indexer = EventIndexer(path)
+                    for (frame_index, timestamp), result in zip(batch, results):
+                        self.frames_analysed += 1
+                        if result is None:
+                            continue
+                        if self.index == 'frames':
+                            if len(result.boxes) or not result.valid:
+                                record = {'file': path, 'frame': frame_index, 't': round(timestamp, 3)}
+                                record.update(result_record(result))
+                                writer.write(record)
+                        else:
+                            self._write_event(writer, indexer.feed(frame_index, timestamp, result))
+                    self.video_seconds += len(batch) * self.stride / fps[path]
+
+                now = time.time()
+                if now - last_report >= BATCH_CONFIG['report_every']:
+                    last_report = now
+                    self._report(now - started, total_frames, finished)
+        except KeyboardInterrupt:
+            print("\n⏹️ Interrupted; writing what has been analysed so far")
+            self._stop.set()
+        finally:
+            writer.close()
+            if pool is not None:
+                pool.report()
+                pool.close()
+
+        elapsed = time.time() - started
+        self._report(elapsed, total_frames, finished)
+        print(f"✅ Done: {self.frames_analysed} frames in {elapsed:.1f} s, "
+              f"{self.video_seconds:.0f} s of video ({self.video_seconds / max(elapsed, 1e-9):.1f}x real time), "
+              f"{self.events if self.index == 'events' else writer.count} record(s) -> {writer.path}")
+        return writer.path
+
+    def _write_event(self, writer, event):
+        if event is not None:
+            self.events += 1
+            writer.write(event)
+
+    def _report(self, elapsed, total_frames, finished):
+        fps = self.frames_analysed / elapsed if elapsed > 0 else 0.0
+        progress = f"{self.frames_analysed / total_frames:.0%}" if total_frames else "?"
+        print(f"[BATCH] {finished}/{len(self.videos)} videos | {progress} | {fps:.1f} frames/s | "
+              f"{self.video_seconds / max(elapsed, 1e-9):.1f}x real time | events {self.events}")
+
+
+def run_batch_analysis(paths, **kwargs):
+    """CLI entry point: analyse video files/directories and write the detection index."""
+    videos = find_videos(paths)
+    if not videos:
+        print("❌ No video files found")
+        return None
+    return BatchAnalyzer(videos, **kwargs).run()
@@ -0,0 +1,241 @@
+"""
+Background reconnection for live camera sources (DroidCam, RTSP, webcams).
+
+A dropped Wi-Fi link used to end the session: cap.read() failed, the
+capture thread printed "Failed to grab frame" and the program stopped.
+SupervisedCapture wraps a source behind the cv2.VideoCapture calls the
+pipeline uses.  A reader thread pulls frames; a supervisor thread watches
+for read failures and for gaps between frame arrivals (a hung network read
+never returns on its own), abandons the stuck connection and reopens the
+source with exponential backoff.  Meanwhile read() keeps returning the last
+good frame, flagged ``stale``, so the preview, the tracks and the alarm
+state stay where they were until live frames return.
+"""
+
+import threading
+import time
+
+import cv2
+
+# Camera supervision configuration
+SUPERVISOR_CONFIG = {
+    'stall_timeout': 3.0,      # Seconds without a new frame before the connection counts as stalled
+    'open_timeout': 5.0,       # FFmpeg open timeout for stream URLs (OpenCV >= 4.6)
+    'read_timeout': 3.0,       # FFmpeg per-read timeout for stream URLs (OpenCV >= 4.6)
+    'initial_backoff': 0.5,    # Seconds before the first reconnect attempt
+    'max_backoff': 30.0,       # Backoff doubles after each failed attempt up to this
+    'stale_interval': 0.5,     # Once the source is declared down, read() re-serves the last frame this often
+    'check_interval': 0.25,    # How often the supervisor checks for stalls
+    'max_attempts': 0          # Failed reconnects in a row before giving up (0 = never give up)
+}
+
+
+def open_capture(source):
+    """Open a camera index or stream URL with the usual low-latency settings; None if it fails."""
+    if isinstance(source, int) or str(source).isdigit():
+        cap = cv2.VideoCapture(int(source))
+    else:
+        params = []
+        # Bound how long FFmpeg may block, so a dead host cannot hang the reader for minutes
+        for prop, key in (('CAP_PROP_OPEN_TIMEOUT_MSEC', 'open_timeout'), ('CAP_PROP_READ_TIMEOUT_MSEC', 'read_timeout')):
+            if hasattr(cv2, prop):
+                params += [getattr(cv2, prop), int(SUPERVISOR_CONFIG[key] * 1000)]
+        cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG, params) if params else cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        cap.release()
+        return None
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    cap.set(cv2.CAP_PROP_FPS, 30)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce buffer size for lower latency
+    return cap
+
+
+class SupervisedCapture:
+    """A live source that reconnects itself; drop-in for the cv2.VideoCapture read loop.
+
+    ``source`` is what open_capture() reopens; ``cap`` is an already open
+    capture to start from.  read() blocks until a new frame arrives; once
+    the supervisor has declared the source down (not merely slower than
+    ``stale_interval``) it returns the last good frame every
+    ``stale_interval`` seconds with ``stale`` set and ``frame_time`` left at
+    the time that frame was captured.  It returns (False, None) only after
+    release() or once ``max_attempts`` reconnects failed in a row.
+    """
+
+    def __init__(self, source, cap=None, name=None, opener=None):
+        self.source = source
+        self.name = name or str(source)
+        self.opener = opener or open_capture
+        self.state = 'connecting'      # 'connecting', 'live', 'reconnecting' or 'failed'
+        self.stale = False
+        self.frame_time = None
+        self.reconnects = 0
+        self.stalls = 0
+        self.downtime = 0.0
+        self._cap = cap
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_id = 0
+        self._read_id = 0
+        self._generation = 0
+        self._reader_failed = None
+        self._connected_at = 0.0
+        self._frames_at_connect = 0
+        self._props = {}
+        self._stopped = False
+        self._thread = threading.Thread(target=self._supervise, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def wait_ready(self, timeout=None):
+        """Block until the first frame arrived; returns False on timeout or failure."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._frame is not None or self.state == 'failed' or self._stopped,
+                                       timeout) and self._frame is not None
+
+    def read(self):
+        with self._cond:
+            while True:
+                self._cond.wait_for(lambda: self._frame_id > self._read_id or self._stopped or self.state == 'failed',
+                                    SUPERVISOR_CONFIG['stale_interval'])
+                if self._stopped or self.state == 'failed':
+                    return False, None
+                if self._frame_id > self._read_id:
+                    self._read_id = self._frame_id
+                    self.stale = False
+                    return True, self._frame
+                if self._frame is not None and self.state != 'live':
+                    self.stale = True
+                    return True, self._frame
+                # Still waiting for the very first frame, or a live source that is just slow
+
+    def isOpened(self):
+        return not self._stopped and self.state != 'failed'
+
+    def get(self, prop):
+        cap = self._cap
+        return cap.get(prop) if cap is not None else 0.0
+
+    def set(self, prop, value):
+        """Remember a capture property; it is applied whenever the source is (re)opened."""
+        self._props[prop] = value
+        return True
+
+    def release(self):
+        with self._cond:
+            self._stopped = True
+            self._generation += 1
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    def _reader(self, cap, generation):
+        while True:
+            ret, frame = cap.read()
+            with self._cond:
+                if generation != self._generation:
+                    break  # Abandoned by the supervisor (stall) or released
+                if not ret or frame is None:
+                    self._reader_failed = generation
+                    self._cond.notify_all()
+                    break
+                self._frame = frame
+                self._frame_id += 1
+                self.frame_time = time.time()
+                self._cond.notify_all()
+        cap.release()
+
+    def _connect(self, cap):
+        # Before the reader starts: OpenCV captures are not safe to touch from two threads
+        for prop, value in self._props.items():
+            cap.set(prop, value)
+        with self._cond:
+            self._generation += 1
+            generation = self._generation
+            self._cap = cap
+            self._connected_at = time.time()
+            self._frames_at_connect = self._frame_id
+        threading.Thread(target=self._reader, args=(cap, generation), daemon=True).start()
+
+    def _supervise(self):
+        backoff = SUPERVISOR_CONFIG['initial_backoff']
+        attempts = 0
+        down_since = None
+        if self._cap is not None:
+            self._connect(self._cap)
+        while not self._stopped:
+            if self._cap is None:
+                cap = self.opener(self.source)
+                if self._stopped:
+                    if cap is not None:
+                        cap.release()
+                    break
+                if cap is None:
+                    attempts += 1
+                    if self._give_up(attempts):
+                        break
+                    print(f"⚠️ [CAMERA] {self.name}: could not open, retrying in {backoff:.1f} s")
+                    with self._cond:
+                        self._cond.wait_for(lambda: self._stopped, backoff)
+                    backoff = min(backoff * 2, SUPERVISOR_CONFIG['max_backoff'])
+                    continue
+                self._connect(cap)
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped or self._reader_failed == self._generation,
+                                    SUPERVISOR_CONFIG['check_interval'])
+                if self._stopped:
+                    break
+                now = time.time()
+                fresh = self._frame_id > self._frames_at_connect
+                last_frame = self.frame_time if fresh else self._connected_at
+                failed = self._reader_failed == self._generation
+                if fresh and self.state != 'live':
+                    if down_since is not None:
+                        self.downtime += now - down_since
+                        self.reconnects += 1
+                        print(f"✅ [CAMERA] {self.name}: reconnected after {now - down_since:.1f} s")
+                    self.state = 'live'
+                    down_since = None
+                    backoff = SUPERVISOR_CONFIG['initial_backoff']
+                    attempts = 0
+                if not failed and now - last_frame < SUPERVISOR_CONFIG['stall_timeout']:
+                    continue
+                # Read error, or no frame for stall_timeout: abandon this connection
+                # (a hung read keeps its thread until it returns, then it releases its own capture)
+                self._generation += 1
+                self._cap = None
+                if self.state != 'live':
+                    attempts += 1  # Opened, but never delivered a frame
+                    if self._give_up(attempts, locked=True):
+                        break
+                else:
+                    self.stalls += 1
+                    down_since = last_frame
+                    reason = "read failed" if failed else f"no frame for {now - last_frame:.1f} s"
+                    print(f"⚠️ [CAMERA] {self.name}: {reason}, reconnecting in the background")
+                self.state = 'reconnecting' if self._frame is not None else 'connecting'
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: self._stopped, backoff)
+            backoff = min(backoff * 2, SUPERVISOR_CONFIG['max_backoff'])
+
+    def _give_up(self, attempts, locked=False):
+        if not SUPERVISOR_CONFIG['max_attempts'] or attempts < SUPERVISOR_CONFIG['max_attempts']:
+            return False
+        if not locked:
+            with self._cond:
+                return self._give_up(attempts, locked=True)
+        print(f"❌ [CAMERA] {self.name}: giving up after {attempts} failed attempt(s)")
+        self.state = 'failed'
+        self._cond.notify_all()
+        return True
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'stalls': self.stalls,
+            'reconnects': self.reconnects,
+            'downtime_s': self.downtime
+        }
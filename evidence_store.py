@@ -0,0 +1,241 @@
+"""
+Evidence store for saved frames: written in the background, indexed, pruned.
+
+Saving a frame used to run cv2.imwrite on the detection loop and name the
+file by the second in the working directory, so two saves in one second
+overwrote each other.  EvidenceStore takes EncodedFrames (manual saves, and
+through alert_aggregator every frame an alert carries) through a bounded
+queue and one writer thread does the JPEG encoding (reusing the bytes if the
+alert e-mail already encoded them) and the disk I/O.  Files get collision-free ids
+and land in date-partitioned directories (``evidence/YYYY/MM/DD/``); each
+one gets an index record with its detections (JSONL or SQLite), and a
+retention sweep drops whole days past ``max_age_days`` and the oldest files
+beyond ``max_total_mb``.
+"""
+
+import itertools
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Evidence store configuration
+EVIDENCE_CONFIG = {
+    'root': 'evidence',          # Files go to root/YYYY/MM/DD/
+    'queue_size': 32,            # Frames waiting for the writer; further saves are counted as dropped
+    'index': 'jsonl',            # 'jsonl' (root/index.jsonl) or 'sqlite' (root/index.sqlite)
+    'max_total_mb': 2048,        # Oldest files are deleted beyond this (0 = no size limit)
+    'max_age_days': 30,          # Whole days older than this are deleted (0 = keep forever)
+    'retention_interval': 300.0  # Seconds between retention sweeps
+}
+
+_sequence = itertools.count(1)
+
+
+def result_record(result):
+    """Compact, JSON-friendly summary of one DetectionResult."""
+    return {
+        'threat': bool(result.threat_detected),
+        'level': result.threat_details.get('threat_level'),
+        'objects': [{'class': d.class_name, 'conf': round(d.confidence, 3),
+                     'box': [round(float(v), 1) for v in d.box], 'threat': d.is_threat}
+                    for d in result.detections]
+    }
+
+
+class EvidenceIndex:
+    """Per-image records: JSONL appended line by line, or one SQLite table."""
+
+    def __init__(self, root, kind):
+        self.kind = kind
+        if kind == 'sqlite':
+            import sqlite3
+            self.path = os.path.join(root, 'index.sqlite')
+            self._db = sqlite3.connect(self.path)
+            self._db.execute("CREATE TABLE IF NOT EXISTS evidence (id TEXT PRIMARY KEY, path TEXT, captured_at TEXT, "
+                             "source TEXT, kind TEXT, bytes INTEGER, threat INTEGER, level TEXT, objects TEXT)")
+            self._db.commit()
+        else:
+            self.path = os.path.join(root, 'index.jsonl')
+            self._file = open(self.path, 'a')
+
+    def add(self, record):
+        if self.kind == 'sqlite':
+            self._db.execute("INSERT INTO evidence VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             (record['id'], record['path'], record['captured_at'], record['source'], record['kind'],
+                              record['bytes'], int(bool(record.get('threat'))), record.get('level'),
+                              json.dumps(record.get('objects', []))))
+            self._db.commit()
+        else:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def remove(self, ids):
+        """Drop the records of pruned files (the JSONL file is rewritten without them)."""
+        if not ids:
+            return
+        if self.kind == 'sqlite':
+            self._db.executemany("DELETE FROM evidence WHERE id = ?", [(i,) for i in ids])
+            self._db.commit()
+            return
+        self._file.close()
+        tmp_path = self.path + '.tmp'
+        with open(self.path) as src, open(tmp_path, 'w') as dst:
+            for line in src:
+                try:
+                    if json.loads(line).get('id') in ids:
+                        continue
+                except ValueError:
+                    continue
+                dst.write(line)
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'a')
+
+    def close(self):
+        if self.kind == 'sqlite':
+            self._db.close()
+        else:
+            self._file.close()
+
+
+class EvidenceStore(threading.Thread):
+    """Background writer for saved frames.
+
+    ``submit(image, result=None, source='Default', kind='manual')`` takes a
+    frame_encoding.EncodedFrame (plus the DetectionResult it shows) and
+    returns its evidence id at once, or None if the queue is full.
+    """
+
+    def __init__(self, root=None, index=None):
+        super().__init__(daemon=True)
+        self.root = root or EVIDENCE_CONFIG['root']
+        self.index_kind = index or EVIDENCE_CONFIG['index']
+        self._queue = queue.Queue(maxsize=EVIDENCE_CONFIG['queue_size'])
+        self._last_sweep = 0.0
+        self.saved = 0
+        self.dropped = 0
+        self.failed = 0
+        self.pruned = 0
+
+    def submit(self, image, result=None, source="Default", kind="manual"):
+        evidence_id = f"{image.captured_at.strftime('%Y%m%d_%H%M%S_%f')}_{os.getpid()}_{next(_sequence)}"
+        try:
+            self._queue.put_nowait((evidence_id, image, result, source, kind))
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠️ [EVIDENCE] Writer queue full ({self._queue.maxsize}); frame not saved")
+            return None
+        return evidence_id
+
+    def path_for(self, evidence_id, captured_at):
+        return os.path.join(self.root, captured_at.strftime('%Y'), captured_at.strftime('%m'), captured_at.strftime('%d'),
+                            f"threat_detection_{evidence_id}.jpg")
+
+    def run(self):
+        os.makedirs(self.root, exist_ok=True)
+        index = EvidenceIndex(self.root, self.index_kind)
+        try:
+            self._sweep(index)
+            while True:
+                try:
+                    item = self._queue.get(timeout=EVIDENCE_CONFIG['retention_interval'])
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item:
+                    self._write(index, *item)
+                if time.time() - self._last_sweep >= EVIDENCE_CONFIG['retention_interval']:
+                    self._sweep(index)
+        finally:
+            index.close()
+
+    def _write(self, index, evidence_id, image, result, source, kind):
+        path = self.path_for(evidence_id, image.captured_at)
+        try:
+            data = image.jpeg  # Already encoded if the alert e-mail with this frame was built first
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'xb') as f:  # Never overwrite an existing file
+                f.write(data)
+        except Exception as e:
+            self.failed += 1
+            print(f"❌ [EVIDENCE] Could not save {path}: {e}")
+            return
+        record = {
+            'id': evidence_id,
+            'path': os.path.relpath(path, self.root),
+            'captured_at': image.captured_at.isoformat(timespec='milliseconds'),
+            'source': str(source),
+            'kind': kind,
+            'bytes': len(data)
+        }
+        if result is not None:
+            record.update(result_record(result))
+        try:
+            index.add(record)
+        except Exception as e:
+            print(f"⚠️ [EVIDENCE] Could not index {evidence_id}: {e}")
+        self.saved += 1
+
+    def _sweep(self, index):
+        """Apply the age and size limits; returns the number of files deleted."""
+        self._last_sweep = time.time()
+        removed = []
+        days = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            rel = os.path.relpath(dirpath, self.root).split(os.sep)
+            if len(rel) == 3:
+                days.append((dirpath, sorted(filenames)))
+        if EVIDENCE_CONFIG['max_age_days']:
+            cutoff = (datetime.now() - timedelta(days=EVIDENCE_CONFIG['max_age_days'])).strftime('%Y%m%d')
+            while days and ''.join(os.path.relpath(days[0][0], self.root).split(os.sep)) < cutoff:
+                dirpath, filenames = days.pop(0)
+                removed += [f for f in filenames if f.endswith('.jpg')]
+                shutil.rmtree(dirpath, ignore_errors=True)
+                try:
+                    os.removedirs(os.path.dirname(dirpath))  # Month and year directories left empty
+                except OSError:
+                    pass
+        if EVIDENCE_CONFIG['max_total_mb']:
+            files = [os.path.join(dirpath, f) for dirpath, filenames in days for f in filenames if f.endswith('.jpg')]
+            sizes = [os.path.getsize(p) for p in files]
+            total = sum(sizes)
+            limit = EVIDENCE_CONFIG['max_total_mb'] * 1024 * 1024
+            # Names start with the capture time, so this walks from the oldest file
+            for path, size in zip(files, sizes):
+                if total <= limit:
+                    break
+                os.remove(path)
+                total -= size
+                removed.append(os.path.basename(path))
+        if removed:
+            index.remove({name[len('threat_detection_'):-len('.jpg')] for name in removed})
+            self.pruned += len(removed)
+            print(f"🧹 [EVIDENCE] Retention removed {len(removed)} file(s)")
+        return len(removed)
+
+    def stop(self, timeout=10.0):
+        """Write what is queued (up to timeout), then close the index."""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.join(timeout)
+
+    def stats(self):
+        return {
+            'saved': self.saved,
+            'queued': self._queue.qsize(),
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'pruned': self.pruned
+        }
+
+    def report(self):
+        s = self.stats()
+        print(f"💾 Evidence: {s['saved']} saved, {s['dropped']} dropped (queue full), {s['failed']} failed, "
+              f"{s['queued']} still queued | {s['pruned']} pruned by retention | {self.root}")
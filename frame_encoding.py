@@ -0,0 +1,61 @@
+"""
+In-memory JPEG encoding for alert frames.
+
+An alert frame is compressed once, in memory, and the same bytes are reused
+by every sink (e-mail attachment, alert evidence), so there is no temp-file
+round trip and no filename collisions between alerts.
+"""
+
+import itertools
+import threading
+from datetime import datetime
+
+import cv2
+
+# JPEG encoding configuration
+JPEG_CONFIG = {
+    'quality': 85,          # cv2.IMWRITE_JPEG_QUALITY (0-100)
+    'max_dimension': 1280   # Longer side is downscaled to this before encoding (0 = keep size)
+}
+
+_sequence = itertools.count(1)
+
+
+def encode_jpeg(frame, quality=None, max_dimension=None):
+    """Encode a BGR frame to JPEG bytes, downscaling so its longer side fits max_dimension."""
+    quality = JPEG_CONFIG['quality'] if quality is None else quality
+    max_dimension = JPEG_CONFIG['max_dimension'] if max_dimension is None else max_dimension
+    h, w = frame.shape[:2]
+    if max_dimension and max(h, w) > max_dimension:
+        scale = max_dimension / max(h, w)
+        frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+class EncodedFrame:
+    """A frame that is JPEG-encoded at most once, on first use, then shared by every sink.
+
+    Keeps its own copy of the pixels until encoded, so the caller may keep
+    drawing on the original.  ``name`` is unique within the process.
+    """
+
+    def __init__(self, frame, quality=None, max_dimension=None, copy=True):
+        self.captured_at = datetime.now()
+        self.name = f"threat_detection_{self.captured_at.strftime('%Y%m%d_%H%M%S_%f')}_{next(_sequence)}.jpg"
+        self._frame = frame.copy() if copy else frame
+        self._quality = quality
+        self._max_dimension = max_dimension
+        self._jpeg = None
+        self._lock = threading.Lock()
+        self.evidence_id = None  # Set once the frame has been handed to an evidence store
+
+    @property
+    def jpeg(self):
+        with self._lock:
+            if self._jpeg is None:
+                self._jpeg = encode_jpeg(self._frame, self._quality, self._max_dimension)
+                self._frame = None  # Pixels are no longer needed
+            return self._jpeg
@@ -0,0 +1,124 @@
+"""
+Preallocated frame ring buffer shared by one producer and many consumers.
+
+Passing frames through a queue.Queue(maxsize=1) means every frame has one
+owner: whoever get()s it takes it away from everyone else (saving a frame
+in the GUI used to steal it from the display).  FrameRing keeps the last
+``slots`` frames in one preallocated NumPy block, each with a monotonic
+frame id and its capture timestamp.  The producer overwrites the oldest
+slot; consumers (display, inference, save, recorder) read the latest or a
+specific frame as a read-only view, without copying and without taking
+locks.  A view is only good until the producer wraps around to its slot,
+so a consumer that worked on one can ask valid(frame_id) afterwards; one
+that keeps a frame for longer than the ring lasts (inference, save) copies
+it and checks valid() after the copy, since a copy can be torn too.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+# Frame ring configuration
+FRAME_RING_CONFIG = {
+    'slots': 16    # Frames kept (~0.5 s at 30 fps; 640x480 BGR is 0.9 MB per slot)
+}
+
+
+@dataclass
+class RingFrame:
+    """A frame in the ring: read-only view plus its id and capture time."""
+    frame_id: int
+    timestamp: float
+    frame: np.ndarray
+
+
+class FrameRing:
+    """Fixed-shape frame slots with monotonic ids; one writer, any number of readers.
+
+    The block is allocated on the first put() (and again if the frame shape
+    changes, e.g. after a camera reconnects at another resolution; views of
+    the old block stay readable).  Readers never lock: a slot's id is
+    cleared while it is being written and set once the frame is complete,
+    which is what get() and valid() check.  Only wait_newer() blocks.
+    """
+
+    def __init__(self, slots=None):
+        self.slots = slots or FRAME_RING_CONFIG['slots']
+        self._store = None     # (frames, ids, timestamps), replaced as a whole on reallocation
+        self._latest = 0       # Id of the newest complete frame; 0 = empty
+        self._cond = threading.Condition()
+
+    def _allocate(self, shape, dtype):
+        self._store = (np.empty((self.slots,) + tuple(shape), dtype=dtype),
+                       np.zeros(self.slots, dtype=np.int64),
+                       np.zeros(self.slots, dtype=np.float64))
+        return self._store
+
+    def put(self, frame, timestamp=None):
+        """Copy a frame into the oldest slot and publish it; returns its frame id."""
+        store = self._store
+        if store is None or store[0].shape[1:] != frame.shape or store[0].dtype != frame.dtype:
+            store = self._allocate(frame.shape, frame.dtype)
+        frames, ids, timestamps = store
+        frame_id = self._latest + 1
+        slot = frame_id % self.slots
+        ids[slot] = 0  # Readers treat the slot as gone while it is overwritten
+        frames[slot] = frame
+        timestamps[slot] = timestamp if timestamp is not None else time.time()
+        ids[slot] = frame_id
+        self._latest = frame_id
+        with self._cond:
+            self._cond.notify_all()
+        return frame_id
+
+    @property
+    def latest_id(self):
+        return self._latest
+
+    def latest(self):
+        """The newest frame, or None while the ring is empty."""
+        return self.get(self._latest)
+
+    def get(self, frame_id):
+        """A specific frame, or None if it was never written or has been overwritten."""
+        store = self._store
+        if store is None or frame_id <= 0 or frame_id > self._latest:
+            return None
+        frames, ids, timestamps = store
+        slot = frame_id % self.slots
+        timestamp = float(timestamps[slot])
+        view = frames[slot]
+        if ids[slot] != frame_id:
+            return None
+        view = view.view()
+        view.flags.writeable = False  # Shared with every other consumer
+        return RingFrame(frame_id, timestamp, view)
+
+    def copy_latest(self, attempts=3):
+        """An owned copy of the newest frame, checked against overwrites; None if empty or lapped every time."""
+        for _ in range(attempts):
+            item = self.latest()
+            if item is None:
+                return None
+            frame = item.frame.copy()
+            if self.valid(item.frame_id):
+                return RingFrame(item.frame_id, item.timestamp, frame)
+        return None
+
+    def valid(self, frame_id):
+        """Whether a frame (and any view of it handed out earlier) has not been overwritten yet."""
+        store = self._store
+        return store is not None and 0 < frame_id <= self._latest and store[1][frame_id % self.slots] == frame_id
+
+    def wait_newer(self, frame_id, timeout=None):
+        """Block until a frame newer than ``frame_id`` exists; returns the latest one (None on timeout)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._latest > frame_id, timeout):
+                return None
+        return self.latest()
+
+    @property
+    def nbytes(self):
+        return self._store[0].nbytes if self._store is not None else 0
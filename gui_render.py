@@ -0,0 +1,94 @@
+"""
+Display preparation for the Tk GUI, off the Tk thread.
+
+Resizing to the video label, BGR->RGB conversion and building the PIL
+image used to run inside update_display() on the Tk main loop every tick,
+whether or not the frame had changed.  RenderWorker does that work on its
+own thread for the newest submitted frame only, at the label's current
+size; the Tk side merely pastes a ready image when a new frame id is
+available, so its per-tick cost no longer grows with camera resolution.
+"""
+
+import itertools
+import threading
+
+import cv2
+from PIL import Image
+
+from pipeline import LatestQueue, StageStats, PIPELINE_CONFIG
+
+# Render configuration
+RENDER_CONFIG = {
+    'default_size': (640, 480),   # Target size until the video label has been laid out
+    'upscale': False,             # Also enlarge frames smaller than the label
+    'ui_time_smoothing': 0.1      # Weight of the newest sample in the UI-thread time average
+}
+
+
+def fit_to(frame, size, upscale=False):
+    """Scale a frame to fit (width, height), keeping its aspect ratio."""
+    width, height = size
+    h, w = frame.shape[:2]
+    scale = min(width / w, height / h)
+    if scale < 1 or (upscale and scale > 1):
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=interpolation)
+    return frame
+
+
+class RenderWorker(threading.Thread):
+    """Turns BGR frames into display-ready PIL images at the label's size.
+
+    ``submit(frame)`` may be called from any thread (latest wins).  The Tk
+    side reports the label size with ``set_target_size()`` and calls
+    ``take()``, which returns a new image only when a newer frame was
+    rendered since the last call (else None).
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self._queue = LatestQueue(1)
+        self._ids = itertools.count(1)
+        self._size = RENDER_CONFIG['default_size']
+        self._lock = threading.Lock()
+        self._ready = None
+        self._shown_id = 0
+        self._stop_event = threading.Event()
+        self.render_stats = StageStats()
+        self.display_stats = StageStats()
+
+    def submit(self, frame):
+        self._queue.put((next(self._ids), frame))
+
+    def set_target_size(self, width, height):
+        # A label that has not been mapped yet reports 1x1
+        if width > 1 and height > 1:
+            self._size = (width, height)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            item = self._queue.get(timeout=PIPELINE_CONFIG['get_timeout'])
+            if item is None:
+                continue
+            frame_id, frame = item
+            try:
+                frame = fit_to(frame, self._size, RENDER_CONFIG['upscale'])
+                image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            except Exception as e:
+                print(f"Display error: {e}")
+                continue
+            with self._lock:
+                self._ready = (frame_id, image)
+            self.render_stats.tick()
+
+    def take(self):
+        """The newest rendered image if it has not been taken yet, else None."""
+        with self._lock:
+            if self._ready is None or self._ready[0] == self._shown_id:
+                return None
+            self._shown_id, image = self._ready
+        self.display_stats.tick()
+        return image
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,239 @@
+"""
+Pre-event recording: a clip of what happened before and after each threat.
+
+An alert e-mail or a saved frame shows the moment of detection, but not
+how the scene got there.  IncidentRecorder keeps the last ``pre_roll``
+seconds of every source in memory as JPEG (sampled at ``fps`` and capped at
+``max_memory_mb`` per source).  When a source's smoothed threat turns on,
+that pre-roll plus everything until the threat has been off for
+``post_roll`` seconds is written to one video file with cv2.VideoWriter.
+
+Callers only enqueue: JPEG compression and the ring run on the recorder
+thread, decoding and video encoding on a separate encoder thread, so
+neither ever runs on the detection or render loop.
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from frame_encoding import encode_jpeg
+
+# Incident recording configuration
+RECORDER_CONFIG = {
+    'enabled': True,
+    'pre_roll': 10.0,          # Seconds kept before a threat turns on
+    'post_roll': 10.0,         # Seconds recorded after the threat turned off
+    'max_clip': 120.0,         # Longest clip; a longer incident is cut here
+    'fps': 10.0,               # Frames per second sampled into the ring and the clip
+    'quality': 70,             # JPEG quality of buffered frames
+    'max_dimension': 960,      # Longer side of buffered frames (0 = keep size)
+    'max_memory_mb': 48,       # Pre-roll memory per source; the oldest frames go first
+    'max_pending': 30,         # Frames waiting for compression before new ones are dropped
+    'output_dir': 'incident_clips',
+    'codec': 'mp4v',           # FourCC; 'MJPG' with an .avi extension works everywhere
+    'extension': '.mp4'
+}
+
+
+class PreRollBuffer:
+    """Compressed recent frames of one source, bounded by age and by bytes."""
+
+    def __init__(self):
+        self.frames = deque()   # (timestamp, jpeg bytes)
+        self.nbytes = 0
+
+    def append(self, timestamp, jpeg):
+        self.frames.append((timestamp, jpeg))
+        self.nbytes += len(jpeg)
+        limit = RECORDER_CONFIG['max_memory_mb'] * 1024 * 1024
+        while self.frames and (self.nbytes > limit or timestamp - self.frames[0][0] > RECORDER_CONFIG['pre_roll']):
+            self.nbytes -= len(self.frames.popleft()[1])
+
+    def fps(self):
+        """Frame rate actually buffered (the camera may deliver less than the sampling rate)."""
+        if len(self.frames) < 2:
+            return RECORDER_CONFIG['fps']
+        span = self.frames[-1][0] - self.frames[0][0]
+        return min(RECORDER_CONFIG['fps'], max(1.0, (len(self.frames) - 1) / span)) if span > 0 else RECORDER_CONFIG['fps']
+
+
+class Clip:
+    """One incident clip that is still collecting post-roll frames."""
+
+    def __init__(self, clip_id, source, path, started, fps):
+        self.clip_id = clip_id
+        self.source = source
+        self.path = path
+        self.started = started
+        self.fps = fps
+        self.last_active = started
+        self.frames = 0
+
+
+class ClipEncoder(threading.Thread):
+    """Decodes buffered JPEG frames and writes them into video files, one writer per open clip."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.jobs = queue.Queue()
+        self._writers = {}
+        self._failed = set()
+        self.written = []
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            kind, clip = job[0], job[1]
+            if clip in self._failed:
+                continue
+            try:
+                if kind == 'frame':
+                    self._write(clip, job[2])
+                elif kind == 'close':
+                    self._close(clip)
+            except Exception as e:
+                self._failed.add(clip)
+                print(f"⚠️ [CLIP] Encoding failed for {clip.path}: {e}")
+        for clip in list(self._writers):
+            self._close(clip)
+
+    def _write(self, clip, jpeg):
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        entry = self._writers.get(clip)
+        if entry is None:
+            size = (frame.shape[1], frame.shape[0])
+            os.makedirs(os.path.dirname(clip.path) or '.', exist_ok=True)
+            writer = cv2.VideoWriter(clip.path, cv2.VideoWriter_fourcc(*RECORDER_CONFIG['codec']), clip.fps, size)
+            if not writer.isOpened():
+                raise RuntimeError(f"cv2.VideoWriter could not open {clip.path} with codec {RECORDER_CONFIG['codec']}")
+            entry = self._writers[clip] = (writer, size)
+        writer, size = entry
+        if (frame.shape[1], frame.shape[0]) != size:
+            frame = cv2.resize(frame, size)  # The source changed resolution mid-clip (e.g. reconnect)
+        writer.write(frame)
+
+    def _close(self, clip):
+        entry = self._writers.pop(clip, None)
+        if entry is None:
+            return
+        entry[0].release()
+        self.written.append(clip.path)
+        print(f"🎬 Incident clip saved: {clip.path} ({clip.frames} frames)")
+
+
+class IncidentRecorder(threading.Thread):
+    """Per-source pre-roll rings and incident clips.
+
+    From the detection / render loop call ``add(source, frame, timestamp)``
+    for displayed frames (the frame must not be drawn on afterwards) and
+    ``set_active(source, active, timestamp)`` with the smoothed threat
+    state.  Both only enqueue.  stop() finishes open clips.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.encoder = ClipEncoder()
+        self._queue = queue.Queue()
+        self._last_sample = {}
+        self._buffers = {}
+        self._clips = {}
+        self._clip_ids = 0
+        self.dropped = 0
+
+    def start(self):
+        self.encoder.start()
+        super().start()
+        return self
+
+    def add(self, source, frame, timestamp=None):
+        timestamp = timestamp if timestamp is not None else time.time()
+        # Sample at the recording rate; between samples this costs one comparison
+        if timestamp - self._last_sample.get(source, 0.0) < 1.0 / RECORDER_CONFIG['fps']:
+            return
+        if self._queue.qsize() >= RECORDER_CONFIG['max_pending']:
+            self.dropped += 1
+            return
+        self._last_sample[source] = timestamp
+        self._queue.put(('frame', source, frame, timestamp))
+
+    def set_active(self, source, active, timestamp=None):
+        if active:  # Clips end on post-roll time, so only "on" needs to reach the recorder thread
+            self._queue.put(('state', source, True, timestamp if timestamp is not None else time.time()))
+
+    def run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            kind, source, payload, timestamp = item
+            if kind == 'frame':
+                self._on_frame(source, payload, timestamp)
+            else:
+                self._on_state(source, payload, timestamp)
+        for clip in list(self._clips.values()):
+            self._finish(clip)
+        self.encoder.jobs.put(None)
+
+    def _on_frame(self, source, frame, timestamp):
+        try:
+            jpeg = encode_jpeg(frame, RECORDER_CONFIG['quality'], RECORDER_CONFIG['max_dimension'])
+        except Exception as e:
+            print(f"⚠️ [CLIP] Could not buffer frame from {source}: {e}")
+            return
+        self._buffers.setdefault(source, PreRollBuffer()).append(timestamp, jpeg)
+        clip = self._clips.get(source)
+        if clip is None:
+            return
+        clip.frames += 1
+        self.encoder.jobs.put(('frame', clip, jpeg))
+        if (timestamp - clip.last_active >= RECORDER_CONFIG['post_roll'] or
+                timestamp - clip.started >= RECORDER_CONFIG['max_clip']):
+            self._finish(clip)
+
+    def _on_state(self, source, active, timestamp):
+        clip = self._clips.get(source)
+        if not active:
+            return
+        if clip is not None:
+            clip.last_active = timestamp  # Threat still on (or back on during post-roll): extend
+            return
+        buffer = self._buffers.setdefault(source, PreRollBuffer())
+        self._clip_ids += 1
+        stamp = datetime.fromtimestamp(timestamp).strftime('%Y%m%d_%H%M%S')
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', str(source)).strip('_') or 'source'
+        path = os.path.join(RECORDER_CONFIG['output_dir'],
+                            f"incident_{name}_{stamp}_{self._clip_ids}{RECORDER_CONFIG['extension']}")
+        clip = self._clips[source] = Clip(self._clip_ids, source, path, timestamp, buffer.fps())
+        print(f"🎥 Recording incident clip for {source} "
+              f"({len(buffer.frames)} pre-roll frames, {buffer.nbytes / 1e6:.1f} MB buffered)")
+        for _, jpeg in buffer.frames:
+            clip.frames += 1
+            self.encoder.jobs.put(('frame', clip, jpeg))
+
+    def _finish(self, clip):
+        del self._clips[clip.source]
+        self.encoder.jobs.put(('close', clip))
+
+    def stop(self, timeout=10.0):
+        """Finish open clips and wait (up to timeout) for them to be written."""
+        self._queue.put(None)
+        self.join(timeout)
+        self.encoder.join(timeout)
+
+    def stats(self):
+        return {
+            'buffered_mb': sum(b.nbytes for b in self._buffers.values()) / 1e6,
+            'open_clips': len(self._clips),
+            'clips_written': len(self.encoder.written),
+            'dropped': self.dropped
+        }
@@ -0,0 +1,111 @@
+"""
+Exported-model backends for CPU inference.
+
+The PyTorch ``.pt`` weights are exported once to ONNX or OpenVINO and the
+artifact is cached next to the weights.  Later runs load the cached file
+directly.  The CPU thread count is applied to whichever engine ends up
+running the model.
+"""
+
+import os
+
+import numpy as np
+
+# Backend name -> (ultralytics export format, suffix appended to the weights stem)
+BACKENDS = {
+    'pytorch': (None, '.pt'),
+    'onnx': ('onnx', '.onnx'),
+    'openvino': ('openvino', '_openvino_model'),
+    # Quantized variants are produced by quantize_model.py, never exported implicitly
+    'onnx-int8': (None, '_int8.onnx'),
+    'openvino-fp16': (None, '_fp16_openvino_model')
+}
+
+# Backend name -> engine that runs it
+ENGINES = {
+    'pytorch': 'pytorch',
+    'onnx': 'onnx',
+    'openvino': 'openvino',
+    'onnx-int8': 'onnx',
+    'openvino-fp16': 'openvino'
+}
+
+
+def exported_model_path(weights_path, backend):
+    """Return where the exported artifact for a backend is cached."""
+    stem, _ = os.path.splitext(weights_path)
+    return stem + BACKENDS[backend][1]
+
+
+def _is_fresh(artifact_path, weights_path):
+    """An artifact is reusable if it exists and is not older than the weights it came from."""
+    return os.path.exists(artifact_path) and os.path.getmtime(artifact_path) >= os.path.getmtime(weights_path)
+
+
+def resolve_model_path(weights_path, backend, imgsz):
+    """Return the path to load for a backend, exporting and caching it on first use."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+    if backend == 'pytorch':
+        return weights_path
+    artifact_path = exported_model_path(weights_path, backend)
+    if _is_fresh(artifact_path, weights_path):
+        print(f"✅ Using cached {backend} model: {artifact_path}")
+        return artifact_path
+    if BACKENDS[backend][0] is None:
+        raise FileNotFoundError(f"No up-to-date {backend} model at '{artifact_path}'. "
+                                f"Create it with: python threat_detection.py --quantize")
+
+    from ultralytics import YOLO
+    print(f"📦 Exporting {weights_path} to {backend} (one-time step)...")
+    # Dynamic shapes keep batched multi-stream inference working on the exported model
+    exported = YOLO(weights_path).export(format=BACKENDS[backend][0], imgsz=imgsz, dynamic=True)
+    exported = str(exported).rstrip('/\\')
+    if os.path.abspath(exported) != os.path.abspath(artifact_path):
+        os.replace(exported, artifact_path)
+    print(f"✅ Exported model cached at: {artifact_path}")
+    return artifact_path
+
+
+def set_cpu_threads(num_threads):
+    """Limit the PyTorch / OpenMP thread pools before a model is loaded."""
+    if not num_threads:
+        return
+    os.environ['OMP_NUM_THREADS'] = str(num_threads)
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        pass
+
+
+def apply_backend_threads(model, backend, model_path, num_threads, imgsz):
+    """Rebuild the ONNX Runtime session or OpenVINO compiled model with a thread limit.
+
+    ultralytics creates these engines with default settings on the first
+    prediction, so a dummy frame is run first and the engine swapped afterwards.
+    """
+    engine = ENGINES[backend]
+    if not num_threads or engine == 'pytorch':
+        return
+    try:
+        model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+        backend_model = model.predictor.model
+        if engine == 'onnx':
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+            backend_model.session = onnxruntime.InferenceSession(
+                model_path, sess_options=options, providers=backend_model.session.get_providers())
+        elif engine == 'openvino':
+            import openvino as ov
+            core = ov.Core()
+            xml_name = next(f for f in os.listdir(model_path) if f.endswith('.xml'))
+            ov_model = core.read_model(os.path.join(model_path, xml_name))
+            backend_model.ov_compiled_model = core.compile_model(
+                ov_model, device_name='CPU',
+                config={'PERFORMANCE_HINT': 'LATENCY', 'INFERENCE_NUM_THREADS': num_threads})
+        print(f"✅ {backend} engine limited to {num_threads} CPU thread(s)")
+    except Exception as e:
+        print(f"⚠️ Could not apply thread limit to the {backend} engine: {e}")
@@ -0,0 +1,77 @@
+"""
+Motion gating in front of detect_threat().
+
+A downscaled greyscale copy of each frame is compared against a running
+background average.  Inference only runs when enough of the scene changed,
+when the caller forces it (e.g. while a threat is active), or when the
+heartbeat interval has passed, so idle cameras cost almost nothing.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+# Motion gate configuration
+MOTION_CONFIG = {
+    'enabled': False,              # Off by default; enable with --motion-gate
+    'width': 160,                  # Width of the downscaled analysis image
+    'pixel_threshold': 25,         # Grey-level change that counts a pixel as moving
+    'min_changed_fraction': 0.005, # Share of moving pixels that triggers inference
+    'background_alpha': 0.05,      # Running-average update rate for the background
+    'heartbeat': 5.0               # Seconds; inference runs at least this often anyway
+}
+
+
+class MotionGate:
+    """Decides per frame whether the scene changed enough to run the detector."""
+
+    def __init__(self, heartbeat=None):
+        self.heartbeat = MOTION_CONFIG['heartbeat'] if heartbeat is None else heartbeat
+        self._background = None
+        self.last_inference = 0.0
+        self.last_mask = None
+        self.motion_fraction = 0.0
+        self.checked = 0
+        self.skipped = 0
+
+    def _downscale(self, frame):
+        h, w = frame.shape[:2]
+        width = MOTION_CONFIG['width']
+        small = cv2.resize(frame, (width, max(1, int(h * width / w))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def detect_motion(self, frame):
+        """Update the background model and return True if the frame shows motion."""
+        small = self._downscale(frame)
+        if self._background is None or self._background.shape != small.shape:
+            self._background = small.astype(np.float32)
+            self.last_mask = np.ones(small.shape, dtype=bool)
+            self.motion_fraction = 1.0
+            return True
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self._background))
+        self.last_mask = diff > MOTION_CONFIG['pixel_threshold']
+        self.motion_fraction = float(self.last_mask.mean())
+        cv2.accumulateWeighted(small, self._background, MOTION_CONFIG['background_alpha'])
+        return self.motion_fraction >= MOTION_CONFIG['min_changed_fraction']
+
+    def should_infer(self, frame, now=None, force=False):
+        """Return True if inference should run on this frame."""
+        now = now if now is not None else time.time()
+        self.checked += 1
+        motion = self.detect_motion(frame)
+        heartbeat_due = now - self.last_inference >= self.heartbeat
+        if force or motion or heartbeat_due:
+            self.last_inference = now
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        return {
+            'checked': self.checked,
+            'skipped': self.skipped,
+            'skip_ratio': self.skipped / self.checked if self.checked else 0.0,
+            'motion_fraction': self.motion_fraction
+        }
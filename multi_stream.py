@@ -0,0 +1,278 @@
+"""
+Multi-camera threat detection with one shared model and batched inference.
+
+Every source gets its own capture thread that keeps only its newest frame.
+A single inference thread gathers whatever new frames are available, runs
+them through one batched YOLOv8 call and hands each result back to that
+stream's own smoothing and alert state.  With ``processes``, the gathered
+frames go to a process_pool.ProcessInferencePool instead, one per worker.
+"""
+
+import threading
+import time
+
+import cv2
+
+from pipeline import CaptureThread, LatestQueue, StageStats, PIPELINE_CONFIG
+from tracker import ThreatTracker
+from alert_aggregator import AlertAggregator
+from camera_supervisor import SupervisedCapture, open_capture
+from incident_recorder import IncidentRecorder, RECORDER_CONFIG
+from evidence_store import EvidenceStore
+from threat_detection import (ModelLoader, PoolLoader, detect_batch, draw_detections, setup_arduino, setup_email_config,
+                              email_alert_sink, stop_alert_dispatcher)
+
+# Multi-stream configuration
+MULTI_STREAM_CONFIG = {
+    'max_batch_size': 8,       # Upper bound on frames per forward pass
+    'gather_wait': 0.005       # Seconds to wait when no stream has a new frame
+}
+
+
+def parse_source(source):
+    """Turn a command-line source into a camera index or a stream URL."""
+    return int(source) if str(source).isdigit() else source
+
+
+def open_stream_source(source):
+    """Open a webcam index or DroidCam/RTSP URL as a self-reconnecting capture."""
+    source = parse_source(source)
+    cap = open_capture(source)
+    if cap is None:
+        print(f"❌ Failed to open stream source: {source}")
+        return None
+    print(f"✅ Stream source opened: {source}")
+    # A stream that drops out later is reopened in the background; the others keep running
+    return SupervisedCapture(source, cap=cap).start()
+
+
+class StreamState:
+    """Smoothing and alert state for a single camera stream."""
+
+    def __init__(self, index, source):
+        self.index = index
+        self.source = source
+        self.threat_tracker = ThreatTracker()
+        self.smoothed_threat = False
+        self.frame_count = 0
+        self.total_threats_detected = 0
+        self.threat_count = 0
+        self.result_queue = LatestQueue(PIPELINE_CONFIG['result_queue_size'])
+
+    def update(self, result, now=None):
+        """Feed one DetectionResult and return the smoothed threat state."""
+        self.frame_count += 1
+        if result.threat_detected:
+            self.threat_count += 1
+            if self.threat_count == 1:  # First detection in sequence
+                self.total_threats_detected += 1
+        else:
+            self.threat_count = 0
+        self.smoothed_threat = self.threat_tracker.update(result, now)
+        return self.smoothed_threat
+
+
+class MultiStreamEngine:
+    """Batches the latest frame of every stream into one model call."""
+
+    def __init__(self, caps, sources, model, pool=None):
+        self.model = model
+        self.pool = pool
+        self.streams = [StreamState(i, src) for i, src in enumerate(sources)]
+        self.capture_queues = [LatestQueue(1) for _ in caps]
+        self.captures = [CaptureThread(cap, q) for cap, q in zip(caps, self.capture_queues)]
+        self.batch_stats = StageStats()
+        self.frame_stats = StageStats()
+        self.total_batched_frames = 0
+        self.failed = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._inference_loop, daemon=True)
+
+    def start(self):
+        for capture in self.captures:
+            capture.start()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        for capture in self.captures:
+            capture.stop()
+        self._thread.join(timeout=2)
+
+    def all_failed(self):
+        return self.failed or all(capture.failed for capture in self.captures)
+
+    def _gather(self):
+        """Collect the newest pending frame from each stream."""
+        batch = []
+        for index, queue in enumerate(self.capture_queues):
+            packet = queue.get(timeout=0)
+            # A reconnecting stream re-serves its last frame; its window and state just stay as they are
+            if packet is not None and not packet.stale:
+                batch.append((index, packet))
+            if len(batch) >= MULTI_STREAM_CONFIG['max_batch_size']:
+                break
+        return batch
+
+    def _inference_loop(self):
+        while not self._stop_event.is_set():
+            batch = self._gather()
+            if not batch:
+                time.sleep(MULTI_STREAM_CONFIG['gather_wait'])
+                continue
+            started = time.time()
+            if self.pool is not None:
+                results = self._detect_in_pool([packet.frame for _, packet in batch])
+                if results is None:
+                    break
+            else:
+                results = detect_batch([packet.frame for _, packet in batch], self.model)
+            elapsed = time.time() - started
+            for (index, packet), result in zip(batch, results):
+                packet.result = result
+                packet.inference_time = elapsed
+                self.streams[index].result_queue.put(packet)
+                self.frame_stats.tick()
+            self.batch_stats.tick()
+            self.total_batched_frames += len(batch)
+
+    def _detect_in_pool(self, frames):
+        """Run a gathered batch through the worker processes; None once no result comes back."""
+        from process_pool import PROCESS_POOL_CONFIG
+        try:
+            seqs = [self.pool.submit(frame) for frame in frames]
+        except ValueError as e:
+            print(f"❌ {e}")
+            self.failed = True
+            return None
+        results = []
+        for _ in seqs:
+            done = self.pool.get(timeout=PROCESS_POOL_CONFIG['result_timeout'])
+            if done is None or self.pool.workers_alive == 0:
+                print("❌ Inference processes stopped responding; stopping multi-stream inference")
+                self.failed = True
+                return None
+            results.append(done[1])
+        return results
+
+    def stats(self):
+        """Aggregate throughput across all streams."""
+        batches = self.batch_stats.count
+        return {
+            'batch_fps': self.batch_stats.fps,
+            'aggregate_fps': self.frame_stats.fps,
+            'avg_batch_size': self.total_batched_frames / batches if batches else 0.0,
+            'capture_fps': [capture.stats.fps for capture in self.captures]
+        }
+
+
+def run_multi_stream(sources, processes=None):
+    """Run batched threat detection over several camera sources."""
+    if processes:
+        print(f"Starting {processes} inference process(es) in the background...")
+        loader = PoolLoader(processes)
+    else:
+        print("Loading YOLOv8 model in the background...")
+        loader = ModelLoader()
+    loader.start()
+
+    setup_email_config()
+
+    print("Connecting to Arduino...")
+    arduino = setup_arduino()
+
+    caps = []
+    opened_sources = []
+    for source in sources:
+        cap = open_stream_source(source)
+        if cap is not None:
+            caps.append(cap)
+            opened_sources.append(source)
+    if not caps:
+        print("Error: Could not open any stream source.")
+        return
+
+    try:
+        model = loader.get()
+    except Exception as e:
+        print(f"❌ Failed to load YOLOv8 model: {e}")
+        for cap in caps:
+            cap.release()
+        return
+    print("YOLOv8 model loaded successfully!")
+
+    print(f"\n📡 Running batched detection over {len(caps)} stream(s)")
+    print("Press 'q' to quit")
+    pool = model if processes else None
+    engine = MultiStreamEngine(caps, opened_sources, model, pool=pool).start()
+    last_report = time.time()
+    evidence = EvidenceStore()
+    evidence.start()
+    alerts = AlertAggregator(email_alert_sink, evidence)
+    recorder = IncidentRecorder().start() if RECORDER_CONFIG['enabled'] else None
+
+    while True:
+        try:
+            for stream in engine.streams:
+                packet = stream.result_queue.get(timeout=0)
+                if packet is None or packet.result is None or not packet.result.valid:
+                    continue
+                result = packet.result
+                smoothed_threat = stream.update(result, packet.timestamp)
+                frame = draw_detections(packet.frame, result)
+                stream.threat_tracker.draw(frame, packet.timestamp)
+
+                cv2.putText(frame, f"Stream {stream.index}: {stream.source}", (10, 150),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                cv2.putText(frame, f"Threats: {stream.total_threats_detected}", (10, 170),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                if recorder:
+                    # One pre-roll ring and one clip per stream
+                    recorder.add(stream.source, frame, packet.timestamp)
+                    recorder.set_active(stream.source, smoothed_threat, packet.timestamp)
+                cv2.imshow(f"AI Threat Detection - Stream {stream.index}", frame)
+
+                # Incidents are kept per stream; the email rate limit is shared by all of them
+                alerts.observe(stream.source, smoothed_threat, frame, result, packet.timestamp)
+            alerts.tick()
+
+            # The Arduino alarm follows the combined state of every stream
+            any_threat = any(stream.smoothed_threat for stream in engine.streams)
+            if arduino:
+                arduino.set_state(any_threat)
+
+            if time.time() - last_report >= 5:
+                stats = engine.stats()
+                capture_fps = ", ".join(f"{fps:.1f}" for fps in stats['capture_fps'])
+                print(f"[MULTI] aggregate {stats['aggregate_fps']:.1f} fps | {stats['batch_fps']:.1f} batches/s | "
+                      f"avg batch {stats['avg_batch_size']:.2f} | capture fps [{capture_fps}]")
+                last_report = time.time()
+
+            if engine.all_failed():
+                print("All stream sources failed")
+                break
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
+                break
+        except Exception as e:
+            print(f"⚠️ Error in multi-stream loop: {e}")
+            time.sleep(0.1)
+
+    engine.stop()
+    if pool:
+        pool.report()
+        pool.close()
+    for cap in caps:
+        cap.release()
+    cv2.destroyAllWindows()
+    alerts.flush()
+    stop_alert_dispatcher()
+    if recorder:
+        recorder.stop()
+    evidence.stop()
+    evidence.report()
+    if arduino:
+        arduino.close()
+        print("Arduino connection closed")
+    print("System shutdown complete")
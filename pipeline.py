@@ -0,0 +1,331 @@
+"""
+Staged capture / inference / render pipeline for the threat detection loop.
+
+The camera is read on its own thread, inference runs on a worker thread and
+the caller (usually the main thread, which owns the OpenCV window) consumes
+the results.  Stages are joined by small latest-wins queues so a slow model
+never lets stale frames pile up behind it.
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+# Pipeline configuration
+PIPELINE_CONFIG = {
+    'capture_queue_size': 1,   # Frames waiting for inference (latest wins)
+    'result_queue_size': 1,    # Inference results waiting for render/alerts
+    'fps_window': 30,          # Number of samples used for per-stage FPS
+    'get_timeout': 0.1         # Seconds a stage waits before re-checking stop flag
+}
+
+
+@dataclass
+class FramePacket:
+    """A captured frame travelling through the pipeline."""
+    frame_id: int
+    timestamp: float
+    frame: np.ndarray
+    result: Any = None
+    inference_time: float = 0.0
+    skipped: bool = False        # True when the gate or rate controller skipped inference and result is reused
+    stale: bool = False          # True when the source is reconnecting and this is its last good frame again
+
+
+class LatestQueue:
+    """Bounded queue that drops the oldest item when full (latest wins).
+
+    With ``keep``, an unread item for which ``keep(item)`` is true is not
+    pushed out by one for which it is false; the new item is dropped instead.
+    """
+
+    def __init__(self, maxsize=1, keep=None):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._keep = keep
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+                if self._keep is not None and self._keep(self._items[0]) and not self._keep(item):
+                    return
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest queued item, or None if nothing arrived in time."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def qsize(self):
+        return len(self._items)
+
+
+class StageStats:
+    """Tracks throughput of a single pipeline stage over a sliding window."""
+
+    def __init__(self, window=None):
+        self._times = deque(maxlen=window or PIPELINE_CONFIG['fps_window'])
+        self.count = 0
+
+    def tick(self, now=None):
+        self._times.append(now if now is not None else time.time())
+        self.count += 1
+
+    @property
+    def fps(self):
+        if len(self._times) < 2:
+            return 0.0
+        elapsed = self._times[-1] - self._times[0]
+        return (len(self._times) - 1) / elapsed if elapsed > 0 else 0.0
+
+
+class CaptureThread(threading.Thread):
+    """Reads frames from a cv2.VideoCapture and keeps only the most recent one.
+
+    With a camera_supervisor.SupervisedCapture, frames re-served while the
+    source reconnects are marked stale and keep their original timestamp.
+    """
+
+    def __init__(self, cap, out_queue):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.out_queue = out_queue
+        self.stats = StageStats()
+        self.failed = False
+        self.first_frame_time = None
+        self._stop_event = threading.Event()
+        self._next_id = 0
+
+    def run(self):
+        while not self._stop_event.is_set():
+            ret, frame = self.cap.read()
+            if not ret or frame is None:
+                print("Failed to grab frame")
+                self.failed = True
+                break
+            now = time.time()
+            if getattr(self.cap, 'stale', False):
+                self._next_id += 1
+                self.out_queue.put(FramePacket(self._next_id, self.cap.frame_time, frame, stale=True))
+                continue
+            if self.first_frame_time is None:
+                self.first_frame_time = now
+            self._next_id += 1
+            self.out_queue.put(FramePacket(self._next_id, now, frame))
+            self.stats.tick(now)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class InferenceWorker(threading.Thread):
+    """Runs detect_fn on the newest captured frame and forwards the result.
+
+    With a gate (e.g. motion_gate.MotionGate), frames the gate rejects are
+    forwarded with the previous result instead of running the detector.
+    Setting ``force_inference`` bypasses the gate, e.g. while a threat is active.
+    With a rate controller (rate_control.RateController), frames that arrive
+    before the next detection is due are forwarded the same way, as are
+    stale frames from a reconnecting source.
+    """
+
+    def __init__(self, in_queue, out_queue, detect_fn, gate=None, rate=None):
+        super().__init__(daemon=True)
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.detect_fn = detect_fn
+        self.gate = gate
+        self.rate = rate
+        self.force_inference = False
+        self.failed = False
+        self.stats = StageStats()
+        self._last_result = None
+        self._stop_event = threading.Event()
+
+    def _skip(self, packet):
+        """Whether this frame reuses the last result instead of going through the detector."""
+        return self._last_result is not None and (
+            packet.stale or
+            (self.rate is not None and not self.rate.due(packet.timestamp)) or
+            (self.gate is not None and not self.gate.should_infer(packet.frame, packet.timestamp,
+                                                                  self.force_inference)))
+
+    def _forward_skipped(self, packet):
+        packet.result = self._last_result
+        packet.skipped = True
+        self.out_queue.put(packet)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            packet = self.in_queue.get(timeout=PIPELINE_CONFIG['get_timeout'])
+            if packet is None:
+                continue
+            if self._skip(packet):
+                self._forward_skipped(packet)
+                continue
+            started = time.time()
+            try:
+                packet.result = self.detect_fn(packet.frame)
+            except Exception as e:
+                print(f"⚠️ Inference error: {e}")
+                continue
+            packet.inference_time = time.time() - started
+            if self.rate is not None:
+                self.rate.record(packet.inference_time, started)
+            self._last_result = packet.result
+            self.out_queue.put(packet)
+            self.stats.tick()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class PoolInferenceWorker(InferenceWorker):
+    """Feeds frames to a process_pool.ProcessInferencePool instead of calling a model in this process.
+
+    Up to one frame per live worker process is in flight; frames that arrive
+    while every worker is busy are forwarded like gated ones.  A second
+    thread collects results in submission order.  The rate controller sees
+    each run's latency divided by the number of workers, since that many
+    detections overlap.  If the last worker dies, ``failed`` is set.
+    """
+
+    def __init__(self, in_queue, out_queue, pool, gate=None, rate=None):
+        super().__init__(in_queue, out_queue, None, gate, rate)
+        self.pool = pool
+        self._in_flight = {}   # seq -> (packet, submitted at)
+        self._lock = threading.Lock()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+
+    def start(self):
+        super().start()
+        self._collector.start()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            packet = self.in_queue.get(timeout=PIPELINE_CONFIG['get_timeout'])
+            if packet is None:
+                continue
+            busy = len(self._in_flight) >= max(1, self.pool.workers_alive)
+            if busy or self._skip(packet):
+                if self._last_result is not None:
+                    self._forward_skipped(packet)
+                continue
+            started = time.time()
+            with self._lock:
+                try:
+                    seq = self.pool.submit(packet.frame, timeout=PIPELINE_CONFIG['get_timeout'])
+                except ValueError as e:
+                    print(f"❌ {e}")
+                    self.failed = True
+                    break
+                if seq is not None:
+                    self._in_flight[seq] = (packet, started)
+            if seq is not None and self.rate is not None:
+                self.rate.begin(started)
+
+    def _collect(self):
+        while not self._stop_event.is_set():
+            done = self.pool.get(timeout=PIPELINE_CONFIG['get_timeout'])
+            if done is None:
+                continue
+            seq, result = done
+            with self._lock:
+                packet, started = self._in_flight.pop(seq)
+            if result is None:
+                if self.pool.workers_alive == 0 and not self.failed:
+                    print("❌ No inference process left; stopping")
+                    self.failed = True
+                continue
+            packet.result = result
+            packet.inference_time = time.time() - started
+            if self.rate is not None:
+                self.rate.record(packet.inference_time / max(1, self.pool.workers_alive), started)
+            self._last_result = result
+            self.out_queue.put(packet)
+            self.stats.tick()
+
+    def join(self, timeout=None):
+        super().join(timeout)
+        self._collector.join(timeout)
+
+
+class DetectionPipeline:
+    """Wires capture, inference and result queues together for one camera.
+
+    Inference runs ``detect_fn`` on a thread of this process, or with
+    ``pool`` in a process_pool.ProcessInferencePool.
+    """
+
+    def __init__(self, cap, detect_fn, gate=None, rate=None, pool=None):
+        self.capture_queue = LatestQueue(PIPELINE_CONFIG['capture_queue_size'])
+        # A fresh detection waits for the consumer; skipped packets arrive every frame and would replace it
+        self.result_queue = LatestQueue(PIPELINE_CONFIG['result_queue_size'], keep=lambda p: not p.skipped)
+        self.capture = CaptureThread(cap, self.capture_queue)
+        if pool is not None:
+            self.inference = PoolInferenceWorker(self.capture_queue, self.result_queue, pool, gate, rate)
+        else:
+            self.inference = InferenceWorker(self.capture_queue, self.result_queue, detect_fn, gate, rate)
+        self.gate = gate
+        self.rate = rate
+        self.render_stats = StageStats()
+        self._latency = deque(maxlen=PIPELINE_CONFIG['fps_window'])
+
+    def start(self):
+        self.capture.start()
+        self.inference.start()
+        return self
+
+    def stop(self):
+        self.capture.stop()
+        self.inference.stop()
+        self.capture.join(timeout=2)
+        self.inference.join(timeout=2)
+
+    @property
+    def capture_failed(self):
+        return self.capture.failed
+
+    @property
+    def failed(self):
+        """The camera or the inference stage stopped for good."""
+        return self.capture.failed or self.inference.failed
+
+    def get_result(self, timeout=None):
+        """Return the next processed FramePacket, or None on timeout."""
+        if timeout is None:
+            timeout = PIPELINE_CONFIG['get_timeout']
+        packet = self.result_queue.get(timeout=timeout)
+        if packet is not None:
+            now = time.time()
+            self.render_stats.tick(now)
+            if not packet.stale:  # Stale packets keep the last live frame's time; not a latency
+                self._latency.append(now - packet.timestamp)
+        return packet
+
+    def stats(self):
+        """Per-stage FPS, queue depth and end-to-end latency."""
+        latency = sum(self._latency) / len(self._latency) if self._latency else 0.0
+        skipped = (self.gate.skipped if self.gate is not None else 0) + (self.rate.skipped if self.rate is not None else 0)
+        return {
+            'capture_fps': self.capture.stats.fps,
+            'inference_fps': self.inference.stats.fps,
+            'render_fps': self.render_stats.fps,
+            'capture_queue': self.capture_queue.qsize(),
+            'result_queue': self.result_queue.qsize(),
+            'dropped_frames': self.capture_queue.dropped,
+            'skipped_frames': skipped,
+            'inference_interval_ms': self.rate.interval * 1000 if self.rate is not None else 0.0,
+            'latency_ms': latency * 1000
+        }
@@ -0,0 +1,289 @@
+"""
+Multi-process CPU inference with frames passed through shared memory.
+
+One Python process running the model leaves most of a many-core server idle
+(the GIL, per-call overhead, single-session thread scaling).  This pool
+starts several worker processes, each with its own load_yolo() model, and a
+ring of fixed-size frame slots in one multiprocessing.shared_memory block.
+The producer writes a frame into a free slot, only the slot number and
+frame shape cross the process boundary, and workers run detect() on a
+zero-copy view of the slot.  Results come back as DetectionResults without
+class names (restored on this side) and are handed out in submission order.
+Each worker has its own task queue, so when one dies its frames are known
+and are failed instead of being waited for forever.  Live cameras use it
+through pipeline.PoolInferenceWorker (``--processes`` on the live CLI and
+with ``--multi-stream``), recorded video through batch_analysis.
+"""
+
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from dataclasses import replace
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Process pool configuration
+PROCESS_POOL_CONFIG = {
+    'workers': max(1, (os.cpu_count() or 2) // 2),  # Model processes
+    'slots': 16,                   # Frames in flight (shared-memory ring size)
+    'max_frame_shape': (1080, 1920, 3),  # Largest frame a slot can hold
+    'start_method': 'spawn',       # Same behaviour on Windows, macOS and Linux
+    'ready_timeout': 300.0,        # Seconds to wait for every worker to load its model
+    'result_timeout': 120.0,       # Seconds a caller waits for the next result before giving up
+    'check_interval': 1.0          # How often the collector checks that the workers are alive
+}
+
+
+def _worker_main(index, shm_name, slot_bytes, tasks, results, detection_config, num_threads):
+    """Worker process: attach to the frame ring, load a model, answer detect() requests."""
+    import threat_detection
+    threat_detection.DETECTION_CONFIG.update(detection_config)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        model = threat_detection.load_yolo(num_threads=num_threads)
+        threat_detection.warmup_model(model, runs=1)
+        results.put(('ready', index, dict(model.names)))
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot, shape = task
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+            try:
+                result = threat_detection.detect(frame, model)
+                # Names are the same for every frame; send them once instead of with each result
+                results.put(('result', seq, replace(result, class_names={})))
+            except Exception as e:
+                results.put(('error', seq, str(e)))
+            del frame
+    except Exception as e:
+        results.put(('failed', index, str(e)))
+    finally:
+        shm.close()
+
+
+class SharedFrameRing:
+    """Fixed-size frame slots in one shared-memory block, with a free list."""
+
+    def __init__(self, slots=None, max_frame_shape=None):
+        self.slots = slots or PROCESS_POOL_CONFIG['slots']
+        self.max_frame_shape = tuple(max_frame_shape or PROCESS_POOL_CONFIG['max_frame_shape'])
+        self.slot_bytes = int(np.prod(self.max_frame_shape))
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * self.slots)
+        self._free = queue.Queue()
+        for slot in range(self.slots):
+            self._free.put(slot)
+
+    def acquire(self, timeout=None):
+        """Block until a slot is free and return its number (None on timeout)."""
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def view(self, slot, shape):
+        """Writable NumPy view of a slot for a frame of the given shape."""
+        if int(np.prod(shape)) > self.slot_bytes:
+            raise ValueError(f"Frame {shape} does not fit a {self.max_frame_shape} slot; "
+                             "raise PROCESS_POOL_CONFIG['max_frame_shape']")
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ProcessInferencePool:
+    """Runs detect() in worker processes over frames in a shared-memory ring.
+
+    ``submit(frame)`` copies a frame into a free slot (blocking while all
+    slots are in flight) and hands it to the least busy worker; it returns
+    the sequence number.  ``get()`` returns (seq, result) strictly in
+    submission order; the result is None if detection failed or the worker
+    died.  stats() and report() give throughput per worker.
+    """
+
+    def __init__(self, workers=None, slots=None, max_frame_shape=None, num_threads=None, backend=None):
+        self.workers = workers or PROCESS_POOL_CONFIG['workers']
+        self.backend = backend
+        self.ring = SharedFrameRing(slots, max_frame_shape)
+        self.num_threads = num_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        ctx = mp.get_context(PROCESS_POOL_CONFIG['start_method'])
+        self._tasks = [ctx.Queue() for _ in range(self.workers)]
+        self._results = ctx.Queue()
+        self._ctx = ctx
+        self._processes = []
+        self.class_names = {}
+        self._next_seq = 0
+        self._next_out = 0
+        self._slot_of = {}
+        self._worker_of = {}
+        self._pending = [set() for _ in range(self.workers)]
+        self._alive = set()
+        self._done = {}
+        self._cond = threading.Condition()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._started_at = None
+        self.completed = [0] * self.workers
+        self.errors = 0
+
+    def start(self):
+        from threat_detection import DETECTION_CONFIG
+        detection_config = dict(DETECTION_CONFIG, backend=self.backend or DETECTION_CONFIG['backend'])
+        for index in range(self.workers):
+            process = self._ctx.Process(
+                target=_worker_main, daemon=True,
+                args=(index, self.ring.shm.name, self.ring.slot_bytes, self._tasks[index], self._results,
+                      detection_config, self.num_threads))
+            process.start()
+            self._processes.append(process)
+        while len(self._alive) < self.workers:
+            try:
+                kind, index, payload = self._results.get(timeout=PROCESS_POOL_CONFIG['ready_timeout'])
+            except queue.Empty:
+                self.close()
+                raise RuntimeError(f"Inference workers not ready after {PROCESS_POOL_CONFIG['ready_timeout']:.0f} s")
+            if kind == 'failed':
+                self.close()
+                raise RuntimeError(f"Inference worker {index} failed to start: {payload}")
+            self.class_names = payload
+            self._alive.add(index)
+        print(f"⚙️ {self.workers} inference process(es) ready, {self.num_threads} thread(s) each, "
+              f"{self.ring.slots} shared frame slots")
+        self._started_at = time.time()
+        self._collector.start()
+        return self
+
+    def submit(self, frame, timeout=None):
+        """Copy a frame into a free slot and queue it; returns the sequence number (None on timeout)."""
+        slot = self.ring.acquire(timeout)
+        if slot is None:
+            return None
+        try:
+            self.ring.view(slot, frame.shape)[:] = frame
+        except ValueError:
+            self.ring.release(slot)
+            raise
+        with self._cond:
+            seq = self._next_seq
+            self._next_seq += 1
+            if not self._alive:
+                # No worker left: the result is a failure straight away
+                self.ring.release(slot)
+                self.errors += 1
+                self._done[seq] = None
+                self._cond.notify_all()
+                return seq
+            index = min(self._alive, key=lambda i: len(self._pending[i]))
+            self._slot_of[seq] = slot
+            self._worker_of[seq] = index
+            self._pending[index].add(seq)
+        self._tasks[index].put((seq, slot, frame.shape))
+        return seq
+
+    def _finish(self, seq, result):
+        """Record a result and free its slot; called with the lock held."""
+        slot = self._slot_of.pop(seq, None)
+        if slot is None:
+            return  # Already failed when its worker died
+        self.ring.release(slot)
+        self._pending[self._worker_of.pop(seq)].discard(seq)
+        self._done[seq] = result
+        self._cond.notify_all()
+
+    def _worker_died(self, index, reason):
+        with self._cond:
+            if index not in self._alive:
+                return
+            self._alive.discard(index)
+            lost = sorted(self._pending[index])
+            for seq in lost:
+                self.errors += 1
+                self._finish(seq, None)
+        print(f"❌ Inference worker {index} stopped ({reason}); {len(lost)} frame(s) in flight failed, "
+              f"{len(self._alive)} worker(s) left")
+
+    def _check_workers(self):
+        for index, process in enumerate(self._processes):
+            if index in self._alive and not process.is_alive():
+                self._worker_died(index, f"exit code {process.exitcode}")
+
+    def _collect(self):
+        last_check = time.time()
+        while True:
+            try:
+                kind, seq, payload = self._results.get(timeout=PROCESS_POOL_CONFIG['check_interval'])
+            except queue.Empty:
+                kind = None
+            except (EOFError, OSError):
+                break
+            if kind == 'stop':
+                break
+            if kind == 'failed':
+                self._worker_died(seq, payload)  # seq is the worker index here
+            elif kind is not None:
+                if kind == 'result':
+                    result = replace(payload, class_names=self.class_names)
+                else:
+                    print(f"⚠️ Inference error in worker: {payload}")
+                    result = None
+                with self._cond:
+                    if kind != 'result':
+                        self.errors += 1
+                    elif seq in self._worker_of:
+                        self.completed[self._worker_of[seq]] += 1
+                    self._finish(seq, result)
+            if kind is None or time.time() - last_check >= PROCESS_POOL_CONFIG['check_interval']:
+                last_check = time.time()
+                self._check_workers()
+
+    def get(self, timeout=None):
+        """Return (seq, DetectionResult or None) for the oldest submitted frame, in order.
+
+        Returns None if nothing arrived within ``timeout`` seconds.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._next_out in self._done, timeout):
+                return None
+            seq = self._next_out
+            self._next_out += 1
+            return seq, self._done.pop(seq)
+
+    @property
+    def workers_alive(self):
+        return len(self._alive)
+
+    def stats(self):
+        elapsed = time.time() - self._started_at if self._started_at else 0.0
+        total = sum(self.completed)
+        return {
+            'workers_alive': len(self._alive),
+            'completed': total,
+            'errors': self.errors,
+            'frames_per_s': total / elapsed if elapsed > 0 else 0.0,
+            'per_worker_fps': [n / elapsed if elapsed > 0 else 0.0 for n in self.completed]
+        }
+
+    def report(self):
+        stats = self.stats()
+        per_worker = ", ".join(f"{fps:.1f}" for fps in stats['per_worker_fps'])
+        print(f"[POOL] {self.workers} process(es), {stats['workers_alive']} alive: {stats['frames_per_s']:.1f} frames/s "
+              f"({per_worker} per process) | {stats['completed']} frames | {stats['errors']} failed")
+
+    def close(self):
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        if self._collector.is_alive():
+            self._results.put(('stop', None, None))
+            self._collector.join(timeout=2)
+        self.ring.close()
@@ -0,0 +1,226 @@
+"""
+Quantized model variants and an accuracy-vs-speed report.
+
+Builds an INT8 ONNX model (static, calibrated on our saved
+threat_detection_*.jpg frames, or dynamic) or an FP16 OpenVINO model from
+yolov8n.pt.  The report compares each variant with the FP32 model on the
+same frames: per-frame latency and recall of the weapon-class detections
+the FP32 model makes.  Static quantization holds back part of the frames
+for that comparison, so the variant is never scored on the images it was
+calibrated on.
+"""
+
+import glob
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from model_backends import exported_model_path, resolve_model_path
+from threat_detection import DETECTION_CONFIG, Letterbox, download_yolo_model, detect
+from tracker import box_iou
+
+# Quantization configuration
+QUANTIZATION_CONFIG = {
+    'calibration_pattern': 'threat_detection_*.jpg',
+    'max_calibration_frames': 200,
+    'eval_fraction': 0.3,      # Share of the frames held back for the report when calibrating (static INT8)
+    'iou_match': 0.5,          # IoU needed for a quantized box to match an FP32 box
+    'min_recall': 0.95,        # Weapon-class recall needed to call a variant safe
+    'warmup_runs': 3,
+    'report_path': 'quantization_report.json'
+}
+
+
+def collect_calibration_frames(calib_dir):
+    """Load the saved detection frames used for calibration and evaluation."""
+    # Recursive, so frames in the evidence store's date directories are found too
+    pattern = os.path.join(calib_dir, '**', QUANTIZATION_CONFIG['calibration_pattern'])
+    paths = sorted(glob.glob(pattern, recursive=True))[:QUANTIZATION_CONFIG['max_calibration_frames']]
+    frames = [cv2.imread(path) for path in paths]
+    frames = [frame for frame in frames if frame is not None]
+    print(f"📁 Loaded {len(frames)} calibration frame(s) from {pattern}")
+    return frames
+
+
+def split_frames(frames, eval_fraction=None):
+    """Split frames into (calibration, evaluation) sets; every k-th frame is held back for evaluation.
+
+    Interleaving keeps both sets spread over the same scenes and times of day.
+    """
+    eval_fraction = QUANTIZATION_CONFIG['eval_fraction'] if eval_fraction is None else eval_fraction
+    if len(frames) < 2 or eval_fraction <= 0:
+        return list(frames), []
+    step = max(2, int(round(1 / min(eval_fraction, 0.5))))
+    calibration = [frame for i, frame in enumerate(frames) if i % step != step - 1]
+    evaluation = [frame for i, frame in enumerate(frames) if i % step == step - 1]
+    return calibration, evaluation
+
+
+def _to_model_input(frame, letterbox):
+    """Match the ultralytics preprocessing: letterbox, BGR->RGB, CHW, 0..1 float."""
+    buffer, _, _ = letterbox(frame)
+    image = buffer[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0
+
+
+def quantize_onnx_int8(weights_path, frames, mode='static'):
+    """Write an INT8 ONNX model next to the weights and return its path."""
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+
+    fp32_path = resolve_model_path(weights_path, 'onnx', DETECTION_CONFIG['imgsz'])
+    int8_path = exported_model_path(weights_path, 'onnx-int8')
+    if mode == 'static' and not frames:
+        print("⚠️ No calibration frames found, falling back to dynamic quantization")
+        mode = 'dynamic'
+
+    if mode == 'dynamic':
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+    else:
+        letterbox = Letterbox()
+
+        class FrameReader(CalibrationDataReader):
+            def __init__(self, input_name):
+                self._inputs = iter({input_name: _to_model_input(frame, letterbox)} for frame in frames)
+
+            def get_next(self):
+                return next(self._inputs, None)
+
+        import onnxruntime
+        input_name = onnxruntime.InferenceSession(fp32_path).get_inputs()[0].name
+        quantize_static(fp32_path, int8_path, FrameReader(input_name),
+                        quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    print(f"✅ INT8 ({mode}) model written to: {int8_path}")
+    return int8_path
+
+
+def export_openvino_fp16(weights_path):
+    """Export an FP16 OpenVINO model next to the weights and return its path."""
+    from ultralytics import YOLO
+    fp16_path = exported_model_path(weights_path, 'openvino-fp16')
+    exported = str(YOLO(weights_path).export(format='openvino', imgsz=DETECTION_CONFIG['imgsz'],
+                                             half=True, dynamic=True)).rstrip('/\\')
+    if os.path.exists(fp16_path):
+        import shutil
+        shutil.rmtree(fp16_path)
+    os.replace(exported, fp16_path)
+    print(f"✅ FP16 OpenVINO model written to: {fp16_path}")
+    return fp16_path
+
+
+def _run_model(model_path, frames):
+    """Return (per-frame latencies in seconds, DetectionResults, class names) for one model file."""
+    from ultralytics import YOLO
+    model = YOLO(model_path, task='detect')
+    for frame in frames[:QUANTIZATION_CONFIG['warmup_runs']]:
+        detect(frame, model)
+    latencies, results = [], []
+    for frame in frames:
+        started = time.perf_counter()
+        results.append(detect(frame, model))
+        latencies.append(time.perf_counter() - started)
+    return np.array(latencies), results, model.names
+
+
+def _weapon_recall(reference, candidate):
+    """Share of FP32 weapon detections that the candidate also finds (same class, IoU match)."""
+    matched = total = 0
+    for ref, cand in zip(reference, candidate):
+        ref_boxes, ref_classes = ref.boxes[ref.threat_mask], ref.class_ids[ref.threat_mask]
+        cand_boxes, cand_classes = cand.boxes[cand.threat_mask], cand.class_ids[cand.threat_mask]
+        total += len(ref_boxes)
+        if not len(ref_boxes) or not len(cand_boxes):
+            continue
+        iou = box_iou(ref_boxes, cand_boxes)
+        iou[ref_classes[:, None] != cand_classes[None, :]] = 0
+        matched += int((iou.max(axis=1) >= QUANTIZATION_CONFIG['iou_match']).sum())
+    return matched / total if total else None
+
+
+def _has_weapon_classes(names):
+    """Whether a model with these class names can detect any DETECTION_CONFIG threat class."""
+    return bool(set(DETECTION_CONFIG['threat_classes']).intersection(names.values()))
+
+
+def build_report(reference_path, variant_path, frames):
+    """Compare a quantized variant with the FP32 reference on the same frames."""
+    ref_latency, ref_results, names = _run_model(reference_path, frames)
+    var_latency, var_results, _ = _run_model(variant_path, frames)
+    weapon_classes = _has_weapon_classes(names)
+    recall = _weapon_recall(ref_results, var_results)
+    if weapon_classes:
+        safe = recall is not None and recall >= QUANTIZATION_CONFIG['min_recall']
+    else:
+        safe = None  # Nothing to measure recall on; the weapon check does not apply to this model
+    frame_agreement = np.mean([r.threat_detected == v.threat_detected for r, v in zip(ref_results, var_results)])
+    report = {
+        'frames': len(frames),
+        'reference': {'model': reference_path, 'mean_ms': ref_latency.mean() * 1000,
+                      'p95_ms': np.percentile(ref_latency, 95) * 1000},
+        'variant': {'model': variant_path, 'mean_ms': var_latency.mean() * 1000,
+                    'p95_ms': np.percentile(var_latency, 95) * 1000},
+        'speedup': ref_latency.mean() / var_latency.mean(),
+        'weapon_classes': weapon_classes,
+        'reference_weapon_detections': int(sum(r.threat_mask.sum() for r in ref_results)),
+        'weapon_recall_vs_fp32': recall if weapon_classes else 'not applicable',
+        'threat_frame_agreement': float(frame_agreement),
+        'safe_to_ship': safe
+    }
+    return report
+
+
+def print_report(report):
+    print("\n📊 Quantization Report")
+    print("=" * 40)
+    if report.get('calibration_frames'):
+        print(f"Calibration frames:     {report['calibration_frames']} (not evaluated)")
+    print(f"Frames evaluated:       {report['frames']}")
+    print(f"FP32 latency:           {report['reference']['mean_ms']:.1f} ms (p95 {report['reference']['p95_ms']:.1f} ms)")
+    print(f"Variant latency:        {report['variant']['mean_ms']:.1f} ms (p95 {report['variant']['p95_ms']:.1f} ms)")
+    print(f"Speedup:                {report['speedup']:.2f}x")
+    print(f"FP32 weapon detections: {report['reference_weapon_detections']}")
+    if not report['weapon_classes']:
+        print(f"Weapon recall vs FP32:  not applicable (the model has none of {DETECTION_CONFIG['threat_classes']})")
+    elif report['weapon_recall_vs_fp32'] is None:
+        print("Weapon recall vs FP32:  n/a (FP32 found no weapons; add frames that contain weapons)")
+    else:
+        print(f"Weapon recall vs FP32:  {report['weapon_recall_vs_fp32']:.1%}")
+    print(f"Threat frame agreement: {report['threat_frame_agreement']:.1%}")
+    if report['safe_to_ship'] is None:
+        print("ℹ️ No weapon classes to check; judge the variant by latency, and re-run with a weapon model")
+    elif report['safe_to_ship']:
+        print("✅ Variant keeps weapon recall above the threshold")
+    else:
+        print(f"⚠️ Not safe to ship: weapon recall below {QUANTIZATION_CONFIG['min_recall']:.0%} or not measurable")
+
+
+def run_quantization(calib_dir='.', mode='static'):
+    """Build a quantized variant, evaluate it against FP32 and save the report."""
+    weights_path = download_yolo_model()
+    frames = collect_calibration_frames(calib_dir)
+    calibration, evaluation = [], frames
+    if mode == 'fp16':
+        variant_path = export_openvino_fp16(weights_path)
+        reference_path = resolve_model_path(weights_path, 'openvino', DETECTION_CONFIG['imgsz'])
+    else:
+        if mode == 'static':
+            # Frames the model was calibrated on would flatter it in the report
+            calibration, evaluation = split_frames(frames)
+            print(f"📁 {len(calibration)} frame(s) for calibration, {len(evaluation)} held back for evaluation")
+        variant_path = quantize_onnx_int8(weights_path, calibration, mode)
+        reference_path = resolve_model_path(weights_path, 'onnx', DETECTION_CONFIG['imgsz'])
+    if not evaluation:
+        print("⚠️ No frames to evaluate on; skipping the accuracy/speed report")
+        return None
+    report = build_report(reference_path, variant_path, evaluation)
+    report['calibration_frames'] = len(calibration)
+    report['mode'] = mode
+    print_report(report)
+    with open(QUANTIZATION_CONFIG['report_path'], 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to: {QUANTIZATION_CONFIG['report_path']}")
+    return report
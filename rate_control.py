@@ -0,0 +1,122 @@
+"""
+Adaptive inference rate for the live detection loops.
+
+The detector no longer runs on every frame (main) or on a fixed 0.3 s timer
+(GUI).  The controller picks the interval between detector runs from what is
+going on: as fast as the model allows while a threat or weapon track is
+active, the normal rate otherwise, and a slow idle rate once the scene has
+been quiet for a while.  Measured detect() latency, this process's CPU use
+and the host load average stretch the interval so inference stays inside
+the configured CPU budget.
+"""
+
+import os
+import time
+
+# Rate controller configuration
+RATE_CONFIG = {
+    'active_interval': 0.0,   # Seconds between detections while a threat/track is active (0 = back to back)
+    'base_interval': 0.3,     # Normal interval
+    'idle_interval': 1.0,     # Interval once the scene has been quiet for quiet_after seconds
+    'quiet_after': 10.0,      # Seconds without a threat or track before dropping to the idle rate
+    'cpu_budget': 0.5,        # Share of all CPU cores this process may use (0..1)
+    'load_limit': 0.9,        # Host load average per core above which inference backs off
+    'sample_period': 1.0,     # Seconds between CPU / load measurements
+    'max_backoff': 4.0,       # Largest factor the interval is stretched by under load
+    'latency_smoothing': 0.2  # EMA weight of the newest detect() latency
+}
+
+
+def host_load():
+    """1-minute load average per core, or None where the OS does not provide it."""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class RateController:
+    """Decides when the next frame should go through the detector."""
+
+    def __init__(self):
+        self.active = False
+        self.latency = 0.0
+        self.backoff = 1.0
+        self.cpu_fraction = 0.0
+        self.load = None
+        self.skipped = 0
+        self.runs = 0
+        now = time.time()
+        self._last_run = 0.0
+        self._last_active = now
+        self._sample_wall = now
+        self._sample_cpu = time.process_time()
+
+    def set_active(self, active, now=None):
+        """Tell the controller whether a threat or weapon track is currently active."""
+        now = now if now is not None else time.time()
+        self.active = active
+        if active:
+            self._last_active = now
+
+    @property
+    def interval(self):
+        return self.interval_at(time.time())
+
+    def interval_at(self, now):
+        """Seconds between detector runs as of ``now``."""
+        if self.active:
+            target = RATE_CONFIG['active_interval']
+        elif now - self._last_active >= RATE_CONFIG['quiet_after']:
+            target = RATE_CONFIG['idle_interval']
+        else:
+            target = RATE_CONFIG['base_interval']
+        # Detection can never run faster than it takes; load and budget stretch the rest
+        return max(target, self.latency) * self.backoff
+
+    def due(self, now=None):
+        """Return True if the detector should run now; counts a skip otherwise."""
+        now = now if now is not None else time.time()
+        if now - self._last_run >= self.interval_at(now):
+            return True
+        self.skipped += 1
+        return False
+
+    def begin(self, now=None):
+        """Note that a detector run starts now, for runs that record() their latency later."""
+        self._last_run = max(self._last_run, now if now is not None else time.time())
+
+    def record(self, latency, started=None):
+        """Report one detector run that began at ``started`` and took ``latency`` seconds."""
+        self._last_run = max(self._last_run, started if started is not None else time.time() - latency)
+        self.runs += 1
+        alpha = RATE_CONFIG['latency_smoothing']
+        self.latency = latency if self.runs == 1 else (1 - alpha) * self.latency + alpha * latency
+        self._sample()
+
+    def _sample(self):
+        now = time.time()
+        elapsed = now - self._sample_wall
+        if elapsed < RATE_CONFIG['sample_period']:
+            return
+        cpu = time.process_time()
+        self.cpu_fraction = (cpu - self._sample_cpu) / (elapsed * (os.cpu_count() or 1))
+        self.load = host_load()
+        self._sample_wall, self._sample_cpu = now, cpu
+        overloaded = (self.cpu_fraction > RATE_CONFIG['cpu_budget'] or
+                      (self.load is not None and self.load > RATE_CONFIG['load_limit']))
+        if overloaded:
+            self.backoff = min(self.backoff * 1.25, RATE_CONFIG['max_backoff'])
+        else:
+            self.backoff = max(1.0, self.backoff / 1.1)
+
+    def stats(self):
+        return {
+            'interval_ms': self.interval * 1000,
+            'latency_ms': self.latency * 1000,
+            'cpu_fraction': self.cpu_fraction,
+            'host_load': self.load,
+            'backoff': self.backoff,
+            'runs': self.runs,
+            'skipped': self.skipped
+        }
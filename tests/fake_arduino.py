@@ -0,0 +1,109 @@
+"""
+threat_alert_system.ino on a pseudo-terminal, for testing the Arduino link
+without a board (POSIX only)::
+
+    fake = FakeArduino(boot_delay=0.5).start()
+    link = setup_arduino(fake.port)
+    link.set_state(True)      # fake.received == ['1'] shortly after
+"""
+
+import os
+import threading
+import time
+
+from arduino_link import ARDUINO_CONFIG
+
+
+class FakeArduino:
+    """The alarm sketch on a pty: banner on boot, replies to '1'/'0'.
+
+    ``port`` is the slave device path to hand to setup_arduino().  The
+    banner is printed ``boot_delay`` seconds after start() (and again on
+    reset()).  A pty cannot tell when the other end opens it, and opening
+    a serial port discards pending input, so the banner is repeated every
+    ``banner_interval`` seconds until the first command arrives, standing
+    in for the board's reboot on open.  Every '1'/'0' received is answered
+    like the sketch and recorded in ``received``.  stall() makes writes on the other end block
+    like on a hung USB port.
+    """
+
+    def __init__(self, boot_delay=0.0, banner=True, banner_interval=0.2):
+        import tty
+        self.master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self.boot_delay = boot_delay
+        self.banner = banner
+        self.banner_interval = banner_interval
+        self.received = []
+        self.stalled = False
+        self._running = False
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def start(self):
+        self._running = True
+        self._thread.start()
+        return self
+
+    def reset(self):
+        """Print the banner again, like the board does after a reboot."""
+        if self.banner:
+            os.write(self.master, (ARDUINO_CONFIG['banner'] + "\r\n").encode())
+
+    def stall(self, stalled=True):
+        """Stop reading and fill the board's input buffer, so the next write blocks."""
+        self.stalled = stalled
+        if not stalled:
+            return
+        time.sleep(0.2)  # Let the serving loop notice before the buffer is filled
+        fd = os.open(self.port, os.O_WRONLY | os.O_NONBLOCK | os.O_NOCTTY)
+        try:
+            while True:
+                os.write(fd, b"\0" * 1024)
+        except BlockingIOError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _serve(self):
+        import select
+        time.sleep(self.boot_delay)
+        self.reset()
+        last_banner = time.time()
+        while self._running:
+            if not self.received and time.time() - last_banner >= self.banner_interval:
+                self.reset()
+                last_banner = time.time()
+            if self.stalled:
+                time.sleep(0.05)
+                continue
+            readable, _, _ = select.select([self.master], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                data = os.read(self.master, 64)
+            except OSError:
+                break
+            for byte in data.decode(errors='ignore'):
+                if byte == '1':
+                    self.received.append(byte)
+                    os.write(self.master, b"ALERT ON: Threat Detected!\r\n")
+                elif byte == '0':
+                    self.received.append(byte)
+                    os.write(self.master, b"Alert OFF: No threat\r\n")
+
+    def close(self):
+        self._running = False
+        if self._thread.is_alive():
+            self._thread.join(1.0)
+        for fd in (self.master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
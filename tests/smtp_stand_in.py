@@ -0,0 +1,95 @@
+"""
+Minimal local SMTP server for delivery tests (no AUTH, no TLS).
+
+Counts connections and received messages, can reply with a temporary
+failure to the next few MAIL commands (fail_next) and can cut every open
+connection (drop_connections), like a server timing out an idle session.
+"""
+
+import socket
+import socketserver
+import threading
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            server.open_sockets.add(self.request)
+        try:
+            self._reply(220, "stand-in ESMTP")
+            in_data, lines = False, []
+            for raw in self.rfile:
+                line = raw.decode(errors='replace').rstrip("\r\n")
+                if in_data:
+                    if line == ".":
+                        in_data = False
+                        with server.lock:
+                            server.messages.append("\n".join(lines))
+                        self._reply(250, "queued")
+                    else:
+                        lines.append(line[1:] if line.startswith("..") else line)
+                    continue
+                command = line[:4].upper()
+                if command == "EHLO":
+                    self.wfile.write(b"250-stand-in\r\n250 8BITMIME\r\n")
+                elif command == "MAIL":
+                    with server.lock:
+                        failing = server.failures > 0
+                        server.failures -= failing
+                    self._reply(451, "try again later") if failing else self._reply(250, "ok")
+                elif command == "DATA":
+                    in_data, lines = True, []
+                    self._reply(354, "go ahead")
+                elif command == "QUIT":
+                    self._reply(221, "bye")
+                    break
+                else:  # HELO, RCPT, RSET, NOOP
+                    self._reply(250, "ok")
+        except OSError:
+            pass
+        finally:
+            with server.lock:
+                server.open_sockets.discard(self.request)
+
+    def _reply(self, code, text):
+        self.wfile.write(f"{code} {text}\r\n".encode())
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.port = self.server_address[1]
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+        self.failures = 0
+        self.open_sockets = set()
+
+    def fail_next(self, count):
+        """Answer the next ``count`` MAIL commands with 451."""
+        with self.lock:
+            self.failures = count
+
+    def drop_connections(self):
+        with self.lock:
+            sockets = list(self.open_sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.drop_connections()
+        self.server_close()
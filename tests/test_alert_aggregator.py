@@ -0,0 +1,193 @@
+"""AlertAggregator with explicit timestamps and a stub dispatcher: incident lifecycle, rate limits, flush."""
+
+import numpy as np
+import pytest
+
+from alert_aggregator import ALERT_CONFIG, AlertAggregator
+from threat_detection import build_detection_result
+
+NAMES = {0: 'person', 1: 'gun', 2: 'rifle'}
+
+
+def threat(confidence=0.5, class_id=1):
+    return build_detection_result((48, 64, 3), np.array([[5, 5, 30, 30]], dtype=np.float32), [confidence],
+                                  [class_id], NAMES)
+
+
+def frame(value=0):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+class Dispatcher:
+    """Records queued e-mails; ``outcome`` is what send_fn returns (True, False or None)."""
+
+    def __init__(self, outcome=True):
+        self.outcome = outcome
+        self.messages = []
+
+    def __call__(self, images, details):
+        if self.outcome:
+            self.messages.append((images, details))
+        return self.outcome
+
+    @property
+    def kinds(self):
+        return [details['alert_kind'].split(' ', 2)[2] for _, details in self.messages]
+
+
+class Evidence:
+    def __init__(self):
+        self.saved = []
+
+    def submit(self, image, result=None, source="Default", kind="manual"):
+        self.saved.append((image, result, source, kind))
+        return f"id{len(self.saved)}"
+
+
+def test_incident_opens_updates_and_closes(monkeypatch):
+    monkeypatch.setitem(ALERT_CONFIG, 'escalate_after', 1000.0)
+    sent = Dispatcher()
+    alerts = AlertAggregator(sent)
+    alerts.observe("cam", True, frame(), threat(0.5), now=0.0)
+    assert sent.kinds == ["opened"]
+    images, details = sent.messages[0]
+    assert len(images) == 1 and details['stream'] == "cam"
+    assert "Events: 1 (1 since last message)" in details['summary']
+
+    for i in range(1, 10):  # Steady threat, nothing new to say before update_interval
+        alerts.observe("cam", True, frame(i), threat(0.4 + i / 100), now=float(i))
+    assert sent.kinds == ["opened"]
+    alerts.observe("cam", True, frame(), threat(0.5), now=ALERT_CONFIG['update_interval'] + 1)
+    assert sent.kinds == ["opened", "update"]
+    images, details = sent.messages[1]
+    assert len(images) == ALERT_CONFIG['best_frames']
+    assert "Events: 11 (10 since last message)" in details['summary']
+
+    # Smoothed threat off: the incident closes after incident_gap
+    last = ALERT_CONFIG['update_interval'] + 1
+    alerts.observe("cam", False, frame(), threat(0.1), now=last + 1)
+    alerts.tick(last + ALERT_CONFIG['incident_gap'] - 0.5)
+    assert "cam" in alerts.incidents
+    alerts.tick(last + ALERT_CONFIG['incident_gap'] + 0.5)
+    assert "cam" not in alerts.incidents
+    assert sent.kinds == ["opened", "update", "closed"]
+    assert alerts.sent == 3 and alerts.logged == 0
+
+
+def test_best_frames_are_the_most_confident():
+    sent = Dispatcher()
+    alerts = AlertAggregator(sent)
+    confidences = [0.3, 0.7, 0.5, 0.6, 0.4]
+    for i, confidence in enumerate(confidences):
+        alerts.observe("cam", True, frame(i), threat(confidence), now=float(i))
+    incident = alerts.incidents["cam"]
+    assert [round(r.threat_confidence, 2) for _, r in incident.best()] == [0.7, 0.6, 0.5]
+
+
+def test_escalation_on_confidence():
+    sent = Dispatcher()
+    alerts = AlertAggregator(sent)
+    alerts.observe("cam", True, frame(), threat(0.5), now=0.0)
+    alerts.observe("cam", True, frame(), threat(0.9, class_id=2), now=ALERT_CONFIG['min_spacing'] + 1)
+    assert sent.kinds == ["opened", "ESCALATED"]
+    assert "Weapon classes: gun, rifle" in sent.messages[1][1]['summary']
+    # Escalates once
+    alerts.observe("cam", True, frame(), threat(0.95), now=2 * ALERT_CONFIG['min_spacing'] + 2)
+    assert sent.kinds == ["opened", "ESCALATED"]
+
+
+def test_no_incident_without_a_threat():
+    sent = Dispatcher()
+    alerts = AlertAggregator(sent)
+    alerts.observe("cam", False, frame(), threat(0.9), now=0.0)
+    alerts.observe("cam", True, frame(), build_detection_result((48, 64, 3), np.zeros((0, 4)), [], [], NAMES), now=1.0)
+    assert not alerts.incidents and not sent.messages
+
+
+def test_min_spacing_holds_messages_in_backlog():
+    sent = Dispatcher()
+    alerts = AlertAggregator(sent)
+    alerts.observe("cam1", True, frame(), threat(), now=0.0)
+    alerts.observe("cam2", True, frame(), threat(), now=1.0)
+    assert len(sent.messages) == 1 and alerts.backlog == 1
+    alerts.tick(ALERT_CONFIG['min_spacing'] - 0.5)
+    assert len(sent.messages) == 1
+    alerts.tick(ALERT_CONFIG['min_spacing'] + 0.5)
+    assert len(sent.messages) == 2 and alerts.backlog == 0
+    assert sent.messages[1][1]['stream'] == "cam2"
+
+
+def test_hourly_budget(monkeypatch):
+    monkeypatch.setitem(ALERT_CONFIG, 'max_per_hour', 2)
+    monkeypatch.setitem(ALERT_CONFIG, 'min_spacing', 0.0)
+    sent = Dispatcher()
+    alerts = AlertAggregator(sent)
+    for i in range(3):
+        alerts.observe(f"cam{i}", True, frame(), threat(), now=float(i))
+    assert len(sent.messages) == 2 and alerts.backlog == 1
+    alerts.tick(3600.5)  # The first send is an hour old, the second is not
+    assert len(sent.messages) == 3
+    assert sent.messages[2][1]['stream'] == "cam2" and sent.kinds[2] == "opened"
+
+
+def test_dispatcher_busy_is_retried(monkeypatch):
+    monkeypatch.setitem(ALERT_CONFIG, 'retry_interval', 5.0)
+    sent = Dispatcher(outcome=False)
+    alerts = AlertAggregator(sent)
+    alerts.observe("cam", True, frame(), threat(), now=0.0)
+    assert alerts.backlog == 1
+    sent.outcome = True
+    alerts.tick(ALERT_CONFIG['retry_interval'] - 1)
+    assert not sent.messages
+    alerts.tick(ALERT_CONFIG['retry_interval'] + 1)
+    assert sent.kinds == ["opened"] and alerts.backlog == 0
+
+
+def test_email_off_logs_instead(capsys):
+    alerts = AlertAggregator(Dispatcher(outcome=None))
+    alerts.observe("cam", True, frame(), threat(), now=0.0)
+    assert alerts.logged == 1 and alerts.sent == 0 and alerts.backlog == 0
+    assert "opened (e-mail off)" in capsys.readouterr().out
+
+
+def test_full_backlog_logs_the_oldest(monkeypatch):
+    monkeypatch.setitem(ALERT_CONFIG, 'max_backlog', 2)
+    sent = Dispatcher(outcome=False)
+    alerts = AlertAggregator(sent)
+    for i in range(4):
+        alerts.observe(f"cam{i}", True, frame(), threat(), now=float(i))
+    assert alerts.backlog == 2 and alerts.logged == 2
+
+
+def test_flush_closes_incidents_and_ignores_rate_limits():
+    sent = Dispatcher()
+    alerts = AlertAggregator(sent)
+    alerts.observe("cam1", True, frame(), threat(), now=0.0)
+    alerts.observe("cam2", True, frame(), threat(), now=1.0)  # Held back by min_spacing
+    alerts.flush()
+    assert not alerts.incidents and alerts.backlog == 0
+    assert sorted(sent.kinds) == ["closed", "closed", "opened", "opened"]
+    assert alerts.sent == 4
+
+
+def test_flush_logs_what_cannot_be_queued():
+    sent = Dispatcher()
+    alerts = AlertAggregator(sent)
+    alerts.observe("cam", True, frame(), threat(), now=0.0)
+    sent.outcome = False
+    alerts.flush()
+    assert alerts.sent == 1 and alerts.logged == 1
+
+
+def test_alert_frames_saved_as_evidence_once():
+    evidence = Evidence()
+    sent = Dispatcher()
+    alerts = AlertAggregator(sent, evidence)
+    alerts.observe("cam", True, frame(1), threat(0.5), now=0.0)
+    alerts.observe("cam", True, frame(2), threat(0.6), now=1.0)
+    alerts.flush()
+    assert [(source, kind) for _, _, source, kind in evidence.saved] == [("cam", "alert")] * 2
+    saved = [image for image, _, _, _ in evidence.saved]
+    assert all(image in saved for image in sent.messages[-1][0])
+    assert [image.evidence_id for image in saved] == ["id1", "id2"]
+    assert evidence.saved[1][1].threat_confidence == pytest.approx(0.6)
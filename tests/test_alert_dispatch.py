@@ -0,0 +1,124 @@
+"""AlertDispatcher / SMTPSession against a local SMTP stand-in: session reuse, reconnects, retries, drops."""
+
+import threading
+import time
+from email.message import EmailMessage
+
+import pytest
+
+from alert_dispatch import ALERT_DISPATCH_CONFIG, AlertDispatcher
+from smtp_stand_in import SMTPStandIn
+
+
+@pytest.fixture
+def server():
+    with SMTPStandIn() as stand_in:
+        yield stand_in
+
+
+@pytest.fixture
+def config(server):
+    return {
+        'smtp_server': '127.0.0.1',
+        'smtp_port': server.port,
+        'use_tls': False,
+        'sender_email': 'system@example.com',
+        'sender_password': '',
+        'recipient_email': 'guard@example.com'
+    }
+
+
+def alert(subject):
+    def build():
+        message = EmailMessage()
+        message['From'], message['To'], message['Subject'] = 'system@example.com', 'guard@example.com', subject
+        message.set_content("Threat detected")
+        return message
+    return build
+
+
+def deliver(dispatcher, *builders):
+    """Submit alerts and wait for each result; returns [(ok, info), ...]."""
+    results = []
+    done = threading.Semaphore(0)
+
+    def on_result(ok, info):
+        results.append((ok, info))
+        done.release()
+
+    for build in builders:
+        assert dispatcher.submit(build, on_result)
+    for _ in builders:
+        assert done.acquire(timeout=10)
+    return results
+
+
+def test_alerts_share_one_session(server, config):
+    dispatcher = AlertDispatcher(config)
+    dispatcher.start()
+    try:
+        results = deliver(dispatcher, alert("one"), alert("two"), alert("three"))
+    finally:
+        dispatcher.stop()
+    assert [ok for ok, _ in results] == [True, True, True]
+    assert len(server.messages) == 3
+    assert server.connections == 1
+    assert dispatcher.stats()['connects'] == 1
+
+
+def test_reconnects_after_the_server_drops_the_session(server, config):
+    dispatcher = AlertDispatcher(config)
+    dispatcher.start()
+    try:
+        deliver(dispatcher, alert("before"))
+        server.drop_connections()
+        time.sleep(0.1)
+        results = deliver(dispatcher, alert("after"))
+    finally:
+        dispatcher.stop()
+    assert results == [(True, 'guard@example.com')]
+    assert len(server.messages) == 2
+    assert server.connections == 2
+    assert dispatcher.failed == 0
+    assert dispatcher.retries == 0  # The dropped session is replaced within the same attempt
+
+
+def test_retries_with_backoff(server, config, monkeypatch):
+    monkeypatch.setitem(ALERT_DISPATCH_CONFIG, 'retry_backoff', 0.1)
+    server.fail_next(2)
+    dispatcher = AlertDispatcher(config)
+    dispatcher.start()
+    try:
+        started = time.time()
+        results = deliver(dispatcher, alert("retried"))
+        elapsed = time.time() - started
+    finally:
+        dispatcher.stop()
+    assert results[0][0]
+    assert dispatcher.retries == 2
+    assert elapsed >= 0.1 + 0.2  # Backoff doubles after each failure
+    assert len(server.messages) == 1
+
+
+def test_gives_up_after_max_attempts(server, config, monkeypatch):
+    monkeypatch.setitem(ALERT_DISPATCH_CONFIG, 'retry_backoff', 0.01)
+    monkeypatch.setitem(ALERT_DISPATCH_CONFIG, 'max_attempts', 3)
+    server.fail_next(10)
+    dispatcher = AlertDispatcher(config)
+    dispatcher.start()
+    try:
+        results = deliver(dispatcher, alert("lost"))
+    finally:
+        dispatcher.stop()
+    assert not results[0][0]
+    assert dispatcher.failed == 1
+    assert dispatcher.retries == 2
+    assert server.messages == []
+
+
+def test_full_queue_drops_alerts(config, monkeypatch):
+    monkeypatch.setitem(ALERT_DISPATCH_CONFIG, 'queue_size', 2)
+    dispatcher = AlertDispatcher(config)  # Not started, so nothing drains the queue
+    accepted = [dispatcher.submit(alert(str(i))) for i in range(5)]
+    assert accepted == [True, True, False, False, False]
+    assert dispatcher.stats()['dropped'] == 3
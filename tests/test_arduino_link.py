@@ -0,0 +1,147 @@
+"""ArduinoLink against FakeArduino: banner handshake, state coalescing, stalls and reconnects."""
+
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("serial")
+if sys.platform == "win32":
+    pytest.skip("FakeArduino needs a POSIX pseudo-terminal", allow_module_level=True)
+
+import arduino_link
+from arduino_link import ARDUINO_CONFIG, ArduinoLink, discover_arduino
+from fake_arduino import FakeArduino
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+@pytest.fixture
+def ports(monkeypatch):
+    """The serial ports discovery sees; tests fill it with fake boards only."""
+    found = []
+    monkeypatch.setattr(arduino_link, 'candidate_ports', lambda port=None: [port] if port else list(found))
+    monkeypatch.setitem(ARDUINO_CONFIG, 'handshake_timeout', 1.0)
+    monkeypatch.setitem(ARDUINO_CONFIG, 'reconnect_interval', 0.1)
+    return found
+
+
+def test_handshake_waits_for_banner(ports):
+    with FakeArduino(boot_delay=0.3) as fake:
+        ports.append(fake.port)
+        port, conn = discover_arduino()
+        assert port == fake.port
+        conn.close()
+
+
+def test_silent_port_is_not_taken_for_the_board(ports):
+    with FakeArduino(banner=False) as fake:
+        ports.append(fake.port)
+        assert discover_arduino() == (None, None)
+
+
+def test_states_are_coalesced(ports):
+    with FakeArduino() as fake:
+        ports.append(fake.port)
+        link = ArduinoLink()
+        link.start()
+        try:
+            assert link.wait_connected(3.0)
+            for i in range(2000):
+                link.set_state(i % 2 == 0)
+            link.set_state(True)
+            assert wait_until(lambda: fake.received and fake.received[-1] == '1')
+            assert link.writes < 2000
+            assert link.coalesced > 0
+        finally:
+            link.close()
+
+
+def test_stalled_port_never_blocks_set_state(ports, monkeypatch):
+    monkeypatch.setitem(ARDUINO_CONFIG, 'write_timeout', 0.1)
+    with FakeArduino() as fake:
+        ports.append(fake.port)
+        link = ArduinoLink()
+        link.start()
+        try:
+            assert link.wait_connected(3.0)
+            fake.stall()
+            started = time.time()
+            for i in range(10000):
+                link.set_state(i % 2 == 0)
+            # The writer is stuck in a blocked write; the detection side never waited for it
+            assert time.time() - started < 1.0
+            assert wait_until(lambda: link.errors == 1 and not link.connected)
+        finally:
+            link.close()
+
+
+def test_reconnects_after_the_board_is_lost(ports):
+    first = FakeArduino().start()
+    ports.append(first.port)
+    link = ArduinoLink()
+    link.start()
+    try:
+        assert link.wait_connected(3.0)
+        link.set_state(True)
+        assert wait_until(lambda: first.received == ['1'])
+        first.close()  # Unplugged
+        with FakeArduino() as second:
+            ports[:] = [second.port]
+            link.set_state(False)  # This write fails and sends the link looking for the board
+            # The new board gets the current state once it is found
+            assert wait_until(lambda: link.connects == 2 and second.received == ['0'])
+            assert link.errors == 1
+            assert link.port == second.port
+    finally:
+        link.close()
+
+
+def test_discovery_gives_up_until_asked(ports, monkeypatch):
+    monkeypatch.setitem(ARDUINO_CONFIG, 'max_discovery_attempts', 2)
+    link = ArduinoLink()
+    link.start()
+    try:
+        assert wait_until(lambda: not link.searching)
+        assert link.connects == 0
+        with FakeArduino() as fake:
+            ports.append(fake.port)
+            time.sleep(0.3)
+            assert link.connects == 0  # No probing while given up
+            link.rediscover()
+            assert wait_until(lambda: link.connected)
+            assert link.port == fake.port
+    finally:
+        link.close()
+
+
+def test_discovery_timeout_covers_every_probe_wave(monkeypatch):
+    monkeypatch.setattr(arduino_link, 'candidate_ports', lambda port=None: [f"/dev/tty{i}" for i in range(20)])
+    monkeypatch.setitem(ARDUINO_CONFIG, 'probe_workers', 8)
+    assert arduino_link.discovery_timeout(timeout=4.0) == 12.0
+    monkeypatch.setattr(arduino_link, 'candidate_ports', lambda port=None: [])
+    assert arduino_link.discovery_timeout(timeout=4.0) == 4.0
+
+
+def test_setup_waits_for_a_board_in_a_later_probe_wave(ports, monkeypatch):
+    from threat_detection import setup_arduino
+    monkeypatch.setitem(ARDUINO_CONFIG, 'probe_workers', 1)
+    silent = [FakeArduino(banner=False).start() for _ in range(3)]
+    try:
+        with FakeArduino() as fake:
+            ports.extend([s.port for s in silent] + [fake.port])
+            link = setup_arduino()  # Four one-second waves: longer than one handshake plus slack
+            try:
+                assert link is not None and link.port == fake.port
+            finally:
+                link.close()
+    finally:
+        for s in silent:
+            s.close()
@@ -0,0 +1,98 @@
+"""BatchAnalyzer on a small generated video with a stub detector: progress totals, failing stages."""
+
+import json
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+import batch_analysis
+from batch_analysis import BatchAnalyzer, expected_frames, iter_frames
+from threat_detection import build_detection_result
+
+FPS = 30.0
+FRAMES = 90
+
+
+@pytest.fixture(scope='module')
+def video(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('videos') / 'clip.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), FPS, (64, 48))
+    for i in range(FRAMES):
+        writer.write(np.full((48, 64, 3), i, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    monkeypatch.setattr(batch_analysis, 'load_yolo', lambda *args, **kwargs: object())
+    monkeypatch.setattr(batch_analysis, 'warmup_model', lambda *args, **kwargs: None)
+
+
+def empty_results(frames, model):
+    return [build_detection_result(f.shape, np.zeros((0, 4)), [], [], {0: 'person'}) for f in frames]
+
+
+def run_with_timeout(analyzer, seconds=20):
+    outcome = []
+    thread = threading.Thread(target=lambda: outcome.append(analyzer.run()), daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "run() did not return"
+    return outcome[0]
+
+
+@pytest.mark.parametrize('stride, start, end', [(5, 0.0, None), (5, 1.0, None), (4, 0.5, 2.0), (7, 0.0, 1.0),
+                                                (30, 0.0, None), (30, 1.0, 2.5)])
+def test_expected_frames_matches_iter_frames(video, stride, start, end):
+    yielded = list(iter_frames(video, stride, start, end))
+    assert expected_frames(FPS, FRAMES, stride, start, end) == len(yielded)
+
+
+def test_progress_total_follows_start_and_end(video, stub_model, monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(batch_analysis, 'detect_batch', empty_results)
+    analyzer = BatchAnalyzer([video], output=str(tmp_path / 'index.jsonl'), stride=5, workers=1, start=1.0, end=2.0)
+    run_with_timeout(analyzer)
+    assert analyzer.frames_analysed == expected_frames(FPS, FRAMES, 5, 1.0, 2.0) == 7
+    assert "| 100% |" in capsys.readouterr().out
+
+
+def test_failing_worker_does_not_hang_run(video, stub_model, monkeypatch, tmp_path, capsys):
+    def broken(frames, model):
+        raise MemoryError("out of memory")
+
+    monkeypatch.setattr(batch_analysis, 'detect_batch', broken)
+    analyzer = BatchAnalyzer([video], output=str(tmp_path / 'index.jsonl'), stride=5, workers=2, batch_size=4)
+    path = run_with_timeout(analyzer)
+    assert "infer stage failed" in capsys.readouterr().out
+    assert analyzer.frames_analysed == 0
+    with open(path) as f:
+        assert f.read() == ""
+
+
+def test_failing_decoder_does_not_hang_run(video, stub_model, monkeypatch, tmp_path, capsys):
+    def broken(*args, **kwargs):
+        yield 0, 0.0, np.zeros((48, 64, 3), dtype=np.uint8)
+        raise OSError("disk gone")
+
+    monkeypatch.setattr(batch_analysis, 'iter_frames', broken)
+    monkeypatch.setattr(batch_analysis, 'detect_batch', empty_results)
+    analyzer = BatchAnalyzer([video], output=str(tmp_path / 'index.jsonl'), workers=1)
+    run_with_timeout(analyzer)
+    assert "decode stage failed" in capsys.readouterr().out
+
+
+def test_frames_index_written_in_order(video, stub_model, monkeypatch, tmp_path):
+    def one_box(frames, model):
+        return [build_detection_result(f.shape, np.array([[1, 1, 10, 10]], dtype=np.float32), [0.6], [0],
+                                       {0: 'person'}) for f in frames]
+
+    monkeypatch.setattr(batch_analysis, 'detect_batch', one_box)
+    analyzer = BatchAnalyzer([video], output=str(tmp_path / 'index.jsonl'), index='frames', stride=10, workers=3,
+                             batch_size=2)
+    path = run_with_timeout(analyzer)
+    with open(path) as f:
+        frames = [json.loads(line)['frame'] for line in f]
+    assert frames == list(range(0, FRAMES, 10))
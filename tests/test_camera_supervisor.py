@@ -0,0 +1,127 @@
+"""SupervisedCapture with a fake opener: slow but live sources, reconnects with backoff, giving up."""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from camera_supervisor import SUPERVISOR_CONFIG, SupervisedCapture
+
+
+@pytest.fixture(autouse=True)
+def fast_config(monkeypatch):
+    for key, value in {'stall_timeout': 0.4, 'initial_backoff': 0.05, 'max_backoff': 0.2, 'stale_interval': 0.05,
+                       'check_interval': 0.02, 'max_attempts': 0}.items():
+        monkeypatch.setitem(SUPERVISOR_CONFIG, key, value)
+
+
+class FakeCap:
+    """A camera delivering ``frames`` frames ``period`` seconds apart, then failing (or hanging)."""
+
+    def __init__(self, value, frames=None, period=0.01, hang=False):
+        self.value = value
+        self.frames = frames
+        self.period = period
+        self.hang = hang
+        self.delivered = 0
+        self.released = threading.Event()
+
+    def read(self):
+        if self.frames is not None and self.delivered >= self.frames:
+            if self.hang:
+                self.released.wait(5)
+            return False, None
+        time.sleep(self.period)
+        self.delivered += 1
+        return True, np.full((2, 2), self.value, dtype=np.uint8)
+
+    def set(self, prop, value):
+        return True
+
+    def release(self):
+        self.released.set()
+
+
+class Opener:
+    """Hands out the given captures in turn (None = the open fails) and records when it was called."""
+
+    def __init__(self, *caps):
+        self.caps = list(caps)
+        self.calls = []
+
+    def __call__(self, source):
+        self.calls.append(time.time())
+        return self.caps.pop(0) if self.caps else None
+
+
+def read_for(cap, seconds):
+    reads = []
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        ret, frame = cap.read()
+        if not ret:
+            reads.append(None)
+            break
+        reads.append((int(frame[0, 0]), cap.stale))
+    return reads
+
+
+def test_slow_live_source_is_not_stale():
+    # Four times slower than stale_interval, but well inside stall_timeout
+    cap = SupervisedCapture("cam", cap=FakeCap(1, period=0.2), opener=Opener()).start()
+    try:
+        reads = read_for(cap, 1.0)
+        assert len(reads) >= 3
+        assert all(not stale for _, stale in reads)
+        assert cap.state == 'live' and cap.stalls == 0
+    finally:
+        cap.release()
+
+
+def test_read_failure_reconnects_and_serves_stale_frames_meanwhile():
+    opener = Opener(None, None, FakeCap(2))
+    cap = SupervisedCapture("cam", cap=FakeCap(1, frames=5), opener=opener).start()
+    try:
+        reads = read_for(cap, 1.5)
+        values = [value for value, _ in reads]
+        assert values[:5] == [1] * 5
+        stale = [(value, flag) for value, flag in reads if flag]
+        assert stale and all(value == 1 for value, _ in stale)  # The last good frame, re-served
+        assert values[-1] == 2 and not reads[-1][1]
+        first_live_2 = values.index(2)
+        assert all(flag for _, flag in reads[5:first_live_2])
+        assert cap.state == 'live'
+        assert cap.stalls == 1 and cap.reconnects == 1
+        # Two failed opens before the third succeeds, each wait twice the last
+        gaps = [b - a for a, b in zip(opener.calls, opener.calls[1:])]
+        assert len(opener.calls) == 3
+        assert gaps[1] > gaps[0] * 1.5
+    finally:
+        cap.release()
+
+
+def test_hung_read_counts_as_stall():
+    hung = FakeCap(1, frames=3, hang=True)
+    cap = SupervisedCapture("cam", cap=hung, opener=Opener(FakeCap(2))).start()
+    try:
+        reads = read_for(cap, 1.5)
+        assert reads[-1] == (2, False)
+        assert cap.stalls == 1 and cap.reconnects == 1
+        assert not hung.released.is_set()  # Released by its own reader once the hung read returns
+    finally:
+        cap.release()
+
+
+def test_gives_up_after_max_attempts(monkeypatch):
+    monkeypatch.setitem(SUPERVISOR_CONFIG, 'max_attempts', 3)
+    opener = Opener()
+    cap = SupervisedCapture("cam", cap=FakeCap(1, frames=2), opener=opener).start()
+    try:
+        reads = read_for(cap, 3.0)
+        assert reads[-1] is None
+        assert cap.state == 'failed' and not cap.isOpened()
+        assert len(opener.calls) == 3
+        assert cap.read() == (False, None)
+    finally:
+        cap.release()
@@ -0,0 +1,55 @@
+"""build_detection_result: threat classification, per-class scores, and the class-mask cache."""
+
+import numpy as np
+import pytest
+
+import threat_detection
+from threat_detection import DETECTION_CONFIG, build_detection_result
+
+COCO_LIKE = {0: 'person', 1: 'gun', 2: 'car', 3: 'rifle'}
+
+
+def boxes(n):
+    return np.array([[10 * i, 10, 10 * i + 20, 40] for i in range(n)], dtype=np.float32)
+
+
+def test_weapons_are_flagged_and_scored():
+    result = build_detection_result((480, 640, 3), boxes(4), [0.9, 0.4, 0.7, 0.55], [0, 1, 0, 3], COCO_LIKE)
+    assert result.valid and result.threat_detected
+    assert result.threat_mask.tolist() == [False, True, False, True]
+    assert result.threat_confidence == pytest.approx(0.55)
+    assert result.class_scores == pytest.approx({'person': 0.9, 'gun': 0.4, 'rifle': 0.55})
+    assert result.threat_details['threat_level'] == "HIGH THREAT" and result.threat_details['threat_score'] == 10
+    assert sorted(result.threat_details['detected_objects']) == ['gun', 'person', 'rifle']
+    assert [d.class_name for d in result.detections if d.is_threat] == ['gun', 'rifle']
+
+
+def test_no_weapons_and_no_detections():
+    people = build_detection_result((480, 640, 3), boxes(2), [0.8, 0.6], [0, 2], COCO_LIKE)
+    assert not people.threat_detected and not people.threat_mask.any()
+    assert people.threat_details['threat_level'] == "NORMAL" and people.threat_confidence == 0.0
+    empty = build_detection_result((480, 640, 3), np.zeros((0, 4)), [], [], COCO_LIKE)
+    assert not empty.threat_detected and empty.class_scores == {} and empty.detections == []
+    assert build_detection_result((480, 640, 3), np.zeros((0, 4)), [], [], {}).threat_mask.size == 0
+
+
+def test_mask_follows_class_names_not_dict_identity():
+    first = build_detection_result((480, 640, 3), boxes(1), [0.5], [1], {0: 'person', 1: 'gun'})
+    # A different model whose class 1 is harmless, even if its dict reuses the old one's id
+    second = build_detection_result((480, 640, 3), boxes(1), [0.5], [1], {0: 'person', 1: 'phone'})
+    assert first.threat_detected and not second.threat_detected
+    # Equal class lists share one table
+    assert threat_detection._threat_class_mask(dict(COCO_LIKE)) is threat_detection._threat_class_mask(COCO_LIKE)
+
+
+def test_mask_follows_threat_class_config(monkeypatch):
+    assert not build_detection_result((480, 640, 3), boxes(1), [0.5], [2], COCO_LIKE).threat_detected
+    monkeypatch.setitem(DETECTION_CONFIG, 'threat_classes', ['car'])
+    assert build_detection_result((480, 640, 3), boxes(1), [0.5], [2], COCO_LIKE).threat_detected
+
+
+def test_mask_cache_is_bounded():
+    for i in range(100):
+        threat_detection._threat_class_mask({0: 'person', 1: f"class{i}"})
+    info = threat_detection._threat_mask_for.cache_info()
+    assert info.currsize <= info.maxsize
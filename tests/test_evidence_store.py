@@ -0,0 +1,121 @@
+"""EvidenceStore in a tmp_path: writing and indexing, retention by age and size, queue-full drops."""
+
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from evidence_store import EVIDENCE_CONFIG, EvidenceIndex, EvidenceStore
+from frame_encoding import EncodedFrame
+from threat_detection import build_detection_result
+
+NAMES = {0: 'person', 1: 'gun'}
+
+
+@pytest.fixture(autouse=True)
+def no_limits(monkeypatch):
+    monkeypatch.setitem(EVIDENCE_CONFIG, 'max_age_days', 0)
+    monkeypatch.setitem(EVIDENCE_CONFIG, 'max_total_mb', 0)
+
+
+def image(days_ago=0, minutes=0):
+    rng = np.random.default_rng(days_ago * 100 + minutes)
+    frame = EncodedFrame(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8))
+    frame.captured_at = (datetime.now() - timedelta(days=days_ago)).replace(hour=12, minute=minutes)
+    return frame
+
+
+def write(store, images):
+    """Save the images through the writer thread; returns their evidence ids."""
+    store.start()
+    ids = [store.submit(img, source="cam") for img in images]
+    store.stop()
+    assert store.saved == len(images)
+    return ids
+
+
+def indexed_ids(root, kind):
+    if kind == 'sqlite':
+        with sqlite3.connect(os.path.join(root, 'index.sqlite')) as db:
+            return {row[0] for row in db.execute("SELECT id FROM evidence")}
+    with open(os.path.join(root, 'index.jsonl')) as f:
+        return {json.loads(line)['id'] for line in f}
+
+
+def sweep(root, kind):
+    store = EvidenceStore(root, kind)
+    index = EvidenceIndex(root, kind)
+    try:
+        return store, store._sweep(index)
+    finally:
+        index.close()
+
+
+@pytest.mark.parametrize('kind', ['jsonl', 'sqlite'])
+def test_saved_frames_are_partitioned_and_indexed(tmp_path, kind):
+    root = str(tmp_path)
+    store = EvidenceStore(root, kind)
+    result = build_detection_result((48, 64, 3), np.array([[5, 5, 30, 30]], dtype=np.float32), [0.7], [1], NAMES)
+    img = image()
+    store.start()
+    evidence_id = store.submit(img, result, "cam", kind='alert')
+    store.stop()
+    path = store.path_for(evidence_id, img.captured_at)
+    assert os.path.dirname(path) == os.path.join(root, *img.captured_at.strftime('%Y %m %d').split())
+    with open(path, 'rb') as f:
+        assert f.read() == img.jpeg
+    assert indexed_ids(root, kind) == {evidence_id}
+    if kind == 'jsonl':
+        with open(os.path.join(root, 'index.jsonl')) as f:
+            record = json.loads(f.readline())
+        assert record['kind'] == 'alert' and record['threat'] and record['objects'][0]['class'] == 'gun'
+
+
+@pytest.mark.parametrize('kind', ['jsonl', 'sqlite'])
+def test_age_cutoff_removes_old_days(tmp_path, monkeypatch, kind):
+    root = str(tmp_path)
+    old = write(EvidenceStore(root, kind), [image(40), image(40, 1), image(35)])
+    recent = write(EvidenceStore(root, kind), [image(10), image(0)])
+    monkeypatch.setitem(EVIDENCE_CONFIG, 'max_age_days', 30)
+    store, removed = sweep(root, kind)
+    assert removed == 3 and store.pruned == 3
+    assert indexed_ids(root, kind) == set(recent)
+    remaining = [f for _, _, files in os.walk(root) for f in files if f.endswith('.jpg')]
+    assert sorted(remaining) == sorted(f"threat_detection_{i}.jpg" for i in recent)
+    assert not set(old) & indexed_ids(root, kind)
+    # Month and year directories left empty by the old days are gone too
+    assert all(dirnames or filenames for _, dirnames, filenames in os.walk(root))
+
+
+@pytest.mark.parametrize('kind', ['jsonl', 'sqlite'])
+def test_size_limit_prunes_oldest_first(tmp_path, monkeypatch, kind):
+    root = str(tmp_path)
+    images = [image(3), image(2), image(1, 5), image(1, 30), image(0)]
+    ids = write(EvidenceStore(root, kind), images)
+    sizes = [len(img.jpeg) for img in images]
+    # Room for the newest two files only
+    monkeypatch.setitem(EVIDENCE_CONFIG, 'max_total_mb', (sizes[-1] + sizes[-2] + 1) / (1024 * 1024))
+    store, removed = sweep(root, kind)
+    assert removed == 3
+    assert indexed_ids(root, kind) == set(ids[-2:])
+    for evidence_id, img in zip(ids, images):
+        assert os.path.exists(store.path_for(evidence_id, img.captured_at)) == (evidence_id in ids[-2:])
+
+
+def test_sweep_without_limits_keeps_everything(tmp_path):
+    root = str(tmp_path)
+    ids = write(EvidenceStore(root, 'jsonl'), [image(400), image(0)])
+    _, removed = sweep(root, 'jsonl')
+    assert removed == 0 and indexed_ids(root, 'jsonl') == set(ids)
+
+
+def test_submit_drops_when_queue_is_full(tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(EVIDENCE_CONFIG, 'queue_size', 2)
+    store = EvidenceStore(str(tmp_path))  # Writer not started, so nothing drains the queue
+    assert store.submit(image()) and store.submit(image())
+    assert store.submit(image()) is None
+    assert store.dropped == 1 and store.stats()['queued'] == 2
+    assert "Writer queue full" in capsys.readouterr().out
@@ -0,0 +1,92 @@
+"""FrameRing: slot reuse, overwrite detection and checked copies."""
+
+import numpy as np
+
+from frame_ring import FrameRing
+
+
+def frame(value, shape=(4, 6, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_empty_ring():
+    ring = FrameRing(slots=4)
+    assert ring.latest() is None
+    assert ring.latest_id == 0
+    assert ring.get(1) is None
+    assert not ring.valid(1)
+    assert ring.copy_latest() is None
+    assert ring.wait_newer(0, timeout=0.01) is None
+
+
+def test_wrap_around_keeps_last_slots():
+    ring = FrameRing(slots=4)
+    ids = [ring.put(frame(i), timestamp=float(i)) for i in range(1, 11)]
+    assert ids == list(range(1, 11))
+    latest = ring.latest()
+    assert latest.frame_id == 10 and latest.timestamp == 10.0
+    assert int(latest.frame[0, 0, 0]) == 10
+    assert [ring.get(i) is not None for i in range(5, 11)] == [False, False, True, True, True, True]
+    assert int(ring.get(7).frame[0, 0, 0]) == 7
+    assert ring.get(11) is None
+
+
+def test_views_are_read_only_and_invalidated_by_overwrite():
+    ring = FrameRing(slots=2)
+    first = ring.get(ring.put(frame(1)))
+    assert not first.frame.flags.writeable
+    assert ring.valid(first.frame_id)
+    ring.put(frame(2))
+    assert ring.valid(first.frame_id)
+    ring.put(frame(3))  # Same slot as frame 1
+    assert not ring.valid(first.frame_id)
+    assert ring.get(first.frame_id) is None
+    assert int(first.frame[0, 0, 0]) == 3  # The old view now shows the new frame
+
+
+def test_shape_change_reallocates():
+    ring = FrameRing(slots=2)
+    old = ring.get(ring.put(frame(1)))
+    ring.put(frame(2, shape=(8, 8, 3)))
+    assert ring.latest().frame.shape == (8, 8, 3)
+    assert int(old.frame[0, 0, 0]) == 1
+
+
+def test_copy_latest_retries_when_lapped_during_copy():
+    ring = FrameRing(slots=2)
+    ring.put(frame(1))
+    latest = ring.latest
+    laps = []
+
+    def lapping_latest():
+        item = latest()
+        if not laps:  # The writer laps the ring while the first copy is taken
+            laps.append(item.frame_id)
+            ring.put(frame(2))
+            ring.put(frame(3))
+        return item
+
+    ring.latest = lapping_latest
+    copy = ring.copy_latest()
+    assert laps == [1]
+    assert copy.frame_id == 3 and int(copy.frame[0, 0, 0]) == 3
+    assert copy.frame.flags.writeable
+    ring.put(frame(4))
+    ring.put(frame(5))
+    assert int(copy.frame[0, 0, 0]) == 3
+
+
+def test_copy_latest_gives_up():
+    ring = FrameRing(slots=2)
+    ring.put(frame(1))
+    latest = ring.latest
+
+    def always_lapped():
+        item = latest()
+        ring.put(frame(0))
+        ring.put(frame(0))
+        return item
+
+    ring.latest = always_lapped
+    assert ring.copy_latest(attempts=3) is None
+    assert ring.latest_id == 7
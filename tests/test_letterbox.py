@@ -0,0 +1,76 @@
+"""Letterbox and scale_boxes_to_frame: boxes survive the round trip for landscape and portrait frames."""
+
+import numpy as np
+import pytest
+
+from threat_detection import Letterbox, scale_boxes_to_frame
+
+PAD = 114
+
+
+def marked_frame(shape, box):
+    frame = np.zeros(shape + (3,), dtype=np.uint8)
+    x1, y1, x2, y2 = box
+    frame[y1:y2, x1:x2] = 255
+    return frame
+
+
+def bright_box(buffer):
+    """xyxy extent of the white marker in a letterboxed buffer."""
+    ys, xs = np.nonzero(buffer[:, :, 0] > 200)
+    return np.array([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1], dtype=np.float32)
+
+
+@pytest.mark.parametrize('shape, box', [
+    ((720, 1280), (900, 100, 1100, 400)),    # Landscape: padded top and bottom
+    ((1280, 720), (100, 900, 400, 1200)),    # Portrait: padded left and right
+    ((481, 643), (10, 20, 300, 470)),        # Sizes that do not divide evenly
+])
+def test_box_round_trip(shape, box):
+    letterbox = Letterbox(480, PAD)
+    buffer, ratio, (pad_x, pad_y) = letterbox(marked_frame(shape, box))
+    assert buffer.shape == (480, 480, 3)
+    h, w = shape
+    assert ratio == pytest.approx(min(480 / h, 480 / w))
+    # Content is centred; only the short side is padded
+    if w >= h:
+        assert pad_x == 0 and pad_y == (480 - round(h * ratio)) // 2
+    else:
+        assert pad_y == 0 and pad_x == (480 - round(w * ratio)) // 2
+    assert (buffer[:pad_y] == PAD).all() and (buffer[:, :pad_x] == PAD).all()
+    assert (buffer[pad_y + round(h * ratio):] == PAD).all() and (buffer[:, pad_x + round(w * ratio):] == PAD).all()
+
+    # What the model would report for the marker, mapped back, lands on the original box
+    restored = scale_boxes_to_frame(bright_box(buffer)[None], ratio, (pad_x, pad_y), (h, w, 3))
+    assert restored[0] == pytest.approx(np.array(box, dtype=np.float32), abs=2 / ratio)
+
+
+def test_exact_inverse_and_clipping():
+    shape = (1280, 720, 3)
+    letterbox = Letterbox(640, PAD)
+    _, ratio, pad = letterbox(np.full(shape, 50, dtype=np.uint8))
+    boxes = np.array([[0, 0, 720, 1280], [100, 200, 300, 400]], dtype=np.float32)
+    forward = boxes * ratio + np.array([pad[0], pad[1], pad[0], pad[1]])
+    assert scale_boxes_to_frame(forward, ratio, pad, shape) == pytest.approx(boxes, abs=1e-3)
+    # Boxes reaching into the padding are clipped to the frame
+    outside = np.array([[0, 0, 640, 640]], dtype=np.float32)
+    assert scale_boxes_to_frame(outside, ratio, pad, shape)[0].tolist() == [0, 0, 720, 1280]
+
+
+def test_stride_rounds_input_size_up():
+    buffer, _, _ = Letterbox(500, PAD)(np.zeros((480, 640, 3), dtype=np.uint8), stride=32)
+    assert buffer.shape[:2] == (512, 512)
+
+
+def test_buffer_is_reused_and_repadded_on_new_geometry():
+    letterbox = Letterbox(480, PAD)
+    first, _, _ = letterbox(np.full((720, 1280, 3), 200, dtype=np.uint8))
+    again, _, _ = letterbox(np.full((720, 1280, 3), 100, dtype=np.uint8))
+    assert again is first
+    # Portrait after landscape: the old content must not survive in the new padding
+    portrait, _, (pad_x, _) = letterbox(np.full((1280, 720, 3), 100, dtype=np.uint8))
+    assert portrait is first
+    assert (portrait[:, :pad_x] == PAD).all() and (portrait[:, -pad_x:] == PAD).all()
+    # Batch slots get separate buffers
+    other, _, _ = letterbox(np.zeros((720, 1280, 3), dtype=np.uint8), slot=1)
+    assert other is not first
@@ -0,0 +1,185 @@
+"""DetectionPipeline result hand-off: fresh detections must reach the consumer past skipped packets."""
+
+import numpy as np
+
+from pipeline import DetectionPipeline, FramePacket, LatestQueue
+
+
+class ScriptedQueue:
+    """Feeds the inference worker a fixed script; callables in it run between packets (consumer reads)."""
+
+    def __init__(self, worker, script):
+        self.worker = worker
+        self.script = list(script)
+
+    def get(self, timeout=None):
+        while self.script:
+            step = self.script.pop(0)
+            if callable(step):
+                step()
+                continue
+            return step
+        self.worker.stop()
+        return None
+
+
+class StubRate:
+    """Detection is due only at the listed timestamps."""
+
+    def __init__(self, due_at):
+        self.due_at = set(due_at)
+        self.skipped = 0
+        self.interval = 0.0
+
+    def due(self, now):
+        if now in self.due_at:
+            return True
+        self.skipped += 1
+        return False
+
+    def record(self, latency, started):
+        pass
+
+
+class StubGate:
+    """Lets a frame through when its first pixel is set."""
+
+    def __init__(self):
+        self.skipped = 0
+
+    def should_infer(self, frame, now, force=False):
+        if frame[0, 0]:
+            return True
+        self.skipped += 1
+        return False
+
+
+def frame(motion=False):
+    image = np.zeros((4, 4), dtype=np.uint8)
+    image[0, 0] = 1 if motion else 0
+    return image
+
+
+def run(pipeline, script):
+    """Run the inference worker over the script on this thread; returns the results the consumer saw."""
+    seen = []
+
+    def read():
+        packet = pipeline.get_result(timeout=0)
+        if packet is not None:
+            seen.append(packet)
+
+    pipeline.inference.in_queue = ScriptedQueue(pipeline.inference, [read if s == 'read' else s for s in script])
+    pipeline.inference.run()
+    read()
+    return seen
+
+
+def detector():
+    calls = []
+
+    def detect_fn(image):
+        calls.append(len(calls) + 1)
+        return f"detection {len(calls)}"
+    return detect_fn, calls
+
+
+def test_latest_queue_keeps_marked_item():
+    q = LatestQueue(1, keep=lambda item: item.startswith('fresh'))
+    q.put('fresh 1')
+    q.put('skipped 1')
+    assert q.get(timeout=0) == 'fresh 1'
+    q.put('skipped 2')
+    q.put('skipped 3')
+    assert q.get(timeout=0) == 'skipped 3'
+    q.put('fresh 2')
+    q.put('fresh 3')
+    assert q.get(timeout=0) == 'fresh 3'
+    assert q.dropped == 3
+
+
+def test_rate_skipped_packets_do_not_hide_detections():
+    detect_fn, calls = detector()
+    pipeline = DetectionPipeline(cap=None, detect_fn=detect_fn, rate=StubRate(due_at=[0.0, 1.0]))
+    script = [FramePacket(1, 0.0, frame())] + [FramePacket(i, i / 10, frame()) for i in range(2, 6)] + ['read']
+    script += [FramePacket(10, 1.0, frame())] + [FramePacket(i, 1.0 + i / 100, frame()) for i in range(11, 15)]
+    seen = run(pipeline, script)
+    fresh = [p.result for p in seen if not p.skipped]
+    assert fresh == ["detection 1", "detection 2"]
+    assert len(calls) == 2
+
+
+def test_skipped_packet_replaces_read_detection():
+    detect_fn, _ = detector()
+    pipeline = DetectionPipeline(cap=None, detect_fn=detect_fn, rate=StubRate(due_at=[0.0]))
+    seen = run(pipeline, [FramePacket(1, 0.0, frame()), 'read', FramePacket(2, 0.1, frame()),
+                          FramePacket(3, 0.2, frame())])
+    assert [(p.frame_id, p.skipped) for p in seen] == [(1, False), (3, True)]
+    assert seen[1].result == "detection 1"
+
+
+def test_gated_packets_do_not_hide_detections():
+    detect_fn, calls = detector()
+    gate = StubGate()
+    pipeline = DetectionPipeline(cap=None, detect_fn=detect_fn, gate=gate)
+    script = [FramePacket(1, 0.0, frame(motion=True)), FramePacket(2, 0.1, frame()), FramePacket(3, 0.2, frame()),
+              'read', FramePacket(4, 0.3, frame(motion=True)), FramePacket(5, 0.4, frame()), 'read',
+              FramePacket(6, 0.5, frame()), FramePacket(7, 0.6, frame(motion=True)), FramePacket(8, 0.7, frame())]
+    seen = run(pipeline, script)
+    assert [p.result for p in seen if not p.skipped] == ["detection 1", "detection 2", "detection 3"]
+    assert len(calls) == 3
+    assert gate.skipped == 5
+
+
+class StubPool:
+    """ProcessInferencePool stand-in: results in submission order, released by the test."""
+
+    def __init__(self, workers=2):
+        import queue
+        self.workers_alive = workers
+        self.submitted = []
+        self._done = queue.Queue()
+
+    def submit(self, image, timeout=None):
+        self.submitted.append(int(image[0, 0]))
+        return len(self.submitted) - 1
+
+    def finish(self, seq, result):
+        self._done.put((seq, result))
+
+    def get(self, timeout=None):
+        import queue
+        try:
+            return self._done.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def test_pool_worker_limits_frames_in_flight_and_forwards_results():
+    import time
+
+    pool = StubPool(workers=2)
+    pipeline = DetectionPipeline(cap=None, detect_fn=None, pool=pool)
+    pipeline.inference.start()
+    for i in range(1, 5):
+        pipeline.capture_queue.put(FramePacket(i, float(i), np.full((4, 4), i, dtype=np.uint8)))
+        time.sleep(0.05)
+    assert pool.submitted == [1, 2]  # Frames 3 and 4 arrived while both workers were busy and no result existed
+    assert pipeline.get_result(timeout=0) is None
+    pool.finish(0, "detection 1")
+    first = pipeline.get_result(timeout=1)
+    assert (first.frame_id, first.result, first.skipped) == (1, "detection 1", False)
+    pipeline.capture_queue.put(FramePacket(5, 5.0, np.full((4, 4), 5, dtype=np.uint8)))
+    time.sleep(0.05)
+    assert pool.submitted == [1, 2, 5]
+    pipeline.capture_queue.put(FramePacket(6, 6.0, np.full((4, 4), 6, dtype=np.uint8)))
+    busy = pipeline.get_result(timeout=1)
+    assert (busy.frame_id, busy.result, busy.skipped) == (6, "detection 1", True)
+    pool.finish(1, None)
+    pool.workers_alive = 0
+    deadline = time.time() + 1
+    while not pipeline.failed and time.time() < deadline:
+        time.sleep(0.01)
+    assert pipeline.failed
+    pipeline.inference.stop()
+    pipeline.inference.join(timeout=1)
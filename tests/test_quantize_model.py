@@ -0,0 +1,89 @@
+"""Quantization report logic with stubbed model runs: held-out evaluation frames, recall verdicts."""
+
+import numpy as np
+import pytest
+
+import quantize_model
+from quantize_model import QUANTIZATION_CONFIG, build_report, print_report, split_frames
+from threat_detection import build_detection_result
+
+COCO = {0: 'person', 1: 'car'}
+WEAPONS = {0: 'person', 1: 'gun'}
+
+
+def result(names, *class_ids):
+    boxes = np.array([[10 + 50 * i, 10, 50 + 50 * i, 60] for i in range(len(class_ids))], dtype=np.float32)
+    return build_detection_result((480, 640, 3), boxes.reshape(-1, 4), [0.7] * len(class_ids), class_ids, names)
+
+
+def stub_runs(monkeypatch, names, reference, variant):
+    runs = {'fp32': reference, 'int8': variant}
+    monkeypatch.setattr(quantize_model, '_run_model',
+                        lambda path, frames: (np.full(len(frames), 0.01 if path == 'fp32' else 0.005), runs[path], names))
+
+
+def test_split_holds_back_interleaved_frames():
+    frames = list(range(20))
+    calibration, evaluation = split_frames(frames, 0.3)
+    assert not set(calibration) & set(evaluation)
+    assert sorted(calibration + evaluation) == frames
+    assert evaluation == [2, 5, 8, 11, 14, 17]
+    assert split_frames([1], 0.3) == ([1], [])
+    assert split_frames(frames, 0.0) == (frames, [])
+
+
+def test_no_weapon_classes_is_not_applicable(monkeypatch, capsys):
+    stub_runs(monkeypatch, COCO, [result(COCO, 0)] * 3, [result(COCO, 0)] * 3)
+    report = build_report('fp32', 'int8', [None] * 3)
+    assert report['weapon_classes'] is False
+    assert report['weapon_recall_vs_fp32'] == 'not applicable'
+    assert report['safe_to_ship'] is None
+    assert report['speedup'] == pytest.approx(2.0)
+    print_report(report)
+    out = capsys.readouterr().out
+    assert "not applicable" in out and "Not safe" not in out
+
+
+def test_recall_decides_safety(monkeypatch):
+    reference = [result(WEAPONS, 1), result(WEAPONS, 1, 1), result(WEAPONS, 0)]
+    stub_runs(monkeypatch, WEAPONS, reference, reference)
+    report = build_report('fp32', 'int8', [None] * 3)
+    assert report['weapon_recall_vs_fp32'] == 1.0 and report['safe_to_ship'] is True
+
+    stub_runs(monkeypatch, WEAPONS, reference, [result(WEAPONS, 1), result(WEAPONS, 1), result(WEAPONS, 0)])
+    report = build_report('fp32', 'int8', [None] * 3)
+    assert report['weapon_recall_vs_fp32'] == pytest.approx(2 / 3)
+    assert report['safe_to_ship'] is False
+
+
+def test_weapon_model_without_weapons_in_frames_is_unmeasurable(monkeypatch, capsys):
+    stub_runs(monkeypatch, WEAPONS, [result(WEAPONS, 0)] * 2, [result(WEAPONS, 0)] * 2)
+    report = build_report('fp32', 'int8', [None] * 2)
+    assert report['weapon_recall_vs_fp32'] is None and report['safe_to_ship'] is False
+    print_report(report)
+    assert "FP32 found no weapons" in capsys.readouterr().out
+
+
+def test_static_run_evaluates_only_held_out_frames(monkeypatch, tmp_path):
+    frames = [np.full((8, 8, 3), i, dtype=np.uint8) for i in range(10)]
+    used = {}
+
+    def quantize(weights_path, calibration, mode):
+        used['calibration'] = calibration
+        return 'int8'
+
+    def report(reference_path, variant_path, evaluation):
+        used['evaluation'] = evaluation
+        return {}
+
+    monkeypatch.setattr(quantize_model, 'download_yolo_model', lambda: 'yolov8n.pt')
+    monkeypatch.setattr(quantize_model, 'collect_calibration_frames', lambda calib_dir: frames)
+    monkeypatch.setattr(quantize_model, 'resolve_model_path', lambda *args: 'fp32')
+    monkeypatch.setattr(quantize_model, 'quantize_onnx_int8', quantize)
+    monkeypatch.setattr(quantize_model, 'build_report', report)
+    monkeypatch.setattr(quantize_model, 'print_report', lambda report: None)
+    monkeypatch.setitem(QUANTIZATION_CONFIG, 'report_path', str(tmp_path / 'report.json'))
+    saved = quantize_model.run_quantization('.', 'static')
+    calibration_ids = {id(f) for f in used['calibration']}
+    assert used['evaluation'] and not calibration_ids & {id(f) for f in used['evaluation']}
+    assert saved['calibration_frames'] == len(used['calibration']) == 7
@@ -0,0 +1,108 @@
+"""RateController with explicit timestamps and a fake clock for the CPU / load samples."""
+
+import pytest
+
+import rate_control
+from rate_control import RATE_CONFIG, RateController
+
+
+class FakeClock:
+    """Stands in for the time module inside rate_control."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.cpu = 0.0
+
+    def time(self):
+        return self.now
+
+    def process_time(self):
+        return self.cpu
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_control, 'time', fake)
+    monkeypatch.setattr(rate_control, 'host_load', lambda: 0.1)
+    monkeypatch.setattr(rate_control.os, 'cpu_count', lambda: 4)
+    return fake
+
+
+def test_due_follows_base_interval(clock):
+    rate = RateController()
+    t = clock.now
+    assert rate.due(t)
+    rate.record(0.05, t)
+    assert not rate.due(t + 0.1)
+    assert not rate.due(t + 0.29)
+    assert rate.due(t + 0.31)
+    assert rate.skipped == 2 and rate.runs == 1
+
+
+def test_interval_never_shorter_than_latency(clock):
+    rate = RateController()
+    t = clock.now
+    rate.record(0.8, t)
+    assert rate.interval_at(t) == pytest.approx(0.8)
+    assert not rate.due(t + 0.5)
+    assert rate.due(t + 0.81)
+
+
+def test_latency_is_smoothed(clock):
+    rate = RateController()
+    rate.record(0.1, clock.now)
+    rate.record(0.6, clock.now + 1)
+    assert rate.latency == pytest.approx(0.8 * 0.1 + 0.2 * 0.6)
+
+
+def test_active_runs_back_to_back_and_idle_slows_down(clock):
+    rate = RateController()
+    t = clock.now
+    rate.set_active(True, t)
+    rate.record(0.05, t)
+    assert rate.interval_at(t) == pytest.approx(0.05)  # active_interval 0, bounded by latency
+    assert rate.due(t + 0.06)
+    rate.set_active(False, t + 1)
+    assert rate.interval_at(t + 2) == pytest.approx(RATE_CONFIG['base_interval'])
+    assert rate.interval_at(t + 1 + RATE_CONFIG['quiet_after']) == pytest.approx(RATE_CONFIG['idle_interval'])
+    rate.set_active(True, t + 20)
+    assert rate.interval_at(t + 20) == pytest.approx(0.05)
+
+
+def test_backoff_under_cpu_load_and_recovery(clock):
+    rate = RateController()
+    for _ in range(20):  # Each second this process uses 3 of 4 cores, over the 0.5 budget
+        clock.now += 1.0
+        clock.cpu += 3.0
+        rate.record(0.05, clock.now)
+    assert rate.cpu_fraction == pytest.approx(0.75)
+    assert rate.backoff == RATE_CONFIG['max_backoff']
+    # Quiet for 20 s, so the idle interval is what gets stretched
+    assert rate.interval_at(clock.now) == pytest.approx(RATE_CONFIG['idle_interval'] * RATE_CONFIG['max_backoff'])
+    for _ in range(40):  # Idle again
+        clock.now += 1.0
+        rate.record(0.05, clock.now)
+    assert rate.backoff == 1.0
+
+
+def test_backoff_under_host_load(clock, monkeypatch):
+    monkeypatch.setattr(rate_control, 'host_load', lambda: 2.0)
+    rate = RateController()
+    clock.now += 1.0
+    rate.record(0.05, clock.now)
+    assert rate.backoff == pytest.approx(1.25)
+    clock.now += 0.5  # Within sample_period: no new sample
+    rate.record(0.05, clock.now)
+    assert rate.backoff == pytest.approx(1.25)
+
+
+def test_begin_marks_runs_that_report_later(clock):
+    rate = RateController()
+    t = clock.now
+    rate.begin(t)
+    assert not rate.due(t + 0.1)
+    rate.begin(t + 0.3)
+    rate.record(0.5, t)  # The earlier run finishing does not move the last run back
+    assert not rate.due(t + 0.4)
+    assert rate.due(t + 0.81)
@@ -0,0 +1,77 @@
+"""Tile grid coverage and overlap, cross-tile NMS, tile selection by motion and hotspots."""
+
+import numpy as np
+import pytest
+
+from threat_detection import build_detection_result
+from tiling import TILING_CONFIG, TileScheduler, make_tile_grid, merge_nms
+
+
+def coverage(tiles, shape):
+    covered = np.zeros(shape[:2], dtype=np.int32)
+    for x1, y1, x2, y2 in tiles:
+        covered[y1:y2, x1:x2] += 1
+    return covered
+
+
+@pytest.mark.parametrize('shape', [(1080, 1920), (1440, 2560), (700, 1000), (2160, 3840)])
+def test_grid_covers_frame_with_overlap(shape):
+    tile, overlap = 640, 0.2
+    tiles = make_tile_grid(shape, tile, overlap)
+    h, w = shape
+    assert (tiles[:, 0] >= 0).all() and (tiles[:, 1] >= 0).all()
+    assert (tiles[:, 2] <= w).all() and (tiles[:, 3] <= h).all()
+    assert ((tiles[:, 2] - tiles[:, 0]) == tile).all() and ((tiles[:, 3] - tiles[:, 1]) == tile).all()
+    assert coverage(tiles, shape).min() >= 1
+    # Last column and row sit flush with the right and bottom edges
+    assert tiles[:, 2].max() == w and tiles[:, 3].max() == h
+    # Neighbouring tiles share at least the configured overlap (more at the edges)
+    for starts in (np.unique(tiles[:, 0]), np.unique(tiles[:, 1])):
+        assert (np.diff(starts) <= tile * (1 - overlap)).all()
+
+
+def test_grid_for_small_frame_is_the_frame():
+    assert make_tile_grid((480, 640), 640, 0.2).tolist() == [[0, 0, 640, 480]]
+    assert make_tile_grid((300, 1000), 640, 0.2).tolist() == [[0, 0, 640, 300], [360, 0, 1000, 300]]
+
+
+def test_nms_drops_cross_tile_duplicates():
+    boxes = np.array([[100, 100, 150, 150],    # Full-frame hit
+                      [102, 101, 151, 152],    # Same weapon seen again by a tile
+                      [400, 100, 450, 150]],   # Another weapon
+                     dtype=np.float32)
+    keep = merge_nms(boxes, np.array([0.4, 0.7, 0.6]), np.array([1, 1, 1]), iou_threshold=0.5)
+    assert sorted(keep.tolist()) == [1, 2]  # The more confident duplicate survives
+
+
+def test_nms_is_class_aware():
+    boxes = np.array([[100, 100, 150, 150], [100, 100, 150, 150]], dtype=np.float32)
+    keep = merge_nms(boxes, np.array([0.9, 0.5]), np.array([0, 1]), iou_threshold=0.5)
+    assert sorted(keep.tolist()) == [0, 1]
+
+
+def test_nms_keeps_moderate_overlap_and_handles_empty():
+    boxes = np.array([[0, 0, 100, 100], [60, 0, 160, 100]], dtype=np.float32)  # IoU 0.25
+    assert len(merge_nms(boxes, np.array([0.9, 0.8]), np.array([1, 1]), iou_threshold=0.5)) == 2
+    assert merge_nms(np.zeros((0, 4), dtype=np.float32), np.zeros(0), np.zeros(0, dtype=np.int64)).size == 0
+
+
+def test_scheduler_prefers_hotspots_then_motion(monkeypatch):
+    monkeypatch.setitem(TILING_CONFIG, 'max_tiles', 2)
+    shape = (1080, 1920, 3)
+    scheduler = TileScheduler()
+    tiles = scheduler.tiles_for(shape)
+    assert not len(scheduler.select(shape))  # No motion, no hotspots: full frame only
+
+    mask = np.zeros((270, 480), dtype=np.float32)  # Motion mask at a quarter of the frame size
+    mask[0:20, 0:20] = 1.0                          # Top-left corner
+    weak = build_detection_result(shape, np.array([[1800, 1000, 1850, 1050]], dtype=np.float32), [0.3], [1],
+                                  {0: 'person', 1: 'gun'})
+    scheduler.note_result(weak, now=0.0)
+    chosen = scheduler.select(shape, mask)
+    assert len(chosen) == 2
+    assert chosen[0].tolist() == tiles[-1].tolist()  # Bottom-right tile holds the weak weapon hit
+    assert chosen[1].tolist() == tiles[0].tolist()
+
+    scheduler.note_result(build_detection_result(shape, np.zeros((0, 4)), [], [], {}), now=10.0)
+    assert scheduler.select(shape, mask).tolist() == [tiles[0].tolist()]  # Hotspot forgotten
@@ -0,0 +1,131 @@
+"""ThreatTracker / IoUTracker on synthetic detections: confirmation, hold, expiry, prediction."""
+
+import numpy as np
+import pytest
+
+from threat_detection import build_detection_result
+from tracker import TRACKER_CONFIG, IoUTracker, ThreatTracker, box_iou
+
+NAMES = {0: 'person', 1: 'gun'}
+
+
+def result(*objects):
+    """DetectionResult for (class_id, box) pairs at confidence 0.6."""
+    boxes = np.array([box for _, box in objects], dtype=np.float32).reshape(-1, 4)
+    return build_detection_result((480, 640, 3), boxes, [0.6] * len(objects), [c for c, _ in objects], NAMES)
+
+
+def gun(x, y=100, size=50):
+    return (1, [x, y, x + size, y + size])
+
+
+def test_box_iou():
+    a = np.array([[0, 0, 10, 10]], dtype=np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=np.float32)
+    assert box_iou(a, b) == pytest.approx(np.array([[1.0, 1 / 3, 0.0]]))
+
+
+def test_confirmed_after_min_hits():
+    tracker = ThreatTracker()
+    assert not tracker.update(result(gun(100)), now=0.0)
+    assert tracker.tracking  # Tentative track
+    assert tracker.update(result(gun(104)), now=0.3)
+    assert tracker.confirmed_total == 1
+    assert [t.hits for t in tracker.tracker.tracks] == [2]
+
+
+def test_people_do_not_start_tracks():
+    tracker = ThreatTracker()
+    for i in range(3):
+        assert not tracker.update(result((0, [10, 10, 60, 160])), now=i * 0.3)
+    assert not tracker.tracking
+
+
+def test_unrelated_detections_do_not_confirm():
+    tracker = ThreatTracker()
+    tracker.update(result(gun(100)), now=0.0)
+    assert not tracker.update(result(gun(400)), now=0.3)
+    assert len(tracker.tracker.tracks) == 2
+
+
+def test_held_for_max_age_then_dropped():
+    tracker = ThreatTracker()
+    tracker.update(result(gun(100)), now=0.0)
+    tracker.update(result(gun(100)), now=0.3)
+    for now in (0.6, 0.9, 1.5, 2.3):  # Misses within max_age (2.0 s) of the last hit at 0.3
+        assert tracker.update(result(), now=now)
+    assert not tracker.update(result(), now=2.4)
+    assert not tracker.tracking
+
+
+def test_reacquired_track_keeps_its_id():
+    tracker = ThreatTracker()
+    tracker.update(result(gun(100)), now=0.0)
+    tracker.update(result(gun(100)), now=0.3)
+    tracker.update(result(), now=1.0)
+    assert tracker.update(result(gun(102)), now=1.5)
+    assert [t.track_id for t in tracker.tracker.tracks] == [1]
+
+
+def test_kalman_prediction_follows_motion():
+    tracker = ThreatTracker()
+    for i in range(6):  # 100 px/s to the right
+        tracker.update(result(gun(100 + 10 * i)), now=i * 0.1)
+    predicted = tracker.tracker.tracks[0].box_at(0.8)
+    assert predicted[0] == pytest.approx(180, abs=6)
+    assert predicted[2] - predicted[0] == pytest.approx(50, abs=2)
+
+
+def test_interpolate_moves_weapon_boxes_and_keeps_others():
+    tracker = ThreatTracker()
+    for i in range(6):
+        tracker.update(result(gun(100 + 10 * i)), now=i * 0.1)
+    stale = result(gun(150), (0, [300, 50, 400, 300]))
+    moved = tracker.interpolate(stale, now=0.8)
+    assert list(moved.class_ids) == [0, 1]
+    assert list(moved.threat_mask) == [False, True]
+    assert moved.boxes[0] == pytest.approx(np.array([300, 50, 400, 300]))
+    assert moved.boxes[1][0] == pytest.approx(180, abs=6)
+    # Once the hold ran out, interpolate() drops the track's box
+    expired = tracker.interpolate(stale, now=5.0)
+    assert list(expired.class_ids) == [0]
+
+
+def test_max_age_stretches_to_slow_detector():
+    tracker = IoUTracker()
+    for i in range(4):
+        tracker.update(np.zeros((0, 4)), [], [], now=i * 3.2)
+    assert tracker.detection_interval == pytest.approx(3.2)
+    assert tracker.max_age == pytest.approx(2 * 3.2)
+    for i in range(4, 8):
+        tracker.update(np.zeros((0, 4)), [], [], now=i * 30.0)
+    assert tracker.max_age == TRACKER_CONFIG['max_age_limit']
+
+
+def test_slow_detector_does_not_drop_track_between_runs():
+    tracker = ThreatTracker()
+    times = [i * 3.2 for i in range(5)]
+    tracker.update(result(), now=times[0])
+    tracker.update(result(), now=times[1])
+    tracker.update(result(gun(100)), now=times[2])
+    assert tracker.update(result(gun(100)), now=times[3])
+    assert tracker.update(result(), now=times[4])  # One missed run is held
+
+
+def test_outage_gap_does_not_stretch_hold():
+    tracker = ThreatTracker()
+    for i in range(5):
+        tracker.update(result(gun(100)), now=i * 0.3)
+    assert tracker.active
+    # Camera down for 8 s; the first detection after reconnect sees nothing
+    assert not tracker.update(result(), now=9.2)
+    assert tracker.tracker.max_age == TRACKER_CONFIG['max_age']
+    assert not tracker.tracking
+
+
+def test_reset():
+    tracker = ThreatTracker()
+    tracker.update(result(gun(100)), now=0.0)
+    tracker.update(result(gun(100)), now=0.3)
+    tracker.reset()
+    assert not tracker.active and tracker.confirmed_total == 0
@@ -1,22 +1,32 @@
 import cv2
 import numpy as np
-import serial
 import time
 import os
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.image import MIMEImage
 from datetime import datetime
-from ultralytics import YOLO
 import threading
-import requests
 from urllib.parse import urlparse
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pipeline import DetectionPipeline
+from motion_gate import MotionGate, MOTION_CONFIG
+from tracker import ThreatTracker
+from frame_encoding import EncodedFrame
+from alert_aggregator import AlertAggregator
+from arduino_link import ArduinoLink, ARDUINO_CONFIG, discovery_timeout
+from camera_supervisor import SupervisedCapture
+from incident_recorder import IncidentRecorder, RECORDER_CONFIG
+from evidence_store import EvidenceStore, EVIDENCE_CONFIG
+from rate_control import RateController, RATE_CONFIG
+from model_backends import BACKENDS, resolve_model_path, set_cpu_threads, apply_backend_threads
+
+# Heavy modules (ultralytics/torch, serial, smtplib, requests) are imported inside
+# the functions that need them, so importing this module stays fast.
 
 # Email configuration - Update these with your email settings
 EMAIL_CONFIG = {
-    'smtp_server': 'smtp.gmail.com',  # For Gmail
-    'smtp_port': 587,
+    'smtp_server': os.environ.get('THREAT_DETECTION_SMTP_SERVER', 'smtp.gmail.com'),  # For Gmail
+    'smtp_port': int(os.environ.get('THREAT_DETECTION_SMTP_PORT', 587)),
+    'use_tls': os.environ.get('THREAT_DETECTION_SMTP_TLS', '1') != '0',  # STARTTLS; off for a local test server
     'sender_email': 'try.huzaifa@gmail.com',  # Replace with your email
     'sender_password': 'letstryit',  # Replace with your app password
     'recipient_email': 'huzaifaa66asi@gmail.com',  # Replace with recipient email
@@ -31,9 +41,23 @@ DROIDCAM_CONFIG = {
     'connection_test_frames': 5
 }
 
+# Detection configuration
+DETECTION_CONFIG = {
+    'imgsz': 480,        # Model input size; frames are letterboxed, never squashed
+    'pad_value': 114,    # Grey used for letterbox padding (matches YOLOv8 training)
+    'conf': 0.15,        # Lowered confidence threshold for more stable detection
+    'threat_classes': ['gun', 'rifle'],  # Class names that count toward a threat
+    'context_classes': [],               # Extra class names kept for display only (e.g. ['person'])
+    'debug': False,      # Print the detected class names for every frame
+    # Inference engine: 'pytorch', 'onnx' or 'openvino' (exports are cached next to yolov8n.pt)
+    'backend': os.environ.get('THREAT_DETECTION_BACKEND', 'pytorch'),
+    'num_threads': int(os.environ.get('THREAT_DETECTION_THREADS', 0))  # 0 = engine default
+}
+
 def test_droidcam_connection(url):
     """Test DroidCam connection and return status."""
     print(f"🔍 Testing DroidCam connection to: {url}")
+    import requests
     
     try:
         # Ensure URL has proper format
@@ -94,50 +118,25 @@ def test_droidcam_connection(url):
         return False, f"Test error: {str(e)}"
 
 def setup_droidcam(url=None):
-    """Setup DroidCam connection with retry logic."""
+    """Open a DroidCam stream that reconnects itself in the background.
+
+    Returns a camera_supervisor.SupervisedCapture once the first frame
+    arrives, or None if none did within timeout x retry_attempts seconds.
+    """
     if url is None:
         url = DROIDCAM_CONFIG['default_url']
     
     print(f"📱 Setting up DroidCam connection to: {url}")
     
-    for attempt in range(DROIDCAM_CONFIG['retry_attempts']):
-        try:
-            cap = cv2.VideoCapture(url)
-            
-            if not cap.isOpened():
-                print(f"⚠️ Attempt {attempt + 1}: Could not open DroidCam stream")
-                if attempt < DROIDCAM_CONFIG['retry_attempts'] - 1:
-                    time.sleep(1)
-                    continue
-                else:
-                    print("❌ Failed to connect to DroidCam after all attempts")
-                    return None
-            
-            # Test reading a frame
-            ret, frame = cap.read()
-            if not ret or frame is None:
-                print(f"⚠️ Attempt {attempt + 1}: Could not read frame from DroidCam")
-                cap.release()
-                if attempt < DROIDCAM_CONFIG['retry_attempts'] - 1:
-                    time.sleep(1)
-                    continue
-                else:
-                    print("❌ Failed to read frames from DroidCam after all attempts")
-                    return None
-            
-            print(f"✅ DroidCam connected successfully on attempt {attempt + 1}")
-            return cap
-            
-        except Exception as e:
-            print(f"⚠️ Attempt {attempt + 1}: DroidCam setup error: {str(e)}")
-            if attempt < DROIDCAM_CONFIG['retry_attempts'] - 1:
-                time.sleep(1)
-                continue
-            else:
-                print("❌ Failed to setup DroidCam after all attempts")
-                return None
+    # Retries (with backoff) happen on the supervisor thread, here and after any later drop-out
+    cap = SupervisedCapture(url, name="DroidCam").start()
+    if not cap.wait_ready(DROIDCAM_CONFIG['timeout'] * DROIDCAM_CONFIG['retry_attempts']):
+        cap.release()
+        print("❌ Failed to read frames from DroidCam")
+        return None
     
-    return None
+    print("✅ DroidCam connected successfully")
+    return cap
 
 def setup_camera_source(source_type="webcam", droidcam_url=None):
     """Setup camera source (webcam or DroidCam)."""
@@ -180,52 +179,84 @@ def is_email_config_valid():
             return False
     return True
 
-def send_threat_email(frame, threat_details):
-    """Send an email with the threat detection image and details."""
-    print(f"[EMAIL] Preparing to send email. Config: {EMAIL_CONFIG}")
+def build_threat_email(images, threat_details):
+    """Build the alert message with the threat details and the frame(s) (EncodedFrame) attached.
+
+    An incident digest passes several frames plus ``alert_kind`` and
+    ``summary`` entries in threat_details.
+    """
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.mime.image import MIMEImage
+    if not isinstance(images, (list, tuple)):
+        images = [images]
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_CONFIG['sender_email']
+    msg['To'] = EMAIL_CONFIG['recipient_email']
+    kind = f" - {threat_details['alert_kind']}" if threat_details.get('alert_kind') else ""
+    msg['Subject'] = f"{EMAIL_CONFIG['subject_prefix']}{kind} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    summary = "".join(f"{line}\n" for line in threat_details.get('summary', []))
+    body = (
+        f"⚠️ THREAT DETECTED ⚠️\n\n"
+        f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+        f"Threat Level: {threat_details.get('threat_level', 'Unknown')}\n"
+        f"Threat Score: {threat_details.get('threat_score', 0)}\n"
+        f"Detected Objects: {', '.join(threat_details.get('detected_objects', []))}\n"
+        f"Camera: {threat_details.get('stream', 'Default')}\n"
+        f"{summary}\n"
+        "This is an automated alert from your AI Threat Detection System.\n"
+        "Please review the attached image and take appropriate action.\n\n---\nAI Security System\nAutomated Threat Detection"
+    )
+    msg.attach(MIMEText(body, 'plain'))
+    # Encoded in memory once; the same bytes serve any other sink of this alert
+    for image in images:
+        msg.attach(MIMEImage(image.jpeg, 'jpeg', name=image.name))
+    return msg
+
+_alert_dispatcher = None
+_alert_dispatcher_lock = threading.Lock()
+
+def get_alert_dispatcher():
+    """Return the process-wide alert dispatcher, starting it on first use."""
+    global _alert_dispatcher
+    with _alert_dispatcher_lock:
+        if _alert_dispatcher is None:
+            from alert_dispatch import AlertDispatcher
+            _alert_dispatcher = AlertDispatcher(EMAIL_CONFIG)
+            _alert_dispatcher.start()
+        return _alert_dispatcher
+
+def email_alert_sink(images, threat_details):
+    """AlertAggregator sink: queue an email, or return None when email is not configured."""
+    if not is_email_config_valid():
+        print("[EMAIL] Email config incomplete. Not sending email.")
+        return None
+    print(f"📧 Queueing alert email: {threat_details.get('alert_kind', 'threat')}")
+    return send_threat_email(images, threat_details)
+
+def stop_alert_dispatcher():
+    """Flush queued alerts, close the SMTP session and print delivery stats."""
+    global _alert_dispatcher
+    with _alert_dispatcher_lock:
+        dispatcher, _alert_dispatcher = _alert_dispatcher, None
+    if dispatcher is not None:
+        dispatcher.stop()
+        dispatcher.report()
+
+def send_threat_email(frame, threat_details, on_result=None):
+    """Queue an alert email with the threat image and details; returns False if it could not be queued.
+
+    ``frame`` is a BGR array, an EncodedFrame shared with other sinks, or a list of EncodedFrames.
+    Delivery happens on the alert dispatcher thread over a reused SMTP session;
+    ``on_result(ok, info)`` is called once it succeeded or finally failed.
+    """
     print(f"[EMAIL] Threat details: {threat_details}")
     if not is_email_config_valid():
         print("❌ Email config incomplete. Cannot send email. Please check sender, password, and recipient.")
         return False
-    temp_image_path = None
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_CONFIG['sender_email']
-        msg['To'] = EMAIL_CONFIG['recipient_email']
-        msg['Subject'] = f"{EMAIL_CONFIG['subject_prefix']} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        body = (
-            f"⚠️ THREAT DETECTED ⚠️\n\n"
-            f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-            f"Threat Level: {threat_details.get('threat_level', 'Unknown')}\n"
-            f"Threat Score: {threat_details.get('threat_score', 0)}\n"
-            f"Detected Objects: {', '.join(threat_details.get('detected_objects', []))}\n\n"
-            "This is an automated alert from your AI Threat Detection System.\n"
-            "Please review the attached image and take appropriate action.\n\n---\nAI Security System\nAutomated Threat Detection"
-        )
-        msg.attach(MIMEText(body, 'plain'))
-        temp_image_path = f"threat_detection_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-        cv2.imwrite(temp_image_path, frame)
-        with open(temp_image_path, 'rb') as f:
-            img_data = f.read()
-            msg.attach(MIMEImage(img_data, name=os.path.basename(temp_image_path)))
-        with smtplib.SMTP(EMAIL_CONFIG['smtp_server'], EMAIL_CONFIG['smtp_port']) as server:
-            server.starttls()
-            server.login(EMAIL_CONFIG['sender_email'], EMAIL_CONFIG['sender_password'])
-            server.sendmail(
-                EMAIL_CONFIG['sender_email'],
-                EMAIL_CONFIG['recipient_email'],
-                msg.as_string()
-            )
-        print(f"✅ Threat alert email sent successfully to {EMAIL_CONFIG['recipient_email']}")
-        return True
-    except Exception as e:
-        print(f"❌ Failed to send email: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return False
-    finally:
-        if temp_image_path and os.path.exists(temp_image_path):
-            os.remove(temp_image_path)
+    images = frame if isinstance(frame, (EncodedFrame, list)) else EncodedFrame(frame)
+    threat_details = dict(threat_details)
+    return get_alert_dispatcher().submit(lambda: build_threat_email(images, threat_details), on_result)
 
 def setup_email_config():
     """
@@ -272,117 +303,400 @@ def download_yolo_model():
         raise FileNotFoundError(f"Model file '{model_path}' not found.")
     return model_path
 
-def load_yolo():
-    """Load the YOLOv8n model."""
-    model_path = download_yolo_model()
-    model = YOLO(model_path)
+def resolve_class_filter(model):
+    """Resolve DETECTION_CONFIG class names to model class ids and attach them to the model.
+
+    Sets ``model.threat_class_ids`` and ``model.inference_classes`` (the id list
+    passed to inference, or None to score every class).
+    """
+    ids_by_name = {name: class_id for class_id, name in model.names.items()}
+    threat_ids, context_ids = [], []
+    for key, ids in (('threat_classes', threat_ids), ('context_classes', context_ids)):
+        for name in DETECTION_CONFIG[key]:
+            if name in ids_by_name:
+                ids.append(ids_by_name[name])
+            else:
+                print(f"⚠️ Class '{name}' from DETECTION_CONFIG['{key}'] is not in this model's classes")
+    model.threat_class_ids = threat_ids
+    if threat_ids:
+        model.inference_classes = sorted(set(threat_ids + context_ids))
+    else:
+        # Nothing to filter for; keep scoring every class so the overlay still shows something
+        print("⚠️ None of the threat classes exist in this model. Running without a class filter.")
+        model.inference_classes = None
+    return model.inference_classes
+
+def load_yolo(backend=None, num_threads=None):
+    """Load the YOLOv8n model, optionally through a cached ONNX or OpenVINO export.
+
+    backend and num_threads default to DETECTION_CONFIG['backend'] / ['num_threads'].
+    """
+    backend = backend or DETECTION_CONFIG['backend']
+    num_threads = num_threads or DETECTION_CONFIG['num_threads']
+    weights_path = download_yolo_model()
+    set_cpu_threads(num_threads)
+    from ultralytics import YOLO
+    model_path = resolve_model_path(weights_path, backend, DETECTION_CONFIG['imgsz'])
+    model = YOLO(model_path, task='detect')
+    apply_backend_threads(model, backend, model_path, num_threads, DETECTION_CONFIG['imgsz'])
+    print(f"[INFO] Inference backend: {backend}" + (f" ({num_threads} threads)" if num_threads else ""))
     print("Model classes:", model.names)
-    print("\n[INFO] Please verify that the weapon_classes list below matches your model's class names:")
-    print("Current weapon_classes:", ['knife', 'scissors', 'baseball bat', 'bottle', 'cell phone', 'pistol', 'gun'])
-    print("If your model uses different class names for weapons, update the weapon_classes list in detect_threat().\n")
+    classes = resolve_class_filter(model)
+    print(f"[INFO] Threat classes: {DETECTION_CONFIG['threat_classes']} -> ids {model.threat_class_ids}")
+    if DETECTION_CONFIG['context_classes']:
+        print(f"[INFO] Context classes: {DETECTION_CONFIG['context_classes']}")
+    print(f"[INFO] Inference class filter: {classes if classes is not None else 'all classes'}")
+    print("If your model uses different class names for weapons, update DETECTION_CONFIG['threat_classes'].\n")
     return model
 
-def detect_threat(frame, model):
-    """Detect potential threats in a frame using YOLOv8 (only 'gun' and 'rifle' classes supported, no person class)."""
+def warmup_model(model, runs=2):
+    """Run dummy frames through detect() so one-time setup cost is paid before live frames."""
+    started = time.time()
+    # Mid-grey so the brightness check passes and the model actually runs
+    dummy = np.full((480, 640, 3), 114, dtype=np.uint8)
+    for _ in range(runs):
+        detect(dummy, model)
+    elapsed = time.time() - started
+    print(f"🔥 Model warm-up done in {elapsed:.2f} s")
+    return elapsed
+
+class ModelLoader(threading.Thread):
+    """Loads and warms up the model in the background while the camera connects."""
+
+    def __init__(self, warmup=True, **load_kwargs):
+        super().__init__(daemon=True)
+        self.warmup = warmup
+        self.load_kwargs = load_kwargs
+        self.model = None
+        self.error = None
+        self.load_time = 0.0
+        self.warmup_time = 0.0
+
+    def run(self):
+        started = time.time()
+        try:
+            self.model = load_yolo(**self.load_kwargs)
+            self.load_time = time.time() - started
+            if self.warmup:
+                self.warmup_time = warmup_model(self.model)
+        except Exception as e:
+            self.error = e
+
+    def get(self, timeout=None):
+        """Wait for the model; re-raises any error from the background load."""
+        self.join(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.model
+
+class PoolLoader(ModelLoader):
+    """Starts process_pool inference workers in the background; get() returns the started pool."""
+
+    def __init__(self, processes):
+        super().__init__(warmup=False)
+        self.processes = processes
+
+    def run(self):
+        started = time.time()
+        try:
+            from process_pool import ProcessInferencePool
+            # Every worker loads and warms up its own model
+            self.model = ProcessInferencePool(self.processes, num_threads=DETECTION_CONFIG['num_threads'] or None,
+                                              backend=DETECTION_CONFIG['backend']).start()
+            self.load_time = time.time() - started
+        except Exception as e:
+            self.error = e
+
+class StartupTimer:
+    """Records how long each startup milestone took from program start."""
+
+    def __init__(self):
+        self.start = time.time()
+        self.marks = {}
+
+    def mark(self, name, at=None):
+        if name in self.marks:
+            return
+        self.marks[name] = (at or time.time()) - self.start
+        print(f"⏱️ {name}: {self.marks[name]:.2f} s after start")
+
+    def report(self):
+        print("⏱️ Startup timings: " + ", ".join(f"{name} {secs:.2f} s" for name, secs in self.marks.items()))
+
+class Letterbox:
+    """Aspect-preserving resize into preallocated, stride-aligned input buffers.
+
+    Buffers are kept per thread and per batch slot so repeated calls do not
+    allocate a new canvas for every frame.
+    """
+
+    def __init__(self, size=None, pad_value=None):
+        self.size = size or DETECTION_CONFIG['imgsz']
+        self.pad_value = DETECTION_CONFIG['pad_value'] if pad_value is None else pad_value
+        self._local = threading.local()
+
+    def _buffer(self, slot, size, frame_shape):
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        entry = buffers.get(slot)
+        if entry is None or entry[0].shape[0] != size:
+            entry = [np.full((size, size, 3), self.pad_value, dtype=np.uint8), None]
+            buffers[slot] = entry
+        if entry[1] != frame_shape:
+            # New geometry: the padding area moves, so reset the whole canvas once
+            entry[0][:] = self.pad_value
+            entry[1] = frame_shape
+        return entry[0]
+
+    def __call__(self, frame, slot=0, stride=32):
+        """Return (buffer, ratio, (pad_x, pad_y)) for one frame."""
+        size = int(np.ceil(self.size / stride) * stride)
+        h, w = frame.shape[:2]
+        ratio = min(size / h, size / w)
+        new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+        pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+        buffer = self._buffer(slot, size, frame.shape)
+        target = buffer[pad_y:pad_y + new_h, pad_x:pad_x + new_w]
+        resized = cv2.resize(frame, (new_w, new_h), dst=target, interpolation=cv2.INTER_LINEAR)
+        if not np.shares_memory(resized, buffer):
+            target[:] = resized
+        return buffer, ratio, (pad_x, pad_y)
+
+def scale_boxes_to_frame(boxes, ratio, pad, frame_shape):
+    """Map (N, 4) xyxy boxes from letterboxed input back to original frame pixels."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4).copy()
+    boxes[:, [0, 2]] -= pad[0]
+    boxes[:, [1, 3]] -= pad[1]
+    boxes /= ratio
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, frame_shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, frame_shape[0])
+    return boxes
+
+_letterbox = Letterbox()
+
+def _model_stride(model):
+    """Return the model's maximum stride (32 for YOLOv8 when unknown)."""
+    try:
+        return int(max(model.model.stride))
+    except Exception:
+        return 32
+
+@dataclass
+class Detection:
+    """A single detected object, with its box in original-frame pixels (x1, y1, x2, y2)."""
+    class_id: int
+    class_name: str
+    confidence: float
+    box: np.ndarray
+    is_threat: bool = False
+
+def _empty_boxes():
+    return np.zeros((0, 4), dtype=np.float32)
+
+def _empty_array(dtype):
+    return lambda: np.zeros(0, dtype=dtype)
+
+@dataclass
+class DetectionResult:
+    """Everything detect() found in one frame, without any drawing applied.
+
+    Detections are stored column-wise as NumPy arrays; the ``detections``
+    property builds per-object Detection records only when asked for.
+    """
+    boxes: np.ndarray = field(default_factory=_empty_boxes)
+    confidences: np.ndarray = field(default_factory=_empty_array(np.float32))
+    class_ids: np.ndarray = field(default_factory=_empty_array(np.int64))
+    threat_mask: np.ndarray = field(default_factory=_empty_array(bool))
+    class_names: dict = field(default_factory=dict)
+    threat_detected: bool = False
+    threat_details: dict = field(default_factory=dict)
+    frame_shape: tuple = None
+    class_scores: dict = field(default_factory=dict)
+
+    @property
+    def valid(self):
+        return self.frame_shape is not None
+
+    @property
+    def threat_confidence(self):
+        """Highest confidence among threat-class detections (0.0 if none)."""
+        return float(self.confidences[self.threat_mask].max()) if self.threat_mask.any() else 0.0
+
+    @property
+    def detections(self):
+        return [Detection(int(class_id), self.class_names.get(int(class_id), str(class_id)), float(conf), box, bool(threat))
+                for box, conf, class_id, threat in zip(self.boxes, self.confidences, self.class_ids, self.threat_mask)]
+
+def _status_result(frame_shape, threat_level, status, detected_objects=None):
+    return DetectionResult(frame_shape=frame_shape, threat_details={
+        'threat_level': threat_level,
+        'threat_score': 0,
+        'detected_objects': detected_objects or [],
+        'status': status
+    })
+
+def _prepare_frame(frame, slot=0, stride=32):
+    """Letterbox a frame for inference, or return a DetectionResult if it cannot be used."""
     if frame is None or frame.size == 0:
         print("⚠️ Invalid frame received")
-        return None, False, {
-            'threat_level': 'Error',
-            'threat_score': 0,
-            'detected_objects': [],
-            'status': 'Invalid frame'
-        }
-    frame = cv2.resize(frame, (480, 480))
-    frame_brightness = np.mean(frame)
+        return None, _status_result(None, 'Error', 'Invalid frame')
+    buffer, ratio, pad = _letterbox(frame, slot=slot, stride=stride)
+    # Measure brightness on the downscaled image area only, not the padding
+    h, w = frame.shape[:2]
+    content = buffer[pad[1]:pad[1] + int(round(h * ratio)), pad[0]:pad[0] + int(round(w * ratio))]
+    frame_brightness = np.mean(content)
     if frame_brightness < 30:
-        cv2.putText(frame, "Warning: Poor lighting or camera blocked", (10, 60), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        return frame, False, {
-            'threat_level': 'Warning',
-            'threat_score': 0,
-            'detected_objects': ['poor_lighting'],
-            'status': 'Poor lighting or camera blocked'
-        }
-    try:
-        # Lowered confidence threshold for more stable detection
-        results = model(frame, conf=0.15)[0]
-    except Exception as e:
-        print(f"⚠️ YOLO inference error: {e}")
-        return frame, False, {
-            'threat_level': 'Error',
-            'threat_score': 0,
-            'detected_objects': [],
-            'status': 'Model inference error'
-        }
-    weapon_classes = ['gun', 'rifle']
-    weapon_detected = False
-    threat_score = 0
-    detected_objects = []
-    detected_class_names = set()
-    for result in results.boxes.data.tolist():
-        x1, y1, x2, y2, confidence, class_id = result
-        class_name = results.names[int(class_id)]
-        detected_class_names.add(class_name)
-        detected_objects.append(class_name)
-        color = (0, 0, 255) if class_name in weapon_classes else (255, 255, 255)
-        if class_name in weapon_classes:
-            weapon_detected = True
-            threat_score = 10
-        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-        cv2.putText(frame, f"{class_name}: {confidence:.2f}", (int(x1), int(y1 - 10)),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-    if detected_class_names:
-        print(f"[DEBUG] Detected classes in frame: {detected_class_names}")
+        return None, _status_result(frame.shape, 'Warning', 'Poor lighting or camera blocked', ['poor_lighting'])
+    return (buffer, ratio, pad), None
+
+@lru_cache(maxsize=16)
+def _threat_mask_for(class_names, weapon_classes):
+    mask = np.zeros(class_names[-1][0] + 1 if class_names else 0, dtype=bool)
+    for class_id, class_name in class_names:
+        mask[class_id] = class_name in weapon_classes
+    return mask
+
+def _threat_class_mask(names):
+    """Boolean lookup table over class ids marking the weapon classes, built once per class list."""
+    # Keyed by content, not id(names): a new model (or a reused id) never gets a stale table
+    return _threat_mask_for(tuple(sorted(names.items())), tuple(DETECTION_CONFIG['threat_classes']))
+
+def build_detection_result(frame_shape, boxes, confidences, class_ids, names):
+    """Classify detections given as arrays (boxes in frame pixels) into a DetectionResult."""
+    class_ids = np.asarray(class_ids, dtype=np.int64)
+    confidences = np.asarray(confidences, dtype=np.float32)
+    lookup = _threat_class_mask(names)
+    threat_mask = lookup[class_ids] if lookup.size else np.zeros(len(class_ids), dtype=bool)
+
+    # Per-class maximum confidence, computed without a Python loop over boxes
+    class_scores = {}
+    if len(class_ids):
+        max_scores = np.zeros(int(class_ids.max()) + 1, dtype=np.float32)
+        np.maximum.at(max_scores, class_ids, confidences)
+        present = np.flatnonzero(np.bincount(class_ids))
+        class_scores = {names[int(c)]: float(max_scores[c]) for c in present}
+    detected_class_names = list(class_scores)
+    if DETECTION_CONFIG['debug'] and detected_class_names:
+        print(f"[DEBUG] Detected classes in frame: {set(detected_class_names)}")
+
+    weapon_detected = bool(threat_mask.any())
     if weapon_detected:
-        threat_detected = True
         status = "HIGH THREAT: Weapon Detected!"
-        status_color = (0, 0, 255)
         threat_level = "HIGH THREAT"
     else:
-        threat_detected = False
         status = "Normal: No Threats Detected"
-        status_color = (0, 255, 0)
         threat_level = "NORMAL"
-    cv2.putText(frame, status, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, status_color, 2)
-    cv2.putText(frame, f"Threat Score: {threat_score}", (10, 60),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.6, status_color, 2)
-    objects_text = "Detected: " + ", ".join(set(detected_objects))
-    cv2.putText(frame, objects_text, (10, 90),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-    return frame, threat_detected, {
+    return DetectionResult(boxes, confidences, class_ids, threat_mask, names, weapon_detected, {
         'threat_level': threat_level,
-        'threat_score': threat_score,
-        'detected_objects': list(set(detected_objects)),
+        'threat_score': 10 if weapon_detected else 0,
+        'detected_objects': detected_class_names,
         'status': status,
         'weapon_detected': weapon_detected
-    }
+    }, frame_shape, class_scores)
+
+def _analyze_results(frame_shape, results, ratio, pad):
+    """Classify the YOLO results for one frame into a DetectionResult."""
+    data = results.boxes.data
+    data = data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)
+    data = data[data[:, 4] >= DETECTION_CONFIG['conf']]
+    boxes = scale_boxes_to_frame(data[:, :4], ratio, pad, frame_shape)
+    return build_detection_result(frame_shape, boxes, data[:, 4], data[:, 5], results.names)
+
+def detect_batch(frames, model):
+    """Run one batched YOLOv8 call over several frames and return a DetectionResult per frame.
+
+    No pixels are touched; use draw_detections() to render an overlay when needed.
+    """
+    outputs = [None] * len(frames)
+    stride = _model_stride(model)
+    batch = []
+    for i, frame in enumerate(frames):
+        prepared, early_result = _prepare_frame(frame, slot=len(batch), stride=stride)
+        if early_result is not None:
+            outputs[i] = early_result
+        else:
+            batch.append((i, frame.shape) + prepared)
+    if not batch:
+        return outputs
+    if not hasattr(model, 'inference_classes'):
+        resolve_class_filter(model)
+    try:
+        # Only threat (and opted-in context) classes are scored and NMS'd
+        batch_results = model([entry[2] for entry in batch], conf=DETECTION_CONFIG['conf'],
+                              imgsz=batch[0][2].shape[0], classes=model.inference_classes)
+    except Exception as e:
+        print(f"⚠️ YOLO inference error: {e}")
+        for i, frame_shape, _, _, _ in batch:
+            outputs[i] = _status_result(frame_shape, 'Error', 'Model inference error')
+        return outputs
+    for (i, frame_shape, _, ratio, pad), results in zip(batch, batch_results):
+        outputs[i] = _analyze_results(frame_shape, results, ratio, pad)
+    return outputs
+
+def detect(frame, model):
+    """Detect objects in one frame and return a DetectionResult (no drawing)."""
+    return detect_batch([frame], model)[0]
+
+def draw_detections(frame, result, copy=True):
+    """Render the boxes and threat status of a DetectionResult onto a frame."""
+    if frame is None:
+        return None
+    if copy:
+        frame = frame.copy()
+    threat_level = result.threat_details.get('threat_level')
+    if threat_level == 'Warning':
+        cv2.putText(frame, "Warning: Poor lighting or camera blocked", (10, 60), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        return frame
+    if threat_level == 'Error':
+        return frame
+    for box, confidence, class_id, is_threat in zip(result.boxes.astype(int).tolist(), result.confidences.tolist(),
+                                                    result.class_ids.tolist(), result.threat_mask.tolist()):
+        x1, y1, x2, y2 = box
+        color = (0, 0, 255) if is_threat else (255, 255, 255)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{result.class_names.get(class_id, class_id)}: {confidence:.2f}", (x1, y1 - 10),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    status_color = (0, 0, 255) if result.threat_detected else (0, 255, 0)
+    cv2.putText(frame, result.threat_details['status'], (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, status_color, 2)
+    cv2.putText(frame, f"Threat Score: {result.threat_details['threat_score']}", (10, 60),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, status_color, 2)
+    objects_text = "Detected: " + ", ".join(result.threat_details['detected_objects'])
+    cv2.putText(frame, objects_text, (10, 90),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return frame
+
+def detect_threat_batch(frames, model):
+    """Detect threats in several frames with a single batched YOLOv8 call.
+
+    Returns one (annotated_frame, threat_detected, threat_details) tuple per
+    input frame, in the same order. Returned frames keep their original resolution.
+    """
+    outputs = []
+    for frame, result in zip(frames, detect_batch(frames, model)):
+        outputs.append((draw_detections(frame, result), result.threat_detected, result.threat_details))
+    return outputs
+
+def detect_threat(frame, model):
+    """Detect potential threats in a frame using YOLOv8 (threat classes from DETECTION_CONFIG, 'gun' and 'rifle' by default)."""
+    return detect_threat_batch([frame], model)[0]
 
 def setup_arduino(port=None, baud_rate=9600):
-    """Establish serial communication with Arduino."""
-    # Try common serial ports
-    potential_ports = []
-    
-    # Add OS-specific common ports
-    if os.name == 'nt':  # Windows
-        potential_ports = ['COM%s' % (i + 1) for i in range(10)]
-    else:  # Linux/Mac
-        potential_ports = ['/dev/ttyUSB%s' % i for i in range(10)]
-        potential_ports += ['/dev/ttyACM%s' % i for i in range(10)]
-    
-    # If port is specified, try it first
-    if port:
-        potential_ports.insert(0, port)
-    
-    # Try ports until one works
-    for port in potential_ports:
-        try:
-            arduino = serial.Serial(port=port, baudrate=baud_rate, timeout=1)
-            time.sleep(2)  # Allow time for connection to establish
-            print(f"Connected to Arduino on {port}")
-            return arduino
-        except (serial.SerialException, OSError):
-            continue
-    
+    """Find the Arduino and start its background writer.
+
+    Returns a started arduino_link.ArduinoLink (drive it with
+    ``set_state(active)``), or None if no board answered the handshake.
+    """
+    link = ArduinoLink(port=port, baud_rate=baud_rate)
+    link.start()
+    # Ports are probed probe_workers at a time, so allow one handshake per wave
+    if link.wait_connected(discovery_timeout(port) + 2.0):
+        return link
+    if not link.probed:
+        print("⚠️ Still probing serial ports; the alarm output starts once the Arduino answers")
+        return link
+    link.close()
     print("Failed to connect to Arduino on any port")
     return None
 
@@ -450,12 +764,17 @@ def test_droidcam_standalone():
         print("4. Try restarting DroidCam app")
         print("5. Check if any firewall is blocking the connection")
 
-def main():
-    """Main program execution."""
-    # Load YOLOv8 model
-    print("Loading YOLOv8 model...")
-    model = load_yolo()
-    print("YOLOv8 model loaded successfully!")
+def main(processes=None):
+    """Main program execution; with ``processes``, inference runs in that many worker processes."""
+    timer = StartupTimer()
+    # Load and warm up the YOLOv8 model in the background while everything else connects
+    if processes:
+        print(f"Starting {processes} inference process(es) in the background...")
+        loader = PoolLoader(processes)
+    else:
+        print("Loading YOLOv8 model in the background...")
+        loader = ModelLoader()
+    loader.start()
     
     # Setup email configuration
     setup_email_config()
@@ -474,11 +793,13 @@ def main():
     print("5. Exit")
     
     cap = None
+    camera_source = None  # What the reconnect supervisor reopens
     while cap is None:
         choice = input("\nEnter your choice (1-5): ").strip()
         
         if choice == '1':
             print("Using PC webcam...")
+            camera_source = 0
             cap = cv2.VideoCapture(0)
             if not cap.isOpened():
                 print("❌ Failed to open webcam. Please try again.")
@@ -487,6 +808,7 @@ def main():
             
         elif choice == '2':
             print("Using DroidCam Virtual Camera...")
+            camera_source = 1
             cap = cv2.VideoCapture(1)  # This is the working DroidCam index
             if not cap.isOpened():
                 print("❌ Failed to open DroidCam Virtual Camera.")
@@ -522,6 +844,7 @@ def main():
                 ret, frame = cap.read()
                 if ret:
                     print("✅ Virtual camera connection successful!")
+                    camera_source = 1
                     break
                 cap.release()
             
@@ -530,11 +853,13 @@ def main():
             source = f"http://{ip}:{port}/video"
             print(f"Connecting to: {source}")
             
+            camera_source = source
             cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG)
             if not cap.isOpened():
                 # If HTTP fails, try RTSP
                 rtsp_url = source.replace('http://', 'rtsp://')
                 print(f"Trying RTSP connection: {rtsp_url}")
+                camera_source = rtsp_url
                 cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
             
             if not cap.isOpened():
@@ -575,6 +900,7 @@ def main():
                         ret, frame = cap.read()
                         if ret:
                             print("✅ Using DroidCam Virtual Camera!")
+                            camera_source = 1
                             break
                         cap.release()
                     
@@ -585,6 +911,7 @@ def main():
                         continue
                 else:
                     print("Using webcam instead...")
+                    camera_source = 0
                     cap = cv2.VideoCapture(0)
                     if not cap.isOpened():
                         print("❌ Failed to open webcam. Please try again.")
@@ -615,127 +942,178 @@ def main():
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
     cap.set(cv2.CAP_PROP_FPS, 30)
     cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce buffer size for lower latency
+    if not isinstance(cap, SupervisedCapture):
+        # Wi-Fi drop-outs and stalled streams are reconnected in the background instead of ending the session
+        cap = SupervisedCapture(camera_source, cap=cap).start()
+    timer.mark("camera connected")
+
+    if loader.is_alive():
+        print("⏳ Waiting for the model to finish loading...")
+    try:
+        model = loader.get()
+    except Exception as e:
+        print(f"❌ Failed to load YOLOv8 model: {e}")
+        cap.release()
+        return
+    pool = model if processes else None
+    print(f"YOLOv8 model loaded successfully! (load {loader.load_time:.2f} s, warm-up {loader.warmup_time:.2f} s)")
+    timer.mark("model ready")
     
     print("\nPress 'q' to quit")
     print("Press 's' to save current frame")
     print("Press 'r' to reset counters")
     print("📧 Email alerts will be sent when threats are detected.")
     
-    previous_state = False  # Track the previous threat state
     frame_count = 0
     start_time = time.time()
-    last_email_time = 0  # Track last email sent time
-    email_cooldown = 60  # Send email only once every 60 seconds
+    # Saved frames are written, indexed and pruned on their own thread
+    evidence = EvidenceStore()
+    evidence.start()
+    # Incident digests with escalation and rate limits replace the fixed email cooldown;
+    # the frames they carry are kept as alert evidence
+    alerts = AlertAggregator(email_alert_sink, evidence)
+    # Keeps a compressed pre-roll and writes a clip around every threat, off this thread
+    recorder = IncidentRecorder().start() if RECORDER_CONFIG['enabled'] else None
     
     # Threat detection statistics
     threat_count = 0
     total_threats_detected = 0
     
-    detection_buffer = [False] * 10  # Increased buffer size for more smoothing
-    hold_counter = 0  # Hold period counter
-    hold_period = 10  # Number of frames to hold alert after last detection
+    # Weapon tracks replace the per-frame vote buffer and hold counter
+    threat_tracker = ThreatTracker()
+    smoothed_threat = False
     
-    def send_email_background(frame, threat_details):
-        threading.Thread(target=send_threat_email, args=(frame.copy(), threat_details), daemon=True).start()
-    
-    def save_current_frame(frame, threat_details):
-        """Save the current frame with threat information."""
+    def save_current_frame(frame, result):
+        """Hand the current frame with threat information to the evidence writer."""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"threat_detection_{timestamp}.jpg"
         
         # Create a copy of the frame to add save confirmation
         save_frame = frame.copy()
         cv2.putText(save_frame, f"SAVED: {timestamp}", (10, save_frame.shape[0] - 20),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
-        cv2.imwrite(filename, save_frame)
-        print(f"✅ Frame saved as: {filename}")
-        print(f"   Threat Level: {threat_details.get('threat_level', 'Unknown')}")
-        print(f"   Detected Objects: {', '.join(threat_details.get('detected_objects', []))}")
+        # Encoding and the disk write happen on the evidence thread
+        evidence_id = evidence.submit(EncodedFrame(save_frame, copy=False), result)
+        if evidence_id is None:
+            return
+        print(f"✅ Frame queued as evidence {evidence_id} (under {evidence.root})")
+        print(f"   Threat Level: {result.threat_details.get('threat_level', 'Unknown')}")
+        print(f"   Detected Objects: {', '.join(result.threat_details.get('detected_objects', []))}")
     
     def reset_counters():
         """Reset all counters and statistics."""
-        nonlocal frame_count, threat_count, total_threats_detected, start_time, last_email_time
+        nonlocal frame_count, threat_count, total_threats_detected, start_time
         frame_count = 0
         threat_count = 0
         total_threats_detected = 0
         start_time = time.time()
-        last_email_time = 0
+        threat_tracker.reset()
         print("🔄 All counters reset!")
     
+    # Capture and inference run on their own threads; this loop is the render/alert stage
+    gate = MotionGate() if MOTION_CONFIG['enabled'] else None
+    if gate:
+        print(f"🎞️ Motion gating on (heartbeat every {gate.heartbeat:.0f} s)")
+    from tiling import TiledDetector, TILING_CONFIG
+    if pool:
+        # Frames go to the worker processes through shared memory; tiles would need the model here
+        if TILING_CONFIG['enabled']:
+            print("⚠️ Tiled inference is not available with --processes; running whole frames")
+        detect_fn = None
+    elif TILING_CONFIG['enabled']:
+        print(f"🧩 Tiled inference on ({TILING_CONFIG['tile_size']} px tiles, up to {TILING_CONFIG['max_tiles']} per frame)")
+        detect_fn = TiledDetector(model, gate)
+    else:
+        detect_fn = lambda f: detect(f, model)
+    # Detection rate follows the threat state and host load instead of running on every frame
+    rate = RateController()
+    pipeline = DetectionPipeline(cap, detect_fn, gate, rate, pool=pool).start()
+
     while True:
         try:
-            ret, frame = cap.read()
-            if not ret:
-                print("Failed to grab frame")
-                break
-            result = detect_threat(frame, model)
-            if result is None:
+            packet = pipeline.get_result()
+            if packet is None:
+                if pipeline.failed:
+                    break
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                continue
+            timer.mark("first frame", at=pipeline.capture.first_frame_time)
+            result = packet.result
+            if result is None or not result.valid:
                 print("⚠️ Skipping frame due to detection error")
                 continue
-            frame, threat_detected, threat_details = result
+            if 'first valid detection' not in timer.marks and result.threat_details.get('threat_level') != 'Error':
+                timer.mark("first valid detection")
+                timer.report()
+            # Gated frames show the tracks' predicted boxes instead of the stale detections
+            if packet.skipped:
+                result = threat_tracker.interpolate(result, packet.timestamp)
+            # Drawing happens here, only for frames that are actually displayed
+            frame = draw_detections(packet.frame, result)
+            threat_tracker.draw(frame, packet.timestamp)
+            if packet.stale:
+                cv2.putText(frame, "Camera reconnecting - showing last frame", (10, frame.shape[0] - 20),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 165, 255), 2)
+            threat_detected, threat_details = result.threat_detected, result.threat_details
             frame_count += 1
-            
-            # Update threat statistics
-            if threat_detected:
+
+            # Update threat statistics (gated frames reuse the last result and are not counted again)
+            if threat_detected and not packet.skipped:
                 threat_count += 1
                 if threat_count == 1:  # First detection in sequence
                     total_threats_detected += 1
-            
-            # Calculate FPS
+
+            # Per-stage throughput and queue depth
+            stats = pipeline.stats()
+            cv2.putText(frame, f"FPS cap/inf/out: {stats['capture_fps']:.1f}/{stats['inference_fps']:.1f}/"
+                       f"{stats['render_fps']:.1f}", (10, 120),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
             if frame_count % 30 == 0:
-                end_time = time.time()
-                fps = 30 / (end_time - start_time)
-                start_time = time.time()
-                cv2.putText(frame, f"FPS: {fps:.1f}", (10, 120),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            
+                print(f"[PIPELINE] capture {stats['capture_fps']:.1f} fps | inference {stats['inference_fps']:.1f} fps | "
+                      f"render {stats['render_fps']:.1f} fps | queues {stats['capture_queue']}/{stats['result_queue']} | "
+                      f"dropped {stats['dropped_frames']} | skipped {stats['skipped_frames']} | "
+                      f"interval {stats['inference_interval_ms']:.0f} ms | latency {stats['latency_ms']:.0f} ms")
+                rate_stats = rate.stats()
+                load = f"{rate_stats['host_load']:.2f}" if rate_stats['host_load'] is not None else "n/a"
+                print(f"[RATE] detect every {rate_stats['interval_ms']:.0f} ms | detect {rate_stats['latency_ms']:.0f} ms | "
+                      f"cpu {rate_stats['cpu_fraction']:.0%} | load {load}/core | backoff x{rate_stats['backoff']:.2f} | "
+                      f"track hold {threat_tracker.tracker.max_age:.1f} s")
+
             # Add statistics to frame
             cv2.putText(frame, f"Frame: {frame_count}", (10, 150),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
             cv2.putText(frame, f"Threats: {total_threats_detected}", (10, 170),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
             
+            if recorder and not packet.stale:
+                recorder.add("Default", frame, packet.timestamp)
             cv2.imshow("AI Threat Detection System", frame)
-            detection_buffer.pop(0)
-            detection_buffer.append(threat_detected)
-            # Require detection in at least 2 of last 10 frames
-            smoothed_threat = sum(detection_buffer) >= 2
-            # Hold period logic: keep alert active for 10 frames after last detection
-            if smoothed_threat:
-                hold_counter = hold_period
-            elif hold_counter > 0:
-                hold_counter -= 1
-                smoothed_threat = True
+            if not packet.skipped:
+                # Alert while a confirmed weapon track is alive
+                smoothed_threat = threat_tracker.update(result, packet.timestamp)
+                # Never gate inference away while an alert is active, and speed up while weapons are tracked
+                pipeline.inference.force_inference = smoothed_threat
+                rate.set_active(smoothed_threat or threat_tracker.tracking, packet.timestamp)
             
-            # Reset threat count when no threat detected
-            if not threat_detected:
-                threat_count = 0
-            
-            if arduino and smoothed_threat != previous_state:
-                try:
-                    signal = "1" if smoothed_threat else "0"
-                    arduino.write(signal.encode())
-                    print(f"Sent signal {signal} to Arduino")
-                    previous_state = smoothed_threat
-                except Exception as e:
-                    print(f"⚠️ Failed to send signal to Arduino: {e}")
-            current_time = time.time()
-            if smoothed_threat and (current_time - last_email_time) > email_cooldown:
-                if not is_email_config_valid():
-                    print("[EMAIL] Email config incomplete. Not sending email.")
-                else:
-                    print("📧 Sending threat alert email (background)...")
-                    send_email_background(frame, threat_details)
-                    last_email_time = current_time
-                    print(f"⏰ Next email can be sent in {email_cooldown} seconds")
+                # Reset threat count when no threat detected
+                if not threat_detected:
+                    threat_count = 0
+                alerts.observe("Default", smoothed_threat, frame, result, packet.timestamp)
+            else:
+                alerts.tick(packet.timestamp)
             
+            if arduino:
+                # Only records the state; the link's thread does the serial write
+                arduino.set_state(smoothed_threat)
+            if recorder:
+                recorder.set_active("Default", smoothed_threat, packet.timestamp)
             # Handle keyboard input
             key = cv2.waitKey(1) & 0xFF
             if key == ord('q'):
                 break
             elif key == ord('s'):
-                save_current_frame(frame, threat_details)
+                save_current_frame(frame, result)
             elif key == ord('r'):
                 reset_counters()
                 
@@ -744,8 +1122,18 @@ def main():
             print("Continuing...")
             time.sleep(0.1)
             continue
+    pipeline.stop()
+    if pool:
+        pool.report()
+        pool.close()
     cap.release()
     cv2.destroyAllWindows()
+    alerts.flush()
+    stop_alert_dispatcher()
+    if recorder:
+        recorder.stop()
+    evidence.stop()
+    evidence.report()
     if arduino:
         arduino.close()
         print("Arduino connection closed")
@@ -753,11 +1141,99 @@ def main():
     
     return True
 
-if __name__ == "__main__":
-    import sys
-    
-    # Check if DroidCam test is requested
-    if len(sys.argv) > 1 and sys.argv[1] == "--test-droidcam":
+def run_cli(argv=None):
+    """Command-line entry point: parse the options into the config dicts and run the chosen mode."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="AI Threat Detection System")
+    parser.add_argument('--test-droidcam', action='store_true',
+                        help="Test a DroidCam connection and exit")
+    parser.add_argument('--multi-stream', nargs='+', metavar='SOURCE',
+                        help="Run batched detection over several camera indices or stream URLs")
+    parser.add_argument('--analyze', nargs='+', metavar='PATH',
+                        help="Headless analysis of recorded video files or directories into a detection index")
+    parser.add_argument('--stride', type=int,
+                        help="With --analyze: analyse every Nth frame (default: 5)")
+    parser.add_argument('--start', type=float, default=0.0,
+                        help="With --analyze: seconds into each video to start from")
+    parser.add_argument('--end', type=float,
+                        help="With --analyze: seconds into each video to stop at")
+    parser.add_argument('--batch-size', type=int,
+                        help="With --analyze: frames per forward pass (default: 8)")
+    parser.add_argument('--workers', type=int,
+                        help="With --analyze: inference workers, each with its own model (default: 2)")
+    parser.add_argument('--processes', type=int,
+                        help="Run the model in N worker processes fed through shared memory "
+                             "(live camera, --multi-stream or --analyze)")
+    parser.add_argument('--index', choices=['events', 'frames'],
+                        help="With --analyze: one record per incident or per frame with detections (default: events)")
+    parser.add_argument('--output', metavar='FILE',
+                        help="With --analyze: index file, .jsonl or .parquet (default: analysis_index.jsonl)")
+    parser.add_argument('--backend', choices=list(BACKENDS),
+                        help="Inference engine (default: pytorch or $THREAT_DETECTION_BACKEND)")
+    parser.add_argument('--threads', type=int,
+                        help="CPU threads for the inference engine (default: engine default)")
+    parser.add_argument('--motion-gate', action='store_true',
+                        help="Only run inference when the scene changes (plus a periodic heartbeat)")
+    parser.add_argument('--heartbeat', type=float,
+                        help=f"Seconds between forced inferences when gating (default: {MOTION_CONFIG['heartbeat']})")
+    parser.add_argument('--cpu-budget', type=float,
+                        help=f"Share of all CPU cores inference may use, 0-1 (default: {RATE_CONFIG['cpu_budget']})")
+    parser.add_argument('--tiles', action='store_true',
+                        help="Also run full-resolution tiles where there is motion or a weak weapon hit")
+    parser.add_argument('--tile-size', type=int,
+                        help="Tile edge in pixels for --tiles (default: 640)")
+    parser.add_argument('--no-clips', action='store_true',
+                        help="Do not record pre-/post-roll video clips of incidents")
+    parser.add_argument('--clip-dir', metavar='DIR',
+                        help=f"Directory for incident clips (default: {RECORDER_CONFIG['output_dir']})")
+    parser.add_argument('--evidence-dir', metavar='DIR',
+                        help=f"Root directory for saved frames and their index (default: {EVIDENCE_CONFIG['root']})")
+    parser.add_argument('--quantize', nargs='?', const='.', metavar='CALIB_DIR',
+                        help="Build a quantized model from saved threat_detection_*.jpg frames and report accuracy/speed")
+    parser.add_argument('--quant-mode', choices=['static', 'dynamic', 'fp16'], default='static',
+                        help="INT8 static (calibrated), INT8 dynamic, or FP16 OpenVINO (default: static)")
+    args = parser.parse_args(argv)
+    if args.backend:
+        DETECTION_CONFIG['backend'] = args.backend
+    if args.threads:
+        DETECTION_CONFIG['num_threads'] = args.threads
+    if args.motion_gate:
+        MOTION_CONFIG['enabled'] = True
+    if args.heartbeat:
+        MOTION_CONFIG['heartbeat'] = args.heartbeat
+    if args.cpu_budget:
+        RATE_CONFIG['cpu_budget'] = args.cpu_budget
+    if args.no_clips:
+        RECORDER_CONFIG['enabled'] = False
+    if args.clip_dir:
+        RECORDER_CONFIG['output_dir'] = args.clip_dir
+    if args.evidence_dir:
+        EVIDENCE_CONFIG['root'] = args.evidence_dir
+    if args.tiles or args.tile_size:
+        from tiling import TILING_CONFIG
+        TILING_CONFIG['enabled'] = True
+        if args.tile_size:
+            TILING_CONFIG['tile_size'] = args.tile_size
+
+    if args.test_droidcam:
         test_droidcam_standalone()
+    elif args.quantize:
+        from quantize_model import run_quantization
+        run_quantization(args.quantize, args.quant_mode)
+    elif args.analyze:
+        from batch_analysis import run_batch_analysis
+        run_batch_analysis(args.analyze, output=args.output, index=args.index, stride=args.stride,
+                           batch_size=args.batch_size, workers=args.workers, start=args.start, end=args.end,
+                           processes=args.processes, backend=args.backend, num_threads=args.threads)
+    elif args.multi_stream:
+        from multi_stream import run_multi_stream
+        run_multi_stream(args.multi_stream, processes=args.processes)
     else:
-        main()
\ No newline at end of file
+        main(processes=args.processes)
+
+if __name__ == "__main__":
+    # Run on the imported module, not on this __main__ copy: batch analysis, multi-stream,
+    # tiling and quantization import threat_detection and must see the options set above
+    import threat_detection
+    threat_detection.run_cli()
\ No newline at end of file
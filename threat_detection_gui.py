@@ -8,7 +8,19 @@ from tkinter import ttk, messagebox
 import cv2
 from PIL import Image, ImageTk
 import threading
-from threat_detection import load_yolo, detect_threat, setup_arduino, EMAIL_CONFIG, send_threat_email, is_email_config_valid, setup_droidcam, test_droidcam_connection as test_droidcam_connection_main
+from motion_gate import MotionGate, MOTION_CONFIG
+from pipeline import PIPELINE_CONFIG
+from frame_ring import FrameRing
+from tracker import ThreatTracker
+from rate_control import RateController
+from frame_encoding import EncodedFrame
+from alert_aggregator import AlertAggregator
+from arduino_link import ArduinoLink
+from camera_supervisor import SupervisedCapture
+from gui_render import RenderWorker, RENDER_CONFIG
+from incident_recorder import IncidentRecorder, RECORDER_CONFIG
+from evidence_store import EvidenceStore
+from threat_detection import ModelLoader, StartupTimer, detect, draw_detections, EMAIL_CONFIG, send_threat_email, stop_alert_dispatcher, is_email_config_valid, setup_droidcam, test_droidcam_connection as test_droidcam_connection_main
 import time
 import queue
 import os
@@ -17,25 +29,37 @@ from datetime import datetime
 class EnhancedGUI:
     def __init__(self, root):
         self.root = root
+        self.startup_timer = StartupTimer()
         self.root.title("AI Threat Detection - Enhanced")
         self.root.geometry("1200x800")
         
         # Variables
         self.is_running = False
         self.cap = None
+        self.workers = []  # Capture and inference threads of the current session
         self.model = None
         self.arduino = None
-        self.frame_queue = queue.Queue(maxsize=1)  # Reduced queue size
+        self.frames = FrameRing()  # Raw camera frames, shared by inference and save without handing them over
+        self.ring_overruns = 0  # Frames overwritten before inference could copy them
         self.current_image = None
+        self.renderer = RenderWorker()  # Resize / colour conversion / PIL happen off the Tk thread
+        self.renderer.start()
+        # Pre-roll ring and incident clips; compression and encoding run on the recorder's threads
+        self.recorder = IncidentRecorder().start() if RECORDER_CONFIG['enabled'] else None
+        self.evidence = EvidenceStore()  # Saved frames are encoded, written and indexed off the Tk thread
+        self.evidence.start()
+        self.ui_time_ms = 0.0  # Smoothed Tk-thread time per display tick
+        self.ui_events = queue.Queue()  # Widget updates posted by worker threads, run on the Tk thread
+        self.result_lock = threading.Lock()  # Guards last_result and the tracker between capture and inference
         self.email_expanded = False
-        self.last_email_time = 0  # Email cooldown
-        self.email_cooldown = 60  # 60 seconds between emails
+        self.alerts = AlertAggregator(self.send_alert_email, self.evidence)  # Incident digests instead of a fixed cooldown
         self.source_var = tk.StringVar(value="webcam")
-        self.detection_buffer = [False] * 10  # Increased buffer size for more smoothing
-        self.hold_counter = 0  # Hold period counter
-        self.hold_period = 10  # Number of frames to hold alert after last detection
+        self.threat_tracker = ThreatTracker()  # Weapon tracks drive the smoothed alert state
+        self.rate = RateController()  # Adapts the detection interval to threat state and load
         self.last_smoothed_threat = False
         self.last_threat_status = None
+        self.last_result = None
+        self.motion_gate = None
         self.first_email_sent = False  # Track if first email was sent for popup
         
         # Statistics
@@ -69,8 +93,9 @@ class EnhancedGUI:
         self.camera_frame = ttk.LabelFrame(main_frame, text="Camera Feed")
         self.camera_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 10))
         
-        self.video_label = ttk.Label(self.camera_frame)
-        self.video_label.pack(padx=10, pady=10)
+        self.video_label = ttk.Label(self.camera_frame, anchor=tk.CENTER)
+        # Fill the camera frame so the label's size is the space frames are rendered for
+        self.video_label.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
         
         # Statistics frame (below camera)
         stats_frame = ttk.LabelFrame(main_frame, text="Statistics")
@@ -92,6 +117,10 @@ class EnhancedGUI:
         # Arduino status
         self.arduino_status = ttk.Label(control_frame, text="Arduino: Disconnected")
         self.arduino_status.pack(pady=5)
+        # Discovery stops after a few failed attempts; probing again resets Arduino-class devices
+        self.arduino_button = ttk.Button(control_frame, text="Find Arduino",
+                                         command=self.find_arduino, width=30)
+        self.arduino_button.pack(pady=5)
         
         # Camera source selection
         source_frame = ttk.LabelFrame(control_frame, text="Camera Source")
@@ -190,12 +219,16 @@ class EnhancedGUI:
     
     def initialize_system(self):
         try:
-            self.model = load_yolo()
-            self.arduino = setup_arduino()
-            if self.arduino:
-                self.arduino_status.config(text="Arduino: Connected", foreground="green")
-            else:
-                self.arduino_status.config(text="Arduino: Disconnected", foreground="red")
+            # Load and warm up the model in the background so the window appears immediately
+            self.model_loader = ModelLoader()
+            self.model_loader.start()
+            self.start_button.config(text="Loading Model...", state="disabled")
+            self.root.after(200, self.check_model_loaded)
+            
+            # Discovery and serial writes run on the link's own thread
+            self.arduino = ArduinoLink()
+            self.arduino.start()
+            self.root.after(500, self.update_arduino_status)
             
             # Load email config
             self.load_email_config()
@@ -203,6 +236,35 @@ class EnhancedGUI:
         except Exception as e:
             messagebox.showerror("Error", f"Initialization failed: {e}")
     
+    def check_model_loaded(self):
+        """Poll the background model loader and enable detection once it is ready."""
+        if self.model_loader.is_alive():
+            self.root.after(200, self.check_model_loaded)
+            return
+        try:
+            self.model = self.model_loader.get()
+            self.startup_timer.mark("model ready")
+            self.start_button.config(text="Start Detection", state="normal")
+        except Exception as e:
+            self.start_button.config(text="Model Failed", state="disabled")
+            messagebox.showerror("Error", f"Model loading failed: {e}")
+    
+    def update_arduino_status(self):
+        """Mirror the Arduino link state (it reconnects on its own) in the status label."""
+        if self.arduino.connected:
+            self.arduino_status.config(text=f"Arduino: Connected ({self.arduino.port})", foreground="green")
+        elif self.arduino.searching:
+            self.arduino_status.config(text="Arduino: Searching...", foreground="orange")
+        else:
+            self.arduino_status.config(text="Arduino: Not found", foreground="red")
+        self.root.after(1000, self.update_arduino_status)
+    
+    def find_arduino(self):
+        """Probe the serial ports again on user request."""
+        if self.arduino:
+            self.arduino.rediscover()
+            self.arduino_status.config(text="Arduino: Searching...", foreground="orange")
+    
     def on_source_change(self):
         """Handle camera source change"""
         source = self.source_var.get()
@@ -227,12 +289,14 @@ class EnhancedGUI:
         if not self.model:
             messagebox.showerror("Error", "Model not loaded!")
             return
+        # A quick stop/start must not leave the previous session's threads running next to the new ones
+        self.join_workers()
         
         self.is_running = True
         self.start_button.config(text="Stop Detection")
         
-        # Setup camera based on selection
-        self.cap = self.setup_camera()
+        # Setup camera based on selection; Tk variables are read here, on the UI thread
+        self.cap = self.setup_camera(self.source_var.get(), self.ip_var.get().strip(), self.port_var.get().strip())
         
         if not self.cap or not self.cap.isOpened():
             messagebox.showerror("Error", "Could not open camera!")
@@ -244,15 +308,24 @@ class EnhancedGUI:
         self.threat_count = 0
         self.total_threats_detected = 0
         self.start_time = time.time()
-        
-        threading.Thread(target=self.capture_loop, daemon=True).start()
+        self.last_result = None
+        self.threat_tracker.reset()
+        self.rate = RateController()
+        self.motion_gate = MotionGate() if MOTION_CONFIG['enabled'] else None
+        from tiling import TiledDetector, TILING_CONFIG
+        self.tiled_detector = TiledDetector(self.model, self.motion_gate) if TILING_CONFIG['enabled'] else None
+        
+        # Preview follows the camera; detection runs on its own thread at the rate controller's pace
+        self.workers = [threading.Thread(target=self.capture_loop, daemon=True),
+                        threading.Thread(target=self.inference_loop, daemon=True)]
+        for worker in self.workers:
+            worker.start()
     
-    def setup_camera(self):
-        """Setup camera based on selected source"""
-        source = self.source_var.get()
-        
+    def setup_camera(self, source, ip, port):
+        """Setup camera for the selected source ('webcam', 'virtual' or 'ipcam' with ip and port)"""
         if source == "webcam":
             print("Using PC webcam...")
+            camera_source = 0
             cap = cv2.VideoCapture(0)
             if not cap.isOpened():
                 print("❌ Failed to open webcam")
@@ -261,6 +334,7 @@ class EnhancedGUI:
             
         elif source == "virtual":
             print("Using DroidCam Virtual Camera...")
+            camera_source = 1
             cap = cv2.VideoCapture(1)  # Virtual camera index
             if not cap.isOpened():
                 print("❌ Failed to open DroidCam Virtual Camera")
@@ -286,12 +360,10 @@ class EnhancedGUI:
                 ret, frame = cap.read()
                 if ret:
                     print("✅ Virtual camera connection successful!")
-                    return cap
+                    return SupervisedCapture(1, cap=cap).start()
                 cap.release()
             
             # If virtual camera fails, try IP
-            ip = self.ip_var.get().strip()
-            port = self.port_var.get().strip()
             if not ip:
                 print("❌ IP address is required")
                 return None
@@ -299,11 +371,13 @@ class EnhancedGUI:
             url = f"http://{ip}:{port}/video"
             print(f"Trying IP connection: {url}")
             
+            camera_source = url
             cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
             if not cap.isOpened():
                 # Try RTSP
                 rtsp_url = url.replace('http://', 'rtsp://')
                 print(f"Trying RTSP connection: {rtsp_url}")
+                camera_source = rtsp_url
                 cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
             
             if not cap.isOpened():
@@ -318,6 +392,8 @@ class EnhancedGUI:
             cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
             cap.set(cv2.CAP_PROP_FPS, 30)
             cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            # Drop-outs are reconnected in the background; the preview keeps the last frame meanwhile
+            cap = SupervisedCapture(camera_source, cap=cap).start()
         
         return cap
     
@@ -328,98 +404,140 @@ class EnhancedGUI:
             self.cap.release()
             self.cap = None
     
+    def join_workers(self, timeout=5.0):
+        """Wait for the capture and inference threads of the last session to finish."""
+        for worker in self.workers:
+            worker.join(timeout)
+        self.workers = []
+    
+    def on_close(self):
+        """Window closed: stop detection while the widgets still exist, then leave the main loop."""
+        if self.is_running:
+            self.stop_detection()
+        self.root.destroy()
+    
     def capture_loop(self):
-        frame_count = 0
-        start_time = time.time()
-        last_detection = 0
-        detection_interval = 0.3  # Run detection every 0.3 seconds for better responsiveness
+        """Camera-rate preview: every frame is shown with the latest detections composited on top."""
+        cap = self.cap  # stop_detection() may clear self.cap while a read is in progress
         while self.is_running:
-            ret, frame = self.cap.read()
+            ret, frame = cap.read()
             if not ret:
                 break
-            frame_count += 1
-            current_time = time.time()
-            if current_time - last_detection >= detection_interval:
-                try:
-                    result = detect_threat(frame, self.model)
-                    if result is None:
-                        continue
-                    processed_frame, threat_detected, threat_details = result
-                    last_detection = current_time
-                    
-                    # Update threat statistics
-                    if threat_detected:
-                        self.threat_count += 1
-                        if self.threat_count == 1:  # First detection in sequence
-                            self.total_threats_detected += 1
-                    else:
-                        self.threat_count = 0
-                    
-                    self.detection_buffer.pop(0)
-                    self.detection_buffer.append(threat_detected)
-                    smoothed_threat = sum(self.detection_buffer) >= 2
-                    if smoothed_threat:
-                        self.hold_counter = self.hold_period
-                    elif self.hold_counter > 0:
-                        self.hold_counter -= 1
-                        smoothed_threat = True
-                    self.last_smoothed_threat = smoothed_threat
-                    self.last_threat_status = threat_details.get('status')
-                    
-                    def send_email_bg(frame, threat_details):
-                        send_threat_email(frame, threat_details)
-                    
-                    if (smoothed_threat and hasattr(self, 'email_configured') and self.email_configured and 
-                        current_time - self.last_email_time > self.email_cooldown):
-                        if not is_email_config_valid():
-                            print("[EMAIL] Email config incomplete. Not sending email.")
-                            self.email_status.config(text="Email: Config Incomplete", foreground="red")
-                            self.show_email_popup("Email configuration is incomplete. Please fill all fields and save.")
-                        else:
-                            print(f"[EMAIL] Attempting to send email with config: {EMAIL_CONFIG}")
-                            try:
-                                threading.Thread(target=send_email_bg, args=(processed_frame.copy(), threat_details), daemon=True).start()
-                                print("[EMAIL] Email send triggered in background thread.")
-                                self.email_status.config(text="Email: Alert Sent (background)", foreground="green")
-                                self.last_email_time = current_time
-                            except Exception as e:
-                                print(f"[EMAIL] Exception during email send: {e}")
-                                import traceback
-                                traceback.print_exc()
-                                self.email_status.config(text="Email: Alert Exception", foreground="red")
-                                self.show_email_popup(f"Exception during email send: {e}")
-                    
-                    # Update frame count
-                    self.frame_count = frame_count
-                    
-                    try:
-                        self.frame_queue.put_nowait(processed_frame)
-                    except queue.Full:
-                        try:
-                            self.frame_queue.get_nowait()
-                        except:
-                            pass
-                        try:
-                            self.frame_queue.put_nowait(processed_frame)
-                        except:
-                            pass
-                except Exception as e:
-                    print(f"Detection error: {e}")
-            time.sleep(0.01)  # Reduced sleep time for better responsiveness
+            self.startup_timer.mark("first frame")
+            if cap.stale:
+                # Source reconnecting: hold the last frame, tracks and alarm state
+                now = cap.frame_time
+            else:
+                now = time.time()
+                self.frame_count += 1
+                self.frames.put(frame, now)
+            preview = frame if self.last_result is None else self.draw_tracked(frame, now)
+            if self.recorder and not cap.stale:
+                self.recorder.add("Default", preview, now)
+            self.push_frame(preview)
+    
+    def inference_loop(self):
+        """Runs the detector on the newest captured frame whenever the rate controller says it is due."""
+        last_id = self.frames.latest_id  # Ignore frames left over from a previous session
+        while self.is_running:
+            item = self.frames.wait_newer(last_id, timeout=PIPELINE_CONFIG['get_timeout'])
+            if item is None:
+                continue
+            last_id = item.frame_id
+            current_time = item.timestamp
+            if self.last_result is not None and not self.rate.due(current_time):
+                self.alerts.tick(current_time)
+                continue
+            # Own copy for this cycle: inference may take longer than the ring takes to wrap
+            frame = item.frame.copy()
+            if not self.frames.valid(item.frame_id):
+                # Overwritten while being copied (capture lapped the ring); take the next frame
+                self.ring_overruns += 1
+                print(f"⚠️ Frame {item.frame_id} was overwritten before inference could copy it "
+                      f"({self.ring_overruns} so far)")
+                continue
+            if (self.motion_gate and self.last_result is not None and
+                    not self.motion_gate.should_infer(frame, current_time, force=self.last_smoothed_threat)):
+                # Static scene: the preview keeps the last overlay, inference is skipped
+                continue
+            try:
+                started = time.time()
+                if self.tiled_detector:
+                    result = self.tiled_detector(frame)
+                else:
+                    result = detect(frame, self.model)
+                self.rate.record(time.time() - started, started)
+                if not result.valid:
+                    continue
+                processed_frame = draw_detections(frame, result)
+                threat_detected, threat_details = result.threat_detected, result.threat_details
+                with self.result_lock:
+                    self.last_result = result
+                    smoothed_threat = self.threat_tracker.update(result, current_time)
+                    self.threat_tracker.draw(processed_frame, current_time)
+                if 'first valid detection' not in self.startup_timer.marks and threat_details.get('threat_level') != 'Error':
+                    self.startup_timer.mark("first valid detection")
+                    self.startup_timer.report()
+                
+                # Update threat statistics
+                if threat_detected:
+                    self.threat_count += 1
+                    if self.threat_count == 1:  # First detection in sequence
+                        self.total_threats_detected += 1
+                else:
+                    self.threat_count = 0
+                
+                self.last_smoothed_threat = smoothed_threat
+                if self.arduino:
+                    self.arduino.set_state(smoothed_threat)
+                if self.recorder:
+                    self.recorder.set_active("Default", smoothed_threat, current_time)
+                self.rate.set_active(smoothed_threat or self.threat_tracker.tracking, current_time)
+                self.last_threat_status = threat_details.get('status')
+                
+                self.alerts.observe("Default", smoothed_threat, processed_frame, result, current_time)
+            except Exception as e:
+                print(f"Detection error: {e}")
+    
+    def draw_tracked(self, frame, now):
+        """Annotate a frame the detector did not see, using the tracks' predicted boxes."""
+        with self.result_lock:
+            processed_frame = draw_detections(frame, self.threat_tracker.interpolate(self.last_result, now))
+            return self.threat_tracker.draw(processed_frame, now)
+    
+    def push_frame(self, frame):
+        """Hand a processed frame to the display, replacing any frame not yet shown."""
+        self.renderer.submit(frame)
+    
+    def post_ui(self, fn, *args, **kwargs):
+        """Run a widget update on the Tk thread; safe to call from any thread."""
+        self.ui_events.put((fn, args, kwargs))
+    
+    def process_ui_events(self):
+        while True:
+            try:
+                fn, args, kwargs = self.ui_events.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                print(f"UI update error: {e}")
     
     def update_display(self):
+        tick_start = time.perf_counter()
+        self.process_ui_events()
         if self.is_running:
             try:
-                frame = self.frame_queue.get_nowait()
-                # Resize frame for better performance
-                frame = cv2.resize(frame, (640, 480))
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame_rgb)
-                img = ImageTk.PhotoImage(image=img)
-                self.current_image = img
-                self.video_label.config(image=img)
-            except queue.Empty:
-                pass
+                # Only swap in an image the render worker finished since the last tick
+                self.renderer.set_target_size(self.video_label.winfo_width(), self.video_label.winfo_height())
+                image = self.renderer.take()
+                if image is not None:
+                    if self.current_image is not None and (self.current_image.width(), self.current_image.height()) == image.size:
+                        self.current_image.paste(image)  # Reuse the Tk image instead of creating one per frame
+                    else:
+                        self.current_image = ImageTk.PhotoImage(image=image)
+                        self.video_label.config(image=self.current_image)
             except Exception as e:
                 print(f"Display error: {e}")
         
@@ -428,8 +546,16 @@ class EnhancedGUI:
             current_time = time.time()
             fps = self.frame_count / (current_time - self.start_time) if current_time > self.start_time else 0
             stats_text = f"Frame: {self.frame_count} | Threats: {self.total_threats_detected} | FPS: {fps:.1f}"
+            if self.motion_gate:
+                stats_text += f" | Skipped: {self.motion_gate.skipped}"
+            stats_text += f" | Detect every: {self.rate.interval * 1000:.0f} ms"
+            if self.evidence.dropped:
+                stats_text += f" | Saves dropped: {self.evidence.dropped}"
+            stats_text += f" | Display: {self.renderer.display_stats.fps:.1f} fps | UI: {self.ui_time_ms:.1f} ms/tick"
             self.stats_label.config(text=stats_text)
         
+        alpha = RENDER_CONFIG['ui_time_smoothing']
+        self.ui_time_ms += alpha * ((time.perf_counter() - tick_start) * 1000 - self.ui_time_ms)
         self.root.after(33, self.update_display)  # ~30 FPS display update
     
     def handle_keyboard(self, event):
@@ -447,24 +573,31 @@ class EnhancedGUI:
         
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"threat_detection_{timestamp}.jpg"
             
-            # Get the current frame from the queue
-            try:
-                frame = self.frame_queue.get_nowait()
-                # Add save confirmation text
-                cv2.putText(frame, f"SAVED: {timestamp}", (10, frame.shape[0] - 20),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                cv2.imwrite(filename, frame)
-                
-                print(f"✅ Frame saved as: {filename}")
-                if self.last_threat_status:
-                    print(f"   Status: {self.last_threat_status}")
-                
-                messagebox.showinfo("Success", f"Frame saved as: {filename}")
-                
-            except queue.Empty:
-                messagebox.showwarning("Warning", "No frame available to save.")
+            # Own copy of the newest frame; capture may lap the ring while it is copied, so it is checked after
+            latest = self.frames.copy_latest()
+            if latest is None:
+                messagebox.showwarning("Warning", "No complete frame available to save.")
+                return
+            result = self.last_result
+            if result is None:
+                frame = latest.frame
+            else:
+                frame = self.draw_tracked(latest.frame, latest.timestamp)
+            # Add save confirmation text
+            cv2.putText(frame, f"SAVED: {timestamp}", (10, frame.shape[0] - 20),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            # Encoding and the disk write happen on the evidence thread
+            evidence_id = self.evidence.submit(EncodedFrame(frame, copy=False), result)
+            if evidence_id is None:
+                messagebox.showwarning("Warning", "Evidence writer is busy; frame not saved.")
+                return
+            
+            print(f"✅ Frame queued as evidence {evidence_id} (under {self.evidence.root})")
+            if self.last_threat_status:
+                print(f"   Status: {self.last_threat_status}")
+            
+            messagebox.showinfo("Success", f"Frame saved as evidence {evidence_id} in {self.evidence.root}")
                 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save frame: {e}")
@@ -475,7 +608,8 @@ class EnhancedGUI:
         self.threat_count = 0
         self.total_threats_detected = 0
         self.start_time = time.time()
-        self.last_email_time = 0
+        with self.result_lock:
+            self.threat_tracker.reset()
         print("🔄 All counters reset!")
         messagebox.showinfo("Reset", "All counters have been reset!")
     
@@ -602,6 +736,9 @@ class EnhancedGUI:
         """Test DroidCam connection without starting full detection"""
         self.ipcam_status.config(text="DroidCam: Testing...", foreground="blue")
         self.test_ipcam_btn.config(state="disabled")
+        # Tk variables are only read on the UI thread
+        ip = self.ip_var.get().strip()
+        port = self.port_var.get().strip()
         
         # Run test in background thread
         def test_connection():
@@ -613,17 +750,15 @@ class EnhancedGUI:
                     ret, frame = cap.read()
                     if ret:
                         cap.release()
-                        self.ipcam_status.config(text="DroidCam: Virtual Camera ✓", foreground="green")
-                        messagebox.showinfo("Success", "DroidCam Virtual Camera is working!")
+                        self.post_ui(self.ipcam_status.config, text="DroidCam: Virtual Camera ✓", foreground="green")
+                        self.post_ui(messagebox.showinfo, "Success", "DroidCam Virtual Camera is working!")
                         return
                     cap.release()
                 
                 # Try IP connection
-                ip = self.ip_var.get().strip()
-                port = self.port_var.get().strip()
                 if not ip:
-                    self.ipcam_status.config(text="DroidCam: IP required", foreground="red")
-                    messagebox.showerror("Error", "Please enter IP address")
+                    self.post_ui(self.ipcam_status.config, text="DroidCam: IP required", foreground="red")
+                    self.post_ui(messagebox.showerror, "Error", "Please enter IP address")
                     return
                 
                 url = f"http://{ip}:{port}/video"
@@ -633,20 +768,52 @@ class EnhancedGUI:
                 success, message = test_droidcam_connection_main(url)
                 
                 if success:
-                    self.ipcam_status.config(text="DroidCam: IP Connected ✓", foreground="green")
-                    messagebox.showinfo("Success", f"DroidCam IP connection successful!\n{message}")
+                    self.post_ui(self.ipcam_status.config, text="DroidCam: IP Connected ✓", foreground="green")
+                    self.post_ui(messagebox.showinfo, "Success", f"DroidCam IP connection successful!\n{message}")
                 else:
-                    self.ipcam_status.config(text="DroidCam: IP Failed", foreground="red")
-                    messagebox.showerror("Error", f"DroidCam IP connection failed:\n{message}")
+                    self.post_ui(self.ipcam_status.config, text="DroidCam: IP Failed", foreground="red")
+                    self.post_ui(messagebox.showerror, "Error", f"DroidCam IP connection failed:\n{message}")
                     
             except Exception as e:
-                self.ipcam_status.config(text="DroidCam: Test error", foreground="red")
-                messagebox.showerror("Error", f"Connection test failed: {e}")
+                self.post_ui(self.ipcam_status.config, text="DroidCam: Test error", foreground="red")
+                self.post_ui(messagebox.showerror, "Error", f"Connection test failed: {e}")
             finally:
-                self.test_ipcam_btn.config(state="normal")
+                self.post_ui(self.test_ipcam_btn.config, state="normal")
         
         threading.Thread(target=test_connection, daemon=True).start()
 
+    def send_alert_email(self, images, threat_details):
+        """AlertAggregator sink; returns None while email alerts are off so incidents are only logged."""
+        if not getattr(self, 'email_configured', False):
+            return None
+        if not is_email_config_valid():
+            print("[EMAIL] Email config incomplete. Not sending email.")
+            self.post_ui(self.email_status.config, text="Email: Config Incomplete", foreground="red")
+            self.post_ui(self.show_email_popup, "Email configuration is incomplete. Please fill all fields and save.")
+            return None
+        try:
+            queued = send_threat_email(images, threat_details, on_result=self.on_email_result)
+        except Exception as e:
+            print(f"[EMAIL] Exception during email send: {e}")
+            import traceback
+            traceback.print_exc()
+            self.post_ui(self.email_status.config, text="Email: Alert Exception", foreground="red")
+            self.post_ui(self.show_email_popup, f"Exception during email send: {e}")
+            return False
+        if queued:
+            self.post_ui(self.email_status.config, text="Email: Alert Queued", foreground="orange")
+        else:
+            self.post_ui(self.email_status.config, text="Email: Alert Queue Full", foreground="red")
+        return queued
+
+    def on_email_result(self, ok, info):
+        """Called by the alert dispatcher once an alert was delivered or finally failed."""
+        if ok:
+            self.post_ui(self.email_status.config, text="Email: Alert Sent", foreground="green")
+        else:
+            self.post_ui(self.email_status.config, text="Email: Alert Failed", foreground="red")
+            self.post_ui(self.show_email_popup, f"Failed to send alert email: {info}")
+
     def show_email_popup(self, message, success=False):
         """Show a messagebox for email status. Only show for errors."""
         if not success:
@@ -655,7 +822,22 @@ class EnhancedGUI:
 def main():
     root = tk.Tk()
     app = EnhancedGUI(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
     root.mainloop()
+    # Nothing may feed the aggregator, recorder or evidence store while they shut down
+    app.is_running = False
+    app.join_workers()
+    if app.cap:
+        app.cap.release()
+    app.renderer.stop()
+    app.alerts.flush()  # Before the evidence store stops: closing digests save their frames
+    stop_alert_dispatcher()
+    if app.recorder:
+        app.recorder.stop()
+    app.evidence.stop()
+    app.evidence.report()
+    if app.arduino:
+        app.arduino.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
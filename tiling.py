@@ -0,0 +1,165 @@
+"""
+Region-of-interest tiling for small, distant weapons on high-resolution streams.
+
+Besides the usual full-frame pass, a few full-resolution crops (fixed ROIs
+or cells of an overlapping grid) go through the same batched forward pass.
+Crop detections are shifted back into frame coordinates and merged with the
+full-frame detections by class-aware NMS.  Only tiles that show motion or
+contain a recent low-confidence weapon hit are picked, so the extra compute
+lands where it matters.
+"""
+
+import time
+
+import numpy as np
+
+from motion_gate import MotionGate
+from threat_detection import build_detection_result, detect, detect_batch
+
+# Tiling configuration
+TILING_CONFIG = {
+    'enabled': False,           # Off by default; enable with --tiles
+    'tile_size': 640,           # Tile edge in original-frame pixels
+    'overlap': 0.2,             # Fraction of overlap between neighbouring grid tiles
+    'rois': [],                 # Optional fixed regions [(x1, y1, x2, y2), ...] used instead of the grid
+    'max_tiles': 4,             # Upper bound on tiles per frame (on top of the full-frame pass)
+    'min_tile_motion': 0.01,    # Share of moving pixels that makes a tile worth a look
+    'low_confidence': 0.5,      # Weapon hits below this confidence mark a hotspot to re-check
+    'hotspot_memory': 3.0,      # Seconds a hotspot keeps its tile scheduled
+    'nms_iou': 0.5              # IoU above which overlapping boxes of one class are merged
+}
+
+
+def make_tile_grid(frame_shape, tile_size=None, overlap=None):
+    """Return an (N, 4) array of overlapping xyxy tiles covering the frame."""
+    tile_size = tile_size or TILING_CONFIG['tile_size']
+    overlap = TILING_CONFIG['overlap'] if overlap is None else overlap
+    h, w = frame_shape[:2]
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        return positions + [length - tile_size]
+
+    return np.array([(x, y, min(x + tile_size, w), min(y + tile_size, h))
+                     for y in starts(h) for x in starts(w)], dtype=np.int32)
+
+
+def merge_nms(boxes, scores, class_ids, iou_threshold=None):
+    """Class-aware non-maximum suppression; returns indices of the boxes to keep."""
+    iou_threshold = TILING_CONFIG['nms_iou'] if iou_threshold is None else iou_threshold
+    if not len(boxes):
+        return np.zeros(0, dtype=np.int64)
+    # Shift each class into its own coordinate range so one pass never merges across classes
+    shifted = boxes + class_ids[:, None] * (boxes.max() + 1)
+    x1, y1, x2, y2 = shifted.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        inter = (np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None) *
+                 np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None))
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+class TileScheduler:
+    """Picks which tiles of a frame deserve a full-resolution look."""
+
+    def __init__(self):
+        self._tiles = None
+        self._frame_shape = None
+        self._hotspots = []  # (timestamp, cx, cy)
+
+    def tiles_for(self, frame_shape):
+        if self._frame_shape != frame_shape[:2]:
+            self._frame_shape = frame_shape[:2]
+            rois = TILING_CONFIG['rois']
+            self._tiles = np.array(rois, dtype=np.int32) if rois else make_tile_grid(frame_shape)
+        return self._tiles
+
+    def note_result(self, result, now):
+        """Remember low-confidence weapon hits so their tiles get re-checked."""
+        weak = result.threat_mask & (result.confidences < TILING_CONFIG['low_confidence'])
+        for x1, y1, x2, y2 in result.boxes[weak]:
+            self._hotspots.append((now, (x1 + x2) / 2, (y1 + y2) / 2))
+        cutoff = now - TILING_CONFIG['hotspot_memory']
+        self._hotspots = [spot for spot in self._hotspots if spot[0] >= cutoff]
+
+    def select(self, frame_shape, motion_mask=None):
+        """Return the tiles to run this frame, most promising first."""
+        tiles = self.tiles_for(frame_shape)
+        scores = np.zeros(len(tiles), dtype=np.float32)
+        if motion_mask is not None:
+            sy = motion_mask.shape[0] / frame_shape[0]
+            sx = motion_mask.shape[1] / frame_shape[1]
+            for i, (x1, y1, x2, y2) in enumerate(tiles):
+                cell = motion_mask[int(y1 * sy):max(int(y2 * sy), int(y1 * sy) + 1),
+                                   int(x1 * sx):max(int(x2 * sx), int(x1 * sx) + 1)]
+                motion = float(cell.mean()) if cell.size else 0.0
+                if motion >= TILING_CONFIG['min_tile_motion']:
+                    scores[i] = motion
+        for _, cx, cy in self._hotspots:
+            inside = (tiles[:, 0] <= cx) & (cx < tiles[:, 2]) & (tiles[:, 1] <= cy) & (cy < tiles[:, 3])
+            scores[inside] += 1.0  # Hotspots outrank plain motion
+        chosen = np.flatnonzero(scores > 0)
+        chosen = chosen[np.argsort(scores[chosen])[::-1]][:TILING_CONFIG['max_tiles']]
+        return tiles[chosen]
+
+
+class TiledDetector:
+    """Full-frame pass plus adaptively chosen high-resolution tiles in one batch.
+
+    Call it like detect(): ``TiledDetector(model)(frame)`` returns a DetectionResult.
+    """
+
+    def __init__(self, model, motion_gate=None):
+        self.model = model
+        self.scheduler = TileScheduler()
+        # Share the pipeline's gate if there is one; its mask is already up to date
+        self.motion_gate = motion_gate
+        self._own_gate = MotionGate() if motion_gate is None else None
+        self.tiles_run = 0
+
+    def __call__(self, frame):
+        h, w = frame.shape[:2]
+        if max(h, w) < TILING_CONFIG['tile_size'] * 1.5 and not TILING_CONFIG['rois']:
+            return detect(frame, self.model)
+        now = time.time()
+        if self._own_gate is not None:
+            self._own_gate.detect_motion(frame)
+            mask = self._own_gate.last_mask
+        else:
+            mask = self.motion_gate.last_mask
+        tiles = self.scheduler.select(frame.shape, mask)
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+        results = detect_batch([frame] + crops, self.model)
+        full = results[0]
+        if not full.valid or not len(tiles) or full.threat_details.get('threat_level') == 'Warning':
+            self.scheduler.note_result(full, now)
+            return full
+        self.tiles_run += len(tiles)
+
+        boxes = [full.boxes]
+        confidences = [full.confidences]
+        class_ids = [full.class_ids]
+        for (x1, y1, _, _), tile_result in zip(tiles, results[1:]):
+            if not tile_result.valid or not len(tile_result.boxes):
+                continue
+            boxes.append(tile_result.boxes + np.array([x1, y1, x1, y1], dtype=np.float32))
+            confidences.append(tile_result.confidences)
+            class_ids.append(tile_result.class_ids)
+        boxes = np.concatenate(boxes)
+        confidences = np.concatenate(confidences)
+        class_ids = np.concatenate(class_ids)
+        keep = merge_nms(boxes, confidences, class_ids)
+        merged = build_detection_result(frame.shape, boxes[keep], confidences[keep], class_ids[keep],
+                                        full.class_names)
+        self.scheduler.note_result(merged, now)
+        return merged
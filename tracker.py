@@ -0,0 +1,224 @@
+"""
+Lightweight IoU + Kalman multi-object tracking for weapon detections.
+
+Tracks carry weapon boxes across frames so threat state no longer depends on
+a sliding vote buffer.  A track is confirmed after a few matched detections
+and stays alive for a short time without one, which replaces the old
+"2 of 10 frames" vote and hold counter with a single O(1)-per-frame update.
+Between detector runs the Kalman filter predicts where each track moved.
+"""
+
+import time
+from collections import deque
+from dataclasses import replace
+
+import cv2
+import numpy as np
+
+# Tracker configuration
+TRACKER_CONFIG = {
+    'iou_match': 0.3,     # Minimum IoU between a prediction and a detection to match
+    'min_hits': 2,        # Matched detections needed before a track raises an alert
+    'max_age': 2.0,       # Seconds a track survives without a matching detection
+    'max_missed': 2,      # ...but at least this many detector runs, when the rate controller spaces them wider
+    'max_age_limit': 10.0,  # Upper bound for that stretched survival time
+    'interval_samples': 5,  # Detector intervals whose median is used (one long outage gap does not count)
+    'process_noise': 1e-2,
+    'measurement_noise': 1e-1
+}
+
+
+def box_iou(a, b):
+    """IoU matrix between (N, 4) and (M, 4) xyxy box arrays."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+class KalmanBoxFilter:
+    """Constant-velocity Kalman filter over box centre and size (cx, cy, w, h)."""
+
+    def __init__(self, box):
+        x1, y1, x2, y2 = box
+        self.x = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1, 0, 0, 0, 0], dtype=np.float64)
+        self.P = np.diag([10, 10, 10, 10, 1e3, 1e3, 1e3, 1e3]).astype(np.float64)
+        self._H = np.hstack([np.eye(4), np.zeros((4, 4))])
+
+    def predict(self, dt):
+        F = np.eye(8)
+        F[:4, 4:] = np.eye(4) * dt
+        scale = max(self.x[2], self.x[3], 1.0)
+        Q = np.eye(8) * TRACKER_CONFIG['process_noise'] * scale * max(dt, 1e-3)
+        self.x = F @ self.x
+        self.x[2:4] = np.maximum(self.x[2:4], 1.0)
+        self.P = F @ self.P @ F.T + Q
+
+    def update(self, box):
+        x1, y1, x2, y2 = box
+        z = np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1])
+        R = np.eye(4) * TRACKER_CONFIG['measurement_noise'] * max(z[2], z[3], 1.0)
+        S = self._H @ self.P @ self._H.T + R
+        K = self.P @ self._H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (z - self._H @ self.x)
+        self.P = (np.eye(8) - K @ self._H) @ self.P
+
+    def box_at(self, dt=0.0):
+        """Predicted xyxy box dt seconds after the last filter step, without changing state."""
+        cx, cy, w, h = self.x[:4] + self.x[4:] * dt
+        w, h = max(w, 1.0), max(h, 1.0)
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], dtype=np.float32)
+
+
+class Track:
+    """One tracked object."""
+
+    def __init__(self, track_id, box, confidence, class_id, now):
+        self.track_id = track_id
+        self.class_id = class_id
+        self.confidence = confidence
+        self.filter = KalmanBoxFilter(box)
+        self.hits = 1
+        self.last_update = now
+        self.last_seen = now
+        self.confirmed = TRACKER_CONFIG['min_hits'] <= 1
+
+    def box_at(self, now):
+        return self.filter.box_at(now - self.last_update)
+
+
+class IoUTracker:
+    """Greedy IoU matching of detections to Kalman-predicted tracks."""
+
+    def __init__(self):
+        self.tracks = []
+        self._next_id = 1
+        self._last_update = None
+        self._intervals = deque(maxlen=TRACKER_CONFIG['interval_samples'])
+
+    @property
+    def detection_interval(self):
+        """Typical time between update() calls: the (lower) median of the recent gaps, so one outage is ignored."""
+        return sorted(self._intervals)[(len(self._intervals) - 1) // 2] if self._intervals else 0.0
+
+    @property
+    def max_age(self):
+        """Seconds a track survives unmatched; never less than ``max_missed`` detector intervals."""
+        stretched = min(TRACKER_CONFIG['max_missed'] * self.detection_interval, TRACKER_CONFIG['max_age_limit'])
+        return max(TRACKER_CONFIG['max_age'], stretched)
+
+    def update(self, boxes, confidences, class_ids, now=None):
+        """Advance tracks to ``now``, match detections and return tracks confirmed this call."""
+        now = now if now is not None else time.time()
+        if self._last_update is not None:
+            self._intervals.append(now - self._last_update)
+        self._last_update = now
+        for track in self.tracks:
+            track.filter.predict(now - track.last_update)
+            track.last_update = now
+
+        unmatched = set(range(len(boxes)))
+        if self.tracks and len(boxes):
+            predicted = np.array([track.filter.box_at() for track in self.tracks])
+            iou = box_iou(predicted, np.asarray(boxes, dtype=np.float32))
+            track_classes = np.array([track.class_id for track in self.tracks])
+            iou[track_classes[:, None] != np.asarray(class_ids)[None, :]] = 0
+            # Greedy assignment, best overlaps first
+            matched_tracks = set()
+            for t, d in zip(*np.unravel_index(np.argsort(-iou, axis=None), iou.shape)):
+                if iou[t, d] < TRACKER_CONFIG['iou_match']:
+                    break
+                if d not in unmatched or t in matched_tracks:
+                    continue
+                matched_tracks.add(t)
+                track = self.tracks[t]
+                track.filter.update(boxes[d])
+                track.confidence = float(confidences[d])
+                track.hits += 1
+                track.last_seen = now
+                unmatched.discard(d)
+
+        newly_confirmed = []
+        for track in self.tracks:
+            if not track.confirmed and track.hits >= TRACKER_CONFIG['min_hits']:
+                track.confirmed = True
+                newly_confirmed.append(track)
+        for d in sorted(unmatched):
+            track = Track(self._next_id, boxes[d], float(confidences[d]), int(class_ids[d]), now)
+            self._next_id += 1
+            self.tracks.append(track)
+            if track.confirmed:
+                newly_confirmed.append(track)
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_age]
+        return newly_confirmed
+
+    def expire(self, now=None):
+        now = now if now is not None else time.time()
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_age]
+
+    def confirmed_tracks(self):
+        return [t for t in self.tracks if t.confirmed]
+
+
+class ThreatTracker:
+    """Smoothed threat state from tracked weapon detections.
+
+    Replaces the per-frame vote buffer and hold counter: the threat is active
+    while at least one confirmed weapon track is alive.
+    """
+
+    def __init__(self):
+        self.tracker = IoUTracker()
+        self.confirmed_total = 0
+
+    def update(self, result, now=None):
+        """Feed one DetectionResult; returns the smoothed threat state."""
+        now = now if now is not None else time.time()
+        mask = result.threat_mask
+        newly_confirmed = self.tracker.update(result.boxes[mask], result.confidences[mask],
+                                              result.class_ids[mask], now)
+        if newly_confirmed:
+            self.confirmed_total += len(newly_confirmed)
+            print(f"🎯 Weapon track(s) confirmed: {[t.track_id for t in newly_confirmed]}")
+        return self.active
+
+    @property
+    def active(self):
+        return bool(self.tracker.confirmed_tracks())
+
+    @property
+    def tracking(self):
+        """True while any weapon track, confirmed or not, is alive."""
+        return bool(self.tracker.tracks)
+
+    def reset(self):
+        self.tracker = IoUTracker()
+        self.confirmed_total = 0
+
+    def interpolate(self, result, now=None):
+        """Return a copy of result whose weapon boxes are moved to the tracks' predicted positions."""
+        now = now if now is not None else time.time()
+        self.tracker.expire(now)
+        tracks = self.tracker.confirmed_tracks()
+        keep = ~result.threat_mask
+        boxes = [result.boxes[keep]] + [t.box_at(now)[None] for t in tracks]
+        return replace(
+            result,
+            boxes=np.concatenate(boxes).astype(np.float32),
+            confidences=np.concatenate([result.confidences[keep],
+                                        np.array([t.confidence for t in tracks], dtype=np.float32)]),
+            class_ids=np.concatenate([result.class_ids[keep],
+                                      np.array([t.class_id for t in tracks], dtype=np.int64)]),
+            threat_mask=np.concatenate([np.zeros(int(keep.sum()), dtype=bool), np.ones(len(tracks), dtype=bool)])
+        )
+
+    def draw(self, frame, now=None):
+        """Label confirmed tracks with their ids on an already annotated frame."""
+        now = now if now is not None else time.time()
+        for track in self.tracker.confirmed_tracks():
+            x1, y1, x2, y2 = track.box_at(now).astype(int)
+            cv2.putText(frame, f"#{track.track_id}", (x1, y2 + 15),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+        return frame